@@ -0,0 +1,109 @@
+from typing import Callable, Dict, List, Optional, Self, Set, Tuple, Type, TypeAlias
+
+from carnot.carnot import Id, NewView, Overlay, Timeout, Vote, View
+
+Message: TypeAlias = Vote | Timeout | NewView
+QuorumKey: TypeAlias = Tuple[Type[Message], View, Optional[Id]]
+
+
+def quorum_key(msg: Message) -> QuorumKey:
+    """
+    Messages can only be aggregated with messages of the same kind for the same (view, block)
+    """
+    match msg:
+        case Vote():
+            return Vote, msg.view, msg.block
+        case Timeout() | NewView():
+            return type(msg), msg.view, None
+
+
+def sender(msg: Message) -> Id:
+    match msg:
+        case Vote():
+            return msg.voter
+        case Timeout() | NewView():
+            return msg.sender
+
+
+class QuorumAccumulator:
+    """
+    Ingests individual votes, timeouts or new view messages for a node, as they arrive, and fires exactly once
+    per kind of message and (view, block) when `threshold` distinct members have been collected.
+
+    The output is the quorum expected by `Carnot.approve_block`, `Carnot.propose_block`,
+    `Carnot.timeout_detected` or `Carnot.approve_new_view`.
+    Each message costs a couple of dict operations: membership is resolved once per sender and cached,
+    duplicated senders are dropped, and messages arriving after the quorum fired are ignored.
+
+    Committees change with the overlay, so an accumulator must be built for each overlay (i.e. each view).
+    """
+
+    def __init__(self, threshold: int, is_member: Callable[[Id], bool]):
+        self.threshold = threshold
+        self.is_member = is_member
+        self.membership: Dict[Id, bool] = dict()
+        self.pending: Dict[QuorumKey, Dict[Id, Message]] = dict()
+        self.fired: Set[QuorumKey] = set()
+        self.rejected: int = 0
+
+    @classmethod
+    def child_committee(cls, overlay: Overlay, _id: Id) -> Self:
+        """
+        Votes or new view messages from the child committees of node `_id`
+        """
+        return cls(
+            overlay.super_majority_threshold(_id),
+            lambda child: overlay.is_member_of_child_committee(_id, child),
+        )
+
+    @classmethod
+    def root_and_children(cls, overlay: Overlay, _id: Id) -> Self:
+        """
+        Messages from the root committee and its children, collected by the leader (votes and new views)
+        or by root committee members (timeouts)
+        """
+        return cls(
+            overlay.leader_super_majority_threshold(_id),
+            lambda member: overlay.is_member_of_root_committee(member)
+            or overlay.is_child_of_root_committee(member),
+        )
+
+    def add(self, msg: Message) -> Optional[List[Message]]:
+        """
+        :return: the quorum, the first time `threshold` distinct senders are reached for the message kind, view (and block).
+        Timeouts and new views are not hashable, so the quorum is a list as in the tests of the unhappy path.
+        """
+        key = quorum_key(msg)
+        if key in self.fired:
+            return None
+
+        _sender = sender(msg)
+        if (member := self.membership.get(_sender)) is None:
+            member = self.membership[_sender] = self.is_member(_sender)
+        if not member:
+            self.rejected += 1
+            return None
+
+        collected = self.pending.setdefault(key, dict())
+        if _sender in collected:
+            return None
+        collected[_sender] = msg
+        if len(collected) < self.threshold:
+            return None
+
+        self.fired.add(key)
+        del self.pending[key]
+        return list(collected.values())
+
+    def count(
+        self, view: View, block: Optional[Id] = None, kind: Type[Message] = Vote
+    ) -> int:
+        key = (kind, view, block)
+        if key in self.fired:
+            return self.threshold
+        return len(self.pending.get(key, ()))
+
+    def discard_views_before(self, view: View):
+        for key in [key for key in self.pending if key[1] < view]:
+            del self.pending[key]
+        self.fired = {key for key in self.fired if key[1] >= view}
@@ -0,0 +1,163 @@
+from collections.abc import Mapping
+from functools import partial
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from carnot.carnot import Committee, Id
+from carnot.tree_overlay import CarnotTree, Route, blake2b_hash
+
+
+class NodeIndex:
+    """
+    Maps node ids to dense integer indexes.
+    The set of nodes does not change from one overlay to the next, so a single index is built once and shared by all
+    the trees, which then only need integer arrays: `CarnotOverlay` carries it from a tree to the next with
+    `ArrayCarnotTree.successor`.
+    """
+
+    def __init__(self, nodes: List[Id]):
+        self.ids: List[Id] = list(nodes)
+        self.index: Dict[Id, int] = {node: i for i, node in enumerate(self.ids)}
+        assert len(self.index) == len(self.ids), "node ids must be unique"
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def indices(self, nodes: List[Id]) -> np.ndarray:
+        return np.fromiter(
+            map(self.index.__getitem__, nodes), dtype=np.int64, count=len(nodes)
+        )
+
+
+class ArrayCarnotTree(CarnotTree):
+    """
+    Same committees as `CarnotTree`, without any per member dictionary or set.
+
+    The tree keeps the order of the nodes as a permutation of their `NodeIndex` indexes, `position[i]` being the
+    position of node `i` in that order. Committees are contiguous slices of the order, with the `remainder` last
+    nodes spread one per committee as `CarnotTree.build_committee_from_nodes_with_size` does, so the committee of the
+    node at position `p` is:
+        p // committee_size                        if p < number_of_committees * committee_size
+        p - number_of_committees * committee_size  otherwise
+    Committees (as sets), their ids (hashes) and routes are only built for the committees that are queried.
+
+    Only the first tree looks the nodes up in the index, the next ones permute the order of their predecessor with
+    the positions drawn by the overlay, see `successor`.
+    """
+
+    def __init__(
+        self,
+        nodes: List[Id],
+        number_of_committees: int,
+        node_index: Optional[NodeIndex] = None,
+        branching_factor: int = 2,
+        permutation: Optional[np.ndarray] = None,
+    ):
+        """
+        :param permutation: indexes of `nodes` in `node_index`, looked up when missing
+        """
+        assert number_of_committees > 0
+        assert branching_factor > 1
+        self.number_of_committees = number_of_committees
+        self.branching_factor = branching_factor
+        self.node_index = node_index or NodeIndex(nodes)
+        if permutation is None:
+            permutation = self.node_index.indices(nodes)
+        assert len(permutation) == len(nodes)
+        self.permutation: np.ndarray = permutation
+        self.position = np.full(len(self.node_index), -1, dtype=np.int64)
+        self.position[self.permutation] = np.arange(len(nodes), dtype=np.int64)
+        self.committee_size, self.remainder = divmod(len(nodes), number_of_committees)
+        self._committees: Dict[int, Committee] = {}
+        self._committee_ids: Dict[int, Id] = {}
+        self._committee_id_to_index: Optional[Dict[Id, int]] = None
+        self._routes: Dict[int, Route] = {}
+
+    @property
+    def inner_committees(self) -> List[Id]:
+        # hashes every committee, prefer `committee_id`
+        return [self.committee_id(idx) for idx in range(self.number_of_committees)]
+
+    def committee_positions(self, committee_idx: int) -> np.ndarray:
+        start = committee_idx * self.committee_size
+        positions = np.arange(start, start + self.committee_size)
+        if committee_idx < self.remainder:
+            positions = np.append(
+                positions,
+                self.number_of_committees * self.committee_size + committee_idx,
+            )
+        return positions
+
+    def committee_by_committee_idx(self, committee_idx: int) -> Optional[Committee]:
+        if not 0 <= committee_idx < self.number_of_committees:
+            return None
+        if (committee := self._committees.get(committee_idx)) is None:
+            ids = self.node_index.ids
+            committee = frozenset(
+                ids[i]
+                for i in self.permutation[
+                    self.committee_positions(committee_idx)
+                ].tolist()
+            )
+            self._committees[committee_idx] = committee
+        return committee
+
+    def committee_idx_by_member_id(self, member_id: Id) -> Optional[int]:
+        if (i := self.node_index.index.get(member_id)) is None or (
+            p := int(self.position[i])
+        ) < 0:
+            return None
+        boundary = self.number_of_committees * self.committee_size
+        return p // self.committee_size if p < boundary else p - boundary
+
+    def committee_id(self, committee_idx: int) -> Id:
+        if (committee_id := self._committee_ids.get(committee_idx)) is None:
+            committee_id = blake2b_hash(self.committee_by_committee_idx(committee_idx))
+            self._committee_ids[committee_idx] = committee_id
+        return committee_id
+
+    def committee_idx_by_committee_id(self, committee_id: Id) -> Optional[int]:
+        if self._committee_id_to_index is None:
+            self._committee_id_to_index = {
+                c: i for i, c in enumerate(self.inner_committees)
+            }
+        return self._committee_id_to_index.get(committee_id)
+
+    def route(self, committee_idx: int) -> Route:
+        if (route := self._routes.get(committee_idx)) is None:
+            route = self._routes[committee_idx] = super().route(committee_idx)
+        return route
+
+    def routing_table(self) -> Mapping[Id, Route]:
+        return ArrayRoutes(self)
+
+    def successor(
+        self, tree: Callable[..., CarnotTree], positions: List[int]
+    ) -> Callable[..., CarnotTree]:
+        return partial(
+            tree,
+            node_index=self.node_index,
+            permutation=self.permutation[np.array(positions, dtype=np.int64)],
+        )
+
+
+class ArrayRoutes(Mapping):
+    """
+    Routing table of an `ArrayCarnotTree`, resolving member routes on access
+    """
+
+    def __init__(self, tree: ArrayCarnotTree):
+        self.tree = tree
+
+    def __getitem__(self, member_id: Id) -> Route:
+        if (committee_idx := self.tree.committee_idx_by_member_id(member_id)) is None:
+            raise KeyError(member_id)
+        return self.tree.route(committee_idx)
+
+    def __len__(self) -> int:
+        return len(self.tree.permutation)
+
+    def __iter__(self) -> Iterator[Id]:
+        ids = self.tree.node_index.ids
+        return (ids[i] for i in self.tree.permutation.tolist())
@@ -1,9 +1,11 @@
 # typing imports
 from dataclasses import dataclass
 from random import randint
-from typing import TypeAlias
+from typing import Dict, List, Optional, Sequence, TypeAlias
 
 # carnot imports
+from carnot.probe import probed
+
 # lib imports
 from blspy import PrivateKey, Util, BasicSchemeMPL, G2Element, G1Element
 
@@ -15,6 +17,8 @@ Sig: TypeAlias = bytes
 Entropy: TypeAlias = bytes
 PublicKey: TypeAlias = G1Element
 VERSION = 0
+# recovery beacons kept to be served to peers
+MAX_RECOVERY_BEACONS = 1024
 
 def generate_random_sk() -> PrivateKey:
     seed = bytes([randint(0, 255) for _ in range(32)])
@@ -22,7 +26,9 @@ def generate_random_sk() -> PrivateKey:
 
 
 def view_to_bytes(view: View) -> bytes:
-    return view.to_bytes((view.bit_length() + 7) // 8, byteorder='little', signed=True)
+    # shortest two's complement encoding, with room for the sign bit (views from 128 on used to overflow)
+    length = ((view if view >= 0 else ~view).bit_length() + 8) // 8 if view != 0 else 0
+    return view.to_bytes(length, byteorder='little', signed=True)
 
 @dataclass
 class RandomBeacon:
@@ -68,18 +74,40 @@ class RecoveryMode:
     def generate_beacon(last_beacon_entropy: Entropy, view: View) -> RandomBeacon:
         return RandomBeacon(VERSION, sha256(last_beacon_entropy + view_to_bytes(view)).digest())
 
+    @staticmethod
+    def fast_forward(last_beacon_entropy: Entropy, views: Sequence[View]) -> List[RandomBeacon]:
+        """
+        :param views: consecutive failed views
+        :return: the beacon of each view, each one derived from the previous one
+        """
+        beacons = []
+        for view in views:
+            last_beacon_entropy = sha256(last_beacon_entropy + view_to_bytes(view)).digest()
+            beacons.append(RandomBeacon(VERSION, last_beacon_entropy))
+        return beacons
+
 
 class RandomBeaconHandler:
-    def __init__(self, beacon: RandomBeacon):
+    def __init__(self, beacon: RandomBeacon, verifier=None):
         """
         :param beacon: Beacon should be initialized with either the last known working beacon from recovery.
         Or the hash of the genesis block in case of first consensus round.
+        :param verifier: checks happy beacons instead of `NormalMode.verify`, e.g. a shared
+        `carnot.beacon_verifier.BeaconVerifier` caching its results
         :return: Self
         """
         self.last_beacon: RandomBeacon = beacon
+        self.verifier = verifier
+        # recovery beacons by view, for peers catching up
+        self.recovery_beacons: Dict[View, RandomBeacon] = {}
 
+    @probed("beacon_verify")
     def verify_happy(self, new_beacon: RandomBeacon, pk: PublicKey, view: View) -> bool:
-        if NormalMode.verify(new_beacon, pk, view):
+        if self.verifier is not None:
+            valid = self.verifier.verify(new_beacon, pk, view)
+        else:
+            valid = NormalMode.verify(new_beacon, pk, view)
+        if valid:
             self.last_beacon = new_beacon
             return True
         return False
@@ -87,5 +115,37 @@ class RandomBeaconHandler:
     def verify_unhappy(self, new_beacon: RandomBeacon, view: View) -> bool:
         if RecoveryMode.verify(self.last_beacon, new_beacon, view):
             self.last_beacon = new_beacon
+            self.remember_recovery(view, new_beacon)
             return True
         return False
+
+    def fast_forward(self, views: Sequence[View]) -> List[RandomBeacon]:
+        """
+        Move past consecutive failed views at once
+        """
+        beacons = RecoveryMode.fast_forward(self.last_beacon.entropy(), views)
+        for view, beacon in zip(views, beacons):
+            self.remember_recovery(view, beacon)
+        if beacons:
+            self.last_beacon = beacons[-1]
+        return beacons
+
+    def verify_unhappy_many(self, beacons: Sequence[RandomBeacon], views: Sequence[View]) -> bool:
+        """
+        Check recovery beacons served by a peer for consecutive failed views
+        """
+        if len(beacons) != len(views) or RecoveryMode.fast_forward(self.last_beacon.entropy(), views) != list(beacons):
+            return False
+        for view, beacon in zip(views, beacons):
+            self.remember_recovery(view, beacon)
+        if beacons:
+            self.last_beacon = beacons[-1]
+        return True
+
+    def remember_recovery(self, view: View, beacon: RandomBeacon):
+        self.recovery_beacons[view] = beacon
+        while len(self.recovery_beacons) > MAX_RECOVERY_BEACONS:
+            del self.recovery_beacons[min(self.recovery_beacons)]
+
+    def recovery_beacon(self, view: View) -> Optional[RandomBeacon]:
+        return self.recovery_beacons.get(view)
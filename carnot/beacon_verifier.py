@@ -0,0 +1,161 @@
+"""
+Batch and cached verification of happy path random beacons.
+
+A beacon is a BLS signature of the view by the leader: checking it costs two pairings, on the critical path of
+every vote, and catching up means checking a long sequence of them. `BeaconVerifier`:
+    * remembers the outcome of every (public key, view, signature) it checked, the nodes of a simulation or the
+      handlers of a node can share it
+    * checks many beacons at once: with random scalars r_i, all the beacons are valid (up to a 2^-64 probability)
+      if e(g1, sum r_i * sig_i) == prod e(sum r_i * pk_i, H(view)), the keys of the same view being summed so that
+      blspy verifies the distinct views with a single multi-pairing. If the batch fails, it is split in two to find
+      the invalid beacons.
+    * runs the batches in an executor. blspy holds the GIL, use a `ProcessPoolExecutor` for parallelism, batches are
+      sent as bytes.
+Public keys are deserialized once, with the cache of `carnot.qc.public_key`.
+"""
+import secrets
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Sequence, Tuple, TypeAlias
+
+from blspy import BasicSchemeMPL, G1Element, G2Element
+
+from carnot.beacon import PublicKey, RandomBeacon, Sig, View, view_to_bytes
+from carnot.qc import public_key
+
+# serialized public key, view and signature of a beacon
+BeaconClaim: TypeAlias = Tuple[bytes, View, Sig]
+
+SCALAR_BITS = 64
+
+
+def multiply(point: G1Element | G2Element, scalar: int) -> G1Element | G2Element:
+    """
+    Double and add, blspy has no scalar multiplication of points
+    """
+    result = None
+    while scalar:
+        if scalar & 1:
+            result = point if result is None else result + point
+        point = point + point
+        scalar >>= 1
+    return result
+
+
+def linear_combination(
+    points: Sequence[G2Element], scalars: Sequence[int]
+) -> G2Element:
+    """
+    sum scalars[i] * points[i], sharing the doublings between all the points
+    """
+    result = None
+    for bit in reversed(range(max(scalars).bit_length())):
+        if result is not None:
+            result = result + result
+        for point, scalar in zip(points, scalars):
+            if scalar >> bit & 1:
+                result = point if result is None else result + point
+    return result
+
+
+def verify_batch(claims: Sequence[BeaconClaim]) -> bool:
+    """
+    :return: true if all the claims are valid
+    """
+    try:
+        signatures = [G2Element.from_bytes(sig) for _, _, sig in claims]
+        keys = [public_key(pk) for pk, _, _ in claims]
+    except ValueError:
+        return False
+    # odd scalars are never zero
+    scalars = [secrets.randbits(SCALAR_BITS) | 1 for _ in claims]
+    keys_by_view: Dict[View, G1Element] = {}
+    for (_, view, _), key, scalar in zip(claims, keys, scalars):
+        key = multiply(key, scalar)
+        keys_by_view[view] = (
+            key if view not in keys_by_view else keys_by_view[view] + key
+        )
+    return BasicSchemeMPL.aggregate_verify(
+        list(keys_by_view.values()),
+        [view_to_bytes(view) for view in keys_by_view],
+        linear_combination(signatures, scalars),
+    )
+
+
+def verify_claims(claims: Sequence[BeaconClaim]) -> List[bool]:
+    """
+    :return: the validity of every claim, splitting the batch until the invalid claims are isolated
+    """
+    if len(claims) == 0:
+        return []
+    if len(claims) == 1:
+        pk, view, sig = claims[0]
+        try:
+            return [
+                BasicSchemeMPL.verify(
+                    public_key(pk), view_to_bytes(view), G2Element.from_bytes(sig)
+                )
+            ]
+        except ValueError:
+            return [False]
+    if verify_batch(claims):
+        return [True] * len(claims)
+    middle = len(claims) // 2
+    return verify_claims(claims[:middle]) + verify_claims(claims[middle:])
+
+
+class BeaconVerifier:
+    def __init__(
+        self,
+        executor: Optional[Executor] = None,
+        batch_size: int = 64,
+        cache_size: int = 1 << 16,
+    ):
+        """
+        :param executor: runs the batches, in the calling thread if None
+        :param cache_size: number of outcomes remembered, the oldest are forgotten first
+        """
+        assert batch_size > 0
+        self.executor = executor
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.outcomes: Dict[BeaconClaim, bool] = {}
+
+    @staticmethod
+    def claim(beacon: RandomBeacon, pk: PublicKey | bytes, view: View) -> BeaconClaim:
+        return bytes(pk), view, bytes(beacon.sig)
+
+    def verify(self, beacon: RandomBeacon, pk: PublicKey | bytes, view: View) -> bool:
+        return self.verify_many([(beacon, pk, view)])[0]
+
+    def verify_many(
+        self, beacons: Sequence[Tuple[RandomBeacon, PublicKey | bytes, View]]
+    ) -> List[bool]:
+        claims = [self.claim(beacon, pk, view) for beacon, pk, view in beacons]
+        outcomes = {
+            claim: self.outcomes[claim] for claim in claims if claim in self.outcomes
+        }
+        unknown = list(
+            dict.fromkeys(claim for claim in claims if claim not in outcomes)
+        )
+        batches = [
+            unknown[i : i + self.batch_size]
+            for i in range(0, len(unknown), self.batch_size)
+        ]
+        if self.executor is None:
+            results = map(verify_claims, batches)
+        else:
+            results = [
+                future.result()
+                for future in [self.executor.submit(verify_claims, b) for b in batches]
+            ]
+        for batch, batch_outcomes in zip(batches, results):
+            outcomes.update(zip(batch, batch_outcomes))
+        for claim in unknown:
+            self.remember(claim, outcomes[claim])
+        return [outcomes[claim] for claim in claims]
+
+    def remember(self, claim: BeaconClaim, outcome: bool):
+        self.outcomes[claim] = outcome
+        while len(self.outcomes) > self.cache_size:
+            # dicts keep the insertion order
+            del self.outcomes[next(iter(self.outcomes))]
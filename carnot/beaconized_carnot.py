@@ -1,8 +1,16 @@
-from typing import Set
+from typing import Dict, List, Set, Optional
 
-from carnot.carnot import Carnot, Block, TimeoutQc, Vote, Event, Send, Quorum
+from carnot.carnot import (
+    Carnot, Block, Id, TimeoutQc, Vote, Event, Send, Quorum, CommittedLog, NewView, Qc, StandardQc, AggregateQc
+)
 from carnot.beacon import *
+from carnot.beacon_verifier import BeaconVerifier
 from carnot.overlay import EntropyOverlay
+from carnot.qc import aggregate_qc, sign_vote, verify_qc
+
+# number of views the overlays are kept for, to check the signers of the QCs of these views
+PAST_OVERLAYS = 64
+
 
 @dataclass
 class BeaconizedBlock(Block):
@@ -12,13 +20,39 @@ class BeaconizedBlock(Block):
 
 
 class BeaconizedCarnot(Carnot):
-    def __init__(self, sk: PrivateKey, overlay: EntropyOverlay, entropy: bytes = b""):
+    def __init__(
+            self,
+            sk: PrivateKey,
+            overlay: EntropyOverlay,
+            entropy: bytes = b"",
+            committed_log: Optional[CommittedLog] = None,
+            prune: bool = False,
+            sign_votes: bool = False,
+            beacon_verifier: Optional[BeaconVerifier] = None
+    ):
         self.sk = sk
+        # opt-in, signing costs about a millisecond per vote.
+        # Signing nodes aggregate the votes into the QCs of their blocks and check the QCs of the blocks they receive.
+        self.sign_votes = sign_votes
+        # all the nodes sorted by id, the signers of a QC are a bitmap over them
+        self._members: Optional[List[Id]] = None
+        # overlays the last views were voted in, by view, and the first view of the current overlay
+        self.past_overlays: Dict[View, EntropyOverlay] = {}
+        self.overlay_view: View = 0
         self.pk = bytes(self.sk.get_g1())
         self.random_beacon = RandomBeaconHandler(
-            RecoveryMode.generate_beacon(entropy, -1)
+            RecoveryMode.generate_beacon(entropy, -1),
+            beacon_verifier
         )
-        super().__init__(self.pk, overlay=overlay)
+        super().__init__(self.pk, overlay=overlay, committed_log=committed_log, prune=prune)
+
+    def receive_block(self, block: BeaconizedBlock):
+        if self.sign_votes and block.id() not in self.safe_blocks:
+            assert self.qc_is_valid(block.qc), "invalid qc"
+        super().receive_block(block)
+        if block.id() in self.safe_blocks:
+            # the overlay will be advanced with the block beacon once approved, start building it now
+            self.overlay.prefetch(block.beacon.entropy())
 
     def approve_block(self, block: BeaconizedBlock, votes: Set[Vote]) -> Event:
         assert block.id() in self.safe_blocks
@@ -38,28 +72,134 @@ class BeaconizedCarnot(Carnot):
             view=block.view,
             qc=qc
         )
+        if self.sign_votes:
+            vote = sign_vote(self.sk, vote)
 
         self.highest_voted_view = max(self.highest_voted_view, block.view)
 
         # root members send votes to next leader, we update our beacon first
         if self.overlay.is_member_of_root_committee(self.id):
             assert(self.random_beacon.verify_happy(block.beacon, block.pk, block.qc.view))
-            self.overlay = self.overlay.advance(self.random_beacon.last_beacon.entropy())
+            self.advance_overlay(block.view, self.overlay.advance(self.random_beacon.last_beacon.entropy()))
             return Send(to=self.overlay.leader(), payload=vote)
 
         # otherwise we send to the parent committee and update the beacon second
         return_event = Send(to=self.overlay.parent_committee(self.id), payload=vote)
         assert(self.random_beacon.verify_happy(block.beacon, block.pk, block.qc.view))
-        self.overlay = self.overlay.advance(self.random_beacon.last_beacon.entropy())
+        self.advance_overlay(block.view, self.overlay.advance(self.random_beacon.last_beacon.entropy()))
         return return_event
 
+    def follow_block(self, block: BeaconizedBlock):
+        """
+        Advance the overlay with the beacon of a block without voting for it (e.g. the votes of the children did not
+        arrive before the next block), so that the node keeps the same overlay as the rest of the network
+        """
+        assert block.id() in self.safe_blocks
+        assert(self.random_beacon.verify_happy(block.beacon, block.pk, block.qc.view))
+        self.advance_overlay(block.view, self.overlay.advance(self.random_beacon.last_beacon.entropy()))
+
     def receive_timeout_qc(self, timeout_qc: TimeoutQc):
-        super().receive_timeout_qc(timeout_qc)
+        # checked before processing the qc, which moves the current view past it
         if timeout_qc.view < self.current_view:
             return
+        super().receive_timeout_qc(timeout_qc)
         new_beacon = RecoveryMode.generate_beacon(self.random_beacon.last_beacon.entropy(), timeout_qc.view)
         self.random_beacon.verify_unhappy(new_beacon, timeout_qc.view)
-        self.overlay = self.overlay.advance(self.random_beacon.last_beacon.entropy())
+        self.advance_overlay(timeout_qc.view, self.overlay.advance(self.random_beacon.last_beacon.entropy()))
+
+    def catch_up(self, timeout_qc: TimeoutQc):
+        """
+        Rejoin after missing the timeout qcs of the views from the current one to the view of `timeout_qc`, which all
+        failed: their recovery beacons are derived at once and only the last overlay is built
+        """
+        if timeout_qc.view < self.current_view:
+            return
+        views = list(range(self.current_view, timeout_qc.view + 1))
+        super().receive_timeout_qc(timeout_qc)
+        beacons = self.random_beacon.fast_forward(views)
+        # the views in between failed, none of them has a QC
+        self.advance_overlay(
+            views[0], self.overlay.advance_many([beacon.entropy() for beacon in beacons]), timeout_qc.view + 1
+        )
+
+    def recovery_beacon(self, view: View) -> Optional[RandomBeacon]:
+        """
+        Recovery beacon of a failed view, for peers catching up
+        """
+        return self.random_beacon.recovery_beacon(view)
+
+    def upcoming_leaders(self, timeouts: int = 1) -> List[Id]:
+        """
+        The leaders which may propose the next blocks: the current and the next leader, and the leaders of the
+        recovery overlays if up to `timeouts` views time out
+        """
+        return self.overlay.leader_schedule.upcoming(
+            self.current_view, timeouts, self.random_beacon.last_beacon.entropy()
+        )
+
+    def approve_new_view(self, timeout_qc: TimeoutQc, new_views: Set[NewView]) -> Event:
+        event = super().approve_new_view(timeout_qc, new_views)
+        if self.overlay.is_member_of_root_committee(self.id):
+            # the overlay was advanced with the recovery beacon when receiving the timeout qc,
+            # its leader proposes the next block
+            event.to = [self.overlay.leader()]
+        return event
+
+    def advance_overlay(self, view: View, overlay: EntropyOverlay, next_view: Optional[View] = None):
+        """
+        Replace the overlay `view` was voted in by the overlay of `next_view`, by default the following view
+        """
+        self.past_overlays[view] = self.overlay
+        self.overlay = overlay
+        self.overlay_view = next_view if next_view is not None else view + 1
+        for past in [past for past in self.past_overlays if past <= view - PAST_OVERLAYS]:
+            del self.past_overlays[past]
+
+    def overlay_of(self, view: View) -> Optional[EntropyOverlay]:
+        """
+        The overlay `view` is voted in, if it is the current one or one of the last `PAST_OVERLAYS` views
+        """
+        if view >= self.overlay_view:
+            return self.overlay
+        return self.past_overlays.get(view)
+
+    def members(self) -> List[Id]:
+        if self._members is None:
+            self._members = sorted(self.overlay.nodes, key=bytes)
+        return self._members
+
+    def build_qc(
+            self, view: View, block: Optional[Block], new_views: Optional[Set[NewView]],
+            votes: Optional[List[Vote]] = None
+    ) -> Qc:
+        """
+        With signed votes, the QC aggregates their signatures
+        """
+        if self.sign_votes and votes and all(vote.signature is not None for vote in votes):
+            return aggregate_qc(votes, self.members())
+        return super().build_qc(view, block, new_views, votes)
+
+    def qc_is_valid(self, qc: Qc) -> bool:
+        """
+        The aggregated signature of a QC covers a supermajority of the root committee and its children, in the overlay
+        of the view of the QC. The QC of the genesis block, whose votes are made up, is not signed.
+        QCs older than the overlays kept are rejected.
+        """
+        match qc:
+            case StandardQc() if qc.view == 0:
+                genesis = self.genesis_block()
+                return genesis is not None and qc.block == genesis.id()
+            case StandardQc():
+                if (overlay := self.overlay_of(qc.view)) is None:
+                    return False
+                return verify_qc(
+                    qc, self.members(), overlay.leader_super_majority_threshold(self.id),
+                    lambda signer: overlay.is_member_of_root_committee(signer) or
+                    overlay.is_child_of_root_committee(signer)
+                )
+            case AggregateQc():
+                return self.qc_is_valid(qc.high_qc())
+        return False
 
     def propose_block(self, view: View, quorum: Quorum) -> Event:
         event: Event = super().propose_block(view, quorum)
@@ -0,0 +1,70 @@
+"""
+Compare checking happy path beacons one by one with `NormalMode.verify` against `BeaconVerifier` batches, e.g. when
+catching up on a sequence of blocks, and against checking beacons already seen by a shared verifier.
+
+    python -m carnot.benchmarks.beacon_verification [--beacons 256] [--batch-sizes 8 64 256] [--workers 0]
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from blspy import BasicSchemeMPL
+
+from carnot.beacon import NormalMode
+from carnot.beacon_verifier import BeaconVerifier
+
+
+def run(number_of_beacons: int, batch_sizes: List[int], workers: int):
+    leaders = [
+        BasicSchemeMPL.key_gen(i.to_bytes(32, byteorder="little")) for i in range(16)
+    ]
+    beacons = [
+        (
+            NormalMode.generate_beacon(leaders[view % len(leaders)], view),
+            leaders[view % len(leaders)].get_g1(),
+            view,
+        )
+        for view in range(number_of_beacons)
+    ]
+    executor = ProcessPoolExecutor(max_workers=workers) if workers else None
+
+    start = time.perf_counter()
+    assert all(NormalMode.verify(*beacon) for beacon in beacons)
+    one_by_one = time.perf_counter() - start
+    print(f"{'method':>16} {'per beacon (ms)':>16} {'speedup':>8}")
+    print(
+        f"{'one by one':>16} {one_by_one / number_of_beacons * 1000:>16.3f} {1:>7.1f}x"
+    )
+
+    for batch_size in batch_sizes:
+        verifier = BeaconVerifier(executor, batch_size=batch_size)
+        start = time.perf_counter()
+        assert all(verifier.verify_many(beacons))
+        elapsed = time.perf_counter() - start
+        print(
+            f"{f'batches of {batch_size}':>16} {elapsed / number_of_beacons * 1000:>16.3f} "
+            f"{one_by_one / elapsed:>7.1f}x"
+        )
+
+    start = time.perf_counter()
+    assert all(verifier.verify(*beacon) for beacon in beacons)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{'already checked':>16} {elapsed / number_of_beacons * 1000:>16.3f} {one_by_one / elapsed:>7.1f}x"
+    )
+    if executor is not None:
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--beacons", type=int, default=256)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 64, 256])
+    parser.add_argument(
+        "--workers", type=int, default=0, help="worker processes, none by default"
+    )
+    args = parser.parse_args()
+    run(args.beacons, args.batch_sizes, args.workers)
@@ -0,0 +1,46 @@
+"""
+Compare sending every event as one message per recipient with the batched frames and the fan-out trees of
+`carnot.dissemination`, on the Carnot simulator.
+
+    python -m carnot.benchmarks.dissemination [--nodes 500] [--committees 15] [--views 10] [--crashed 0.0]
+"""
+import argparse
+from dataclasses import replace
+
+from carnot.simulation import Simulation, SimulationConfig
+
+
+def run(nodes: int, committees: int, views: int, crashed: float):
+    base = SimulationConfig(
+        number_of_nodes=nodes, number_of_committees=committees, crashed=crashed
+    )
+    configs = {
+        "unicast": base,
+        "unicast, 10ms batches": replace(base, batch_window_ms=10),
+        "tree": replace(base, dissemination="tree"),
+        "tree, 10ms batches": replace(base, dissemination="tree", batch_window_ms=10),
+        "tree, 2 heads": replace(base, dissemination="tree", redundancy=2),
+    }
+    print(
+        f"{'dissemination':>22} {'committed':>10} {'p50 (ms)':>9} {'frames/view':>12} {'busiest/view':>13} "
+        f"{'kB/view':>8} {'timeouts':>9}"
+    )
+    for name, config in configs.items():
+        report = Simulation(config).run(views, max_time_ms=60_000)
+        print(
+            f"{name:>22} {report.blocks_committed:>10} {report.commit_latency_p50_ms:>9.0f} "
+            f"{report.frames_per_view:>12.0f} {report.busiest_node_messages_per_view:>13.1f} "
+            f"{sum(report.bytes_per_view.values()) / 1000:>8.0f} {report.local_timeouts:>9}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--nodes", type=int, default=500)
+    parser.add_argument("--committees", type=int, default=15)
+    parser.add_argument("--views", type=int, default=10)
+    parser.add_argument("--crashed", type=float, default=0.0)
+    args = parser.parse_args()
+    run(args.nodes, args.committees, args.views, args.crashed)
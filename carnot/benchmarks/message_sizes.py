@@ -0,0 +1,75 @@
+"""
+Size of the Carnot messages on the wire, pickled and encoded with `carnot.codec`, for growing root committees.
+
+The messages whose size depends on the committee size are the timeout qcs (one sender and one view per timeout) and
+the aggregated qcs of the blocks proposed after a timeout (one view per new view), which are also carried by every
+timeout and new view message.
+
+    python -m carnot.benchmarks.message_sizes [--sizes 100 250 500 1000 2000]
+"""
+import argparse
+import pickle
+from typing import List
+
+from blspy import BasicSchemeMPL
+
+from carnot.carnot import AggregateQc, Block, NewView, StandardQc, TimeoutQc, Vote
+from carnot.codec import encode
+
+
+def run(sizes: List[int]):
+    print(f"{'members':>8} {'message':>12} {'pickle':>8} {'ids':>8} {'bitmap':>8}")
+    for size in sizes:
+        members = sorted(
+            bytes(BasicSchemeMPL.key_gen(i.to_bytes(32, byteorder="little")).get_g1())
+            for i in range(size)
+        )
+        high_qc = StandardQc(
+            block=b"b" * 32,
+            view=41,
+            signature=b"s" * 96,
+            signers=b"\xff" * ((size + 7) // 8),
+        )
+        timeout_qc = TimeoutQc(
+            view=42,
+            high_qc=high_qc,
+            qc_views=[42] * size,
+            sender_ids=set(members),
+            sender=members[0],
+        )
+        # most new views carry the latest qc, a few lag behind
+        aggregate_qc = AggregateQc(
+            qcs=[41 if i % 10 else 40 for i in range(size)],
+            highest_qc=StandardQc(block=b"b" * 32, view=41),
+            view=43,
+        )
+        messages = {
+            "vote": Vote(
+                block=b"b" * 32,
+                view=42,
+                voter=members[0],
+                qc=high_qc,
+                signature=b"s" * 96,
+            ),
+            "timeout qc": timeout_qc,
+            "new view": NewView(
+                view=43, high_qc=high_qc, sender=members[0], timeout_qc=timeout_qc
+            ),
+            "block": Block(view=44, qc=aggregate_qc, _id=b"c" * 32),
+        }
+        for name, message in messages.items():
+            print(
+                f"{size:>8} {name:>12} {len(pickle.dumps(message)):>8} {len(encode(message)):>8} "
+                f"{len(encode(message, members)):>8}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[100, 250, 500, 1000, 2000]
+    )
+    args = parser.parse_args()
+    run(args.sizes)
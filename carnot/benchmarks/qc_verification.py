@@ -0,0 +1,60 @@
+"""
+Compare verifying a quorum certificate through its aggregated signature against verifying every vote.
+
+    python -m carnot.benchmarks.qc_verification [--sizes 100 250 500 1000] [--repeat 3]
+"""
+import argparse
+import time
+from typing import Callable, List
+
+from blspy import BasicSchemeMPL
+
+from carnot.carnot import Vote
+from carnot.qc import aggregate_qc, public_key, sign_vote, verify_qc, verify_vote
+
+
+def best_of(repeat: int, f: Callable[[], bool]) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        assert f()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(sizes: List[int], repeat: int):
+    print(
+        f"{'signers':>8} {'per vote (ms)':>14} {'aggregated (ms)':>16} {'speedup':>8}"
+    )
+    for size in sizes:
+        sks = [
+            BasicSchemeMPL.key_gen(i.to_bytes(32, byteorder="little"))
+            for i in range(size)
+        ]
+        members = sorted(bytes(sk.get_g1()) for sk in sks)
+        votes = [
+            sign_vote(
+                sk, Vote(block=b"block", view=1, voter=bytes(sk.get_g1()), qc=None)
+            )
+            for sk in sks
+        ]
+        qc = aggregate_qc(votes, members)
+        # both paths use the same public key cache, only signature checks are measured
+        for member in members:
+            public_key(member)
+
+        per_vote = best_of(repeat, lambda: all(verify_vote(vote) for vote in votes))
+        aggregated = best_of(repeat, lambda: verify_qc(qc, members, threshold=size))
+        print(
+            f"{size:>8} {per_vote * 1000:>14.2f} {aggregated * 1000:>16.2f} {per_vote / aggregated:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 250, 500, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
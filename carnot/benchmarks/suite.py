@@ -0,0 +1,335 @@
+"""
+Benchmarks of the Carnot hot paths, written as JSON and compared against a baseline.
+
+    * `receive_block/<blocks>`: a node receiving a long chain of blocks, up to 100k
+    * `receive_and_commit/<blocks>`: the same, asking for the latest committed block after every block
+    * `latest_committed_block/<blocks>`: asking for the latest committed block once the chain is received
+    * `carnot_tree/<nodes>`: building the committee tree
+    * `overlay_queries/<nodes>`: membership, parenting and threshold queries on a `CarnotOverlay`
+    * `leader_lookups/<nodes>`: `CarnotOverlay.next_leader`
+    * `approve_block/<verifier>`: a root committee member receiving and approving blocks, which checks their beacon,
+      with every beacon checked by the node or already checked by a shared `BeaconVerifier`
+    * `committee_sizes/<nodes>`: `compute_optimal_number_of_committees_and_committee_size`
+
+Every benchmark is set up anew and run `--repeat` times, the best run is kept: `per_op_us` is its time divided by
+the number of operations. Results of different machines are not comparable, the baseline has to be produced on the
+machine running the comparison:
+
+    python -m carnot.benchmarks.suite --output carnot/benchmarks/baseline.json
+    python -m carnot.benchmarks.suite --baseline carnot/benchmarks/baseline.json [--tolerance 0.25]
+
+The comparison exits with an error if a benchmark got slower than the baseline by more than the tolerance.
+`--quick` runs the smaller sizes only.
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from blspy import BasicSchemeMPL
+
+from carnot.beacon import NormalMode, RecoveryMode
+from carnot.beacon_verifier import BeaconVerifier
+from carnot.beaconized_carnot import BeaconizedBlock, BeaconizedCarnot
+from carnot.carnot import Block, Carnot, StandardQc, int_to_id
+from carnot.committee_sizes import (
+    compute_optimal_number_of_committees_and_committee_size,
+)
+from carnot.overlay import FlatOverlay
+from carnot.tree_overlay import CarnotOverlay, CarnotTree
+
+# the benchmark prepares the state and returns the timed function, which returns the number of operations it did
+Benchmark = Callable[[], Callable[[], int]]
+
+
+def chain(blocks: int) -> List[Block]:
+    chain = [Block(view=0, qc=StandardQc(block=b"", view=0), _id=b"")]
+    for view in range(1, blocks + 1):
+        chain.append(
+            Block(
+                view=view,
+                qc=StandardQc(block=chain[-1].id(), view=view - 1),
+                _id=int_to_id(view),
+            )
+        )
+    return chain
+
+
+def genesis_node(genesis: Block) -> Carnot:
+    node = Carnot(int_to_id(0))
+    node.safe_blocks[genesis.id()] = genesis
+    return node
+
+
+def receive_block(blocks: int) -> Benchmark:
+    genesis, *rest = chain(blocks)
+
+    def setup():
+        node = genesis_node(genesis)
+
+        def run():
+            for block in rest:
+                node.receive_block(block)
+            return len(rest)
+
+        return run
+
+    return setup
+
+
+def receive_and_commit(blocks: int) -> Benchmark:
+    genesis, *rest = chain(blocks)
+
+    def setup():
+        node = genesis_node(genesis)
+
+        def run():
+            for block in rest:
+                node.receive_block(block)
+                node.latest_committed_block()
+            assert node.latest_committed_block().view == blocks - 2
+            return len(rest)
+
+        return run
+
+    return setup
+
+
+def latest_committed_block(blocks: int, calls: int = 10_000) -> Benchmark:
+    genesis, *rest = chain(blocks)
+
+    def setup():
+        node = genesis_node(genesis)
+        for block in rest:
+            node.receive_block(block)
+        node.latest_committed_block()
+
+        def run():
+            for _ in range(calls):
+                node.latest_committed_block()
+            return calls
+
+        return run
+
+    return setup
+
+
+def number_of_committees(nodes: int) -> int:
+    return compute_optimal_number_of_committees_and_committee_size(
+        nodes, 1e-6, 1 / 3, 0.1
+    )[0]
+
+
+def carnot_tree(nodes: int) -> Benchmark:
+    ids = [int_to_id(i) for i in range(nodes)]
+    committees = number_of_committees(nodes)
+
+    def setup():
+        def run():
+            CarnotTree(ids, committees)
+            return 1
+
+        return run
+
+    return setup
+
+
+def overlay_queries(nodes: int, queries: int = 2000) -> Benchmark:
+    ids = [int_to_id(i) for i in range(nodes)]
+    overlay = CarnotOverlay(ids, ids[0], b"entropy", number_of_committees(nodes))
+    rng = random.Random(0)
+    pairs = [(rng.choice(ids), rng.choice(ids)) for _ in range(queries)]
+
+    def setup():
+        def run():
+            for parent, child in pairs:
+                overlay.is_member_of_child_committee(parent, child)
+                overlay.parent_committee(child)
+                overlay.is_member_of_root_committee(parent)
+                overlay.is_member_of_leaf_committee(child)
+                overlay.super_majority_threshold(parent)
+                overlay.leader_super_majority_threshold(parent)
+            return 6 * len(pairs)
+
+        return run
+
+    return setup
+
+
+def leader_lookups(nodes: int, lookups: int = 10_000) -> Benchmark:
+    ids = [int_to_id(i) for i in range(nodes)]
+    overlay = CarnotOverlay(ids, ids[0], b"entropy", number_of_committees(nodes))
+
+    def setup():
+        def run():
+            for _ in range(lookups):
+                overlay.next_leader()
+            return lookups
+
+        return run
+
+    return setup
+
+
+def approve_block(blocks: int, shared_verifier: bool) -> Benchmark:
+    leader = BasicSchemeMPL.key_gen(bytes(32))
+    sk = BasicSchemeMPL.key_gen(bytes([1]) * 32)
+    pk = leader.get_g1()
+    genesis = BeaconizedBlock(
+        view=0,
+        qc=StandardQc(block=b"", view=0),
+        _id=b"",
+        beacon=NormalMode.generate_beacon(leader, -1),
+        pk=pk,
+    )
+    chain = [genesis]
+    for view in range(1, blocks + 1):
+        chain.append(
+            BeaconizedBlock(
+                view=view,
+                qc=StandardQc(block=chain[-1].id(), view=view - 1),
+                _id=int_to_id(view),
+                beacon=NormalMode.generate_beacon(leader, view - 1),
+                pk=pk,
+            )
+        )
+    verifier = BeaconVerifier() if shared_verifier else None
+    if verifier is not None:
+        # the other nodes checked the beacons already
+        verifier.verify_many([(block.beacon, pk, block.qc.view) for block in chain[1:]])
+
+    def setup():
+        entropy = RecoveryMode.generate_beacon(b"", -1).entropy()
+        node = BeaconizedCarnot(
+            sk,
+            FlatOverlay(int_to_id(0), [int_to_id(0)], entropy),
+            sign_votes=False,
+            beacon_verifier=verifier,
+        )
+        node.safe_blocks[genesis.id()] = genesis
+
+        def run():
+            for block in chain[1:]:
+                node.receive_block(block)
+                node.approve_block(block, set())
+            return blocks
+
+        return run
+
+    return setup
+
+
+def committee_sizes(nodes: int) -> Benchmark:
+    def setup():
+        def run():
+            number_of_committees(nodes)
+            return 1
+
+        return run
+
+    return setup
+
+
+def benchmarks(quick: bool) -> Dict[str, Callable[[], Benchmark]]:
+    blocks = [1000] if quick else [1000, 10_000, 100_000]
+    nodes = [1000, 10_000] if quick else [1000, 10_000, 100_000]
+    suite: Dict[str, Callable[[], Benchmark]] = {}
+    for size in blocks:
+        suite[f"receive_block/{size}"] = lambda size=size: receive_block(size)
+        suite[f"receive_and_commit/{size}"] = lambda size=size: receive_and_commit(size)
+        suite[
+            f"latest_committed_block/{size}"
+        ] = lambda size=size: latest_committed_block(size)
+    for size in nodes:
+        suite[f"carnot_tree/{size}"] = lambda size=size: carnot_tree(size)
+        suite[f"overlay_queries/{size}"] = lambda size=size: overlay_queries(size)
+        suite[f"committee_sizes/{size}"] = lambda size=size: committee_sizes(size)
+        suite[f"leader_lookups/{size}"] = lambda size=size: leader_lookups(size)
+    suite["approve_block/verify"] = lambda: approve_block(100, shared_verifier=False)
+    suite["approve_block/shared_verifier"] = lambda: approve_block(
+        100, shared_verifier=True
+    )
+    return suite
+
+
+def measure(benchmark: Benchmark, repeat: int) -> Dict[str, Any]:
+    timings = []
+    operations = 0
+    for _ in range(repeat):
+        run = benchmark()
+        start = time.perf_counter()
+        operations = run()
+        timings.append(time.perf_counter() - start)
+    return {
+        "operations": operations,
+        "best_s": min(timings),
+        "median_s": statistics.median(timings),
+        "per_op_us": min(timings) / operations * 1e6,
+    }
+
+
+def run(quick: bool, repeat: int, only: Optional[List[str]] = None) -> Dict[str, Any]:
+    results = {}
+    for name, prepare in benchmarks(quick).items():
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        results[name] = measure(prepare(), repeat)
+        print(f"{name:>32} {results[name]['per_op_us']:>14.2f} us/op", file=sys.stderr)
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """
+    :return: the benchmarks slower than the baseline by more than `tolerance`
+    """
+    regressions = []
+    print(f"{'benchmark':>32} {'baseline (us)':>14} {'now (us)':>14} {'ratio':>7}")
+    for name, result in results["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before, now = baseline["results"][name]["per_op_us"], result["per_op_us"]
+        ratio = now / before
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = " slower"
+        print(f"{name:>32} {before:>14.2f} {now:>14.2f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--quick", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", help="benchmark name prefixes")
+    parser.add_argument(
+        "--output", help="where to write the results, stdout by default"
+    )
+    parser.add_argument("--baseline", help="results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    results = run(args.quick, args.repeat, args.only)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+    elif not args.baseline:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,133 @@
+"""
+Monte Carlo estimate of the time it takes for the leader to collect a quorum of votes, for different branching factors
+of the committee tree.
+
+Every vote sent over the network is delayed by an independent log-normal latency. Leaf members vote as soon as they
+receive the block, inner members once they gathered a supermajority of the votes of all their child committees
+combined (as `Route.super_majority_threshold`), and the leader once it gathered `leader_super_majority_threshold` votes from the root committee and its children.
+Wider trees have fewer aggregation hops but every inner member waits for more votes.
+
+    python -m carnot.benchmarks.tree_latency [--nodes 5000] [--committees 121] [--branching-factors 2 3 4 8]
+"""
+import argparse
+from typing import List
+
+import numpy as np
+
+from carnot.tree_overlay import CarnotTree, super_majority_threshold
+
+
+def committee_sizes(nodes: int, number_of_committees: int) -> np.ndarray:
+    # same distribution as `CarnotTree.build_committee_from_nodes_with_size`
+    committee_size, remainder = divmod(nodes, number_of_committees)
+    sizes = np.full(number_of_committees, committee_size)
+    sizes[:remainder] += 1
+    return sizes
+
+
+def quorum_time(arrivals: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    :param arrivals: (receivers, senders) arrival time of each vote
+    :return: time at which each receiver has `threshold` votes
+    """
+    return np.partition(arrivals, threshold - 1, axis=1)[:, threshold - 1]
+
+
+def simulate(
+    tree: CarnotTree,
+    sizes: np.ndarray,
+    rng: np.random.Generator,
+    latency_ms: float,
+    sigma: float,
+) -> float:
+    def delays(shape) -> np.ndarray:
+        return rng.lognormal(np.log(latency_ms), sigma, shape)
+
+    # time at which each member of each committee sends its vote
+    ready: List[np.ndarray] = [np.empty(0)] * tree.number_of_committees
+    leafs = tree.leaf_committee_idxs()
+    # children have higher indexes than their parents
+    for idx in reversed(range(tree.number_of_committees)):
+        block_arrival = delays(sizes[idx])
+        if idx in leafs:
+            ready[idx] = block_arrival
+            continue
+        child_idxs = tree.child_committee_idxs(idx)
+        children = np.concatenate([ready[child] for child in child_idxs])
+        # same threshold as `Route.super_majority_threshold`
+        threshold = super_majority_threshold(sizes[child] for child in child_idxs)
+        votes = quorum_time(
+            children[None, :] + delays((sizes[idx], len(children))), threshold
+        )
+        ready[idx] = np.maximum(block_arrival, votes)
+
+    # root members forward the votes of their children to the leader
+    root_and_children = (0, *tree.child_committee_idxs(0))
+    senders = np.concatenate([ready[idx] for idx in root_and_children])
+    threshold = super_majority_threshold(sizes[idx] for idx in root_and_children)
+    return float(
+        quorum_time(senders[None, :] + delays((1, len(senders))), threshold)[0]
+    )
+
+
+def depth(tree: CarnotTree) -> int:
+    levels, idx = 1, tree.number_of_committees - 1
+    while (idx := tree.parent_committee_idx(idx)) is not None:
+        levels += 1
+    return levels
+
+
+def run(
+    nodes: int,
+    number_of_committees: int,
+    branching_factors: List[int],
+    trials: int,
+    latency_ms: float,
+    sigma: float,
+    seed: int,
+):
+    sizes = committee_sizes(nodes, number_of_committees)
+    ids = [i.to_bytes(4, byteorder="little") for i in range(number_of_committees)]
+    print(
+        f"{nodes} nodes, {number_of_committees} committees of ~{sizes[0]}, median link latency {latency_ms}ms"
+    )
+    print(
+        f"{'k':>3} {'depth':>6} {'votes/member':>13} {'mean (ms)':>10} {'p50 (ms)':>9} {'p99 (ms)':>9}"
+    )
+    for k in branching_factors:
+        # one member per committee is enough to get the tree shape
+        tree = CarnotTree(ids, number_of_committees, branching_factor=k)
+        rng = np.random.default_rng(seed)
+        samples = np.array(
+            [simulate(tree, sizes, rng, latency_ms, sigma) for _ in range(trials)]
+        )
+        votes_per_member = sum(sizes[child] for child in tree.child_committee_idxs(0))
+        print(
+            f"{k:>3} {depth(tree):>6} {votes_per_member:>13} {samples.mean():>10.1f} "
+            f"{np.percentile(samples, 50):>9.1f} {np.percentile(samples, 99):>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--nodes", type=int, default=5000)
+    parser.add_argument("--committees", type=int, default=121)
+    parser.add_argument(
+        "--branching-factors", type=int, nargs="+", default=[2, 3, 4, 8]
+    )
+    parser.add_argument("--trials", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--sigma", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(
+        args.nodes,
+        args.committees,
+        args.branching_factors,
+        args.trials,
+        args.latency_ms,
+        args.sigma,
+        args.seed,
+    )
@@ -35,8 +35,10 @@
 
 # Please note this is still a work in progress
 
+import heapq
 from dataclasses import dataclass
-from typing import TypeAlias, List, Set, Self, Optional, Dict
+from types import MappingProxyType
+from typing import TypeAlias, List, Set, Self, Optional, Dict, Mapping, Tuple
 from abc import abstractmethod, ABC
 
 Id: TypeAlias = bytes
@@ -52,6 +54,10 @@ def int_to_id(i: int) -> Id:
 class StandardQc:
     block: Id
     view: View
+    # aggregated signature of the votes and the bitmap of the signers over the ordered committee members,
+    # see carnot/qc.py. Optional as the spec protocol does not check signatures.
+    signature: Optional[bytes] = None
+    signers: Optional[bytes] = None
 
     def view(self) -> View:
         return self.view
@@ -104,6 +110,7 @@ class Vote:
     view: View
     voter: Id
     qc: Optional[Qc]
+    signature: Optional[bytes] = None
 
 
 @dataclass
@@ -251,8 +258,96 @@ def download(view) -> Block:
     raise NotImplementedError
 
 
+class SafeBlocks(Dict[Id, Block]):
+    """
+    Safe blocks by id, with a secondary index of blocks by view.
+
+    The index is maintained on every insertion and removal, so it stays coherent even when blocks
+    are added to `safe_blocks` directly (e.g. the genesis block). Newly inserted blocks are also
+    queued in `inserted` so that the node can incrementally update the derived committed state, and in
+    `journal` if it is enabled, for the safety log (see `carnot.wal`).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.by_view: Dict[View, List[Block]] = dict()
+        self.inserted: List[Block] = []
+        self.journal: Optional[List[Block]] = None
+
+    def __setitem__(self, _id: Id, block: Block):
+        if _id in self:
+            self.__unindex(self[_id])
+        super().__setitem__(_id, block)
+        self.by_view.setdefault(block.view, []).append(block)
+        self.inserted.append(block)
+        if self.journal is not None:
+            self.journal.append(block)
+
+    def __delitem__(self, _id: Id):
+        self.__unindex(self[_id])
+        super().__delitem__(_id)
+
+    def __unindex(self, block: Block):
+        blocks = self.by_view[block.view]
+        # remove by identity, different blocks may compare equal
+        blocks.pop(next(i for i, b in enumerate(blocks) if b is block))
+        if not blocks:
+            del self.by_view[block.view]
+
+    def pop(self, _id: Id, *default):
+        if _id not in self:
+            return super().pop(_id, *default)
+        block = self[_id]
+        del self[_id]
+        return block
+
+    def update(self, *args, **kwargs):
+        for _id, block in dict(*args, **kwargs).items():
+            self[_id] = block
+
+    def clear(self):
+        super().clear()
+        self.by_view.clear()
+
+    def blocks_in_view(self, view: View) -> List[Block]:
+        return list(self.by_view.get(view, ()))
+
+    def take_inserted(self) -> List[Block]:
+        inserted, self.inserted = self.inserted, []
+        return inserted
+
+
+class CommittedLog:
+    """
+    Append-only log of committed blocks, in commit order.
+
+    If a `path` is provided every committed block is also appended to that file, one
+    `view<TAB>id<TAB>parent` line per block with hex encoded ids.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.blocks: Dict[Id, Block] = dict()
+        self.path = path
+
+    def append(self, block: Block):
+        assert block.id() not in self.blocks
+        self.blocks[block.id()] = block
+        if self.path is not None:
+            with open(self.path, "a") as f:
+                f.write(f"{block.view}\t{block.id().hex()}\t{block.parent().hex()}\n")
+
+    def first(self) -> Optional[Block]:
+        return next(iter(self.blocks.values()), None)
+
+    def __contains__(self, _id: Id) -> bool:
+        return _id in self.blocks
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+
 class Carnot:
-    def __init__(self, _id: Id, overlay=Overlay()):
+    def __init__(self, _id: Id, overlay=Overlay(), committed_log: Optional[CommittedLog] = None, prune: bool = False):
         self.id: Id = _id
         # Current View counter
         # It is the view currently being processed by the node. Once a Qc is received, the view is considered completed
@@ -264,11 +359,26 @@ class Carnot:
         self.local_high_qc: Optional[Qc] = None
         # Validated blocks with their validated QCs are included here. If commit conditions are satisfied for
         # each one of these blocks it will be committed.
-        self.safe_blocks: Dict[Id, Block] = dict()
+        self.safe_blocks: SafeBlocks = SafeBlocks()
         # Whether the node time out in the last view and corresponding qc
         self.last_view_timeout_qc: Optional[TimeoutQc] = None
         self.overlay: Overlay = overlay
-
+        # The latest committed block is derived incrementally from the safe blocks:
+        # blocks able to commit their grandparent, as (view, insertion order, grandparent), not yet
+        # taken into account because their view is higher than the current view
+        self._commit_candidates: List[Tuple[View, int, Block]] = []
+        self._commit_candidates_seq: int = 0
+        # blocks inserted before their parent or grandparent, as (insertion order, block), by missing ancestor
+        self._commit_waiting: Dict[Id, List[Tuple[int, Block]]] = dict()
+        # view of the block that committed `_latest_committed`
+        self._latest_commit_view: View = 0
+        self._latest_committed: Optional[Block] = None
+        # the committed chain, up to `_committed_tip`
+        self.committed_log: CommittedLog = committed_log if committed_log is not None else CommittedLog()
+        self._committed_tip: Optional[Block] = None
+        # If enabled, blocks behind the latest committed block are dropped from the safe blocks as soon as it
+        # advances: committed ones are only kept in the committed log, the others can never be committed.
+        self.prune: bool = prune
 
     # Committing conditions for a block
     # TODO: explain the conditions in comment
@@ -295,29 +405,97 @@ class Carnot:
     # Return the list of blocks received by a node for a specific view.
     # It will return more than one block only in case of a malicious leader
     def blocks_in_view(self, view: View) -> List[Block]:
-        return [block for block in self.safe_blocks.values() if block.view == view]
+        return self.safe_blocks.blocks_in_view(view)
 
     def genesis_block(self) -> Block:
-        return self.blocks_in_view(0)[0]
+        if genesis := self.blocks_in_view(0):
+            return genesis[0]
+        # pruned, genesis is always the first committed block
+        return self.committed_log.first()
 
     def latest_committed_block(self) -> Block:
-        for view in range(self.current_view, 0, -1):
-            for block in self.blocks_in_view(view):
-                if self.can_commit_grandparent(block):
-                    return self.safe_blocks.get(self.safe_blocks.get(block.parent()).parent())
+        # Check the blocks added since the last call for their committing conditions, along with the blocks
+        # that were waiting for them to be inserted.
+        for block in self.safe_blocks.take_inserted():
+            self.__queue_commit_candidate(self._commit_candidates_seq, block)
+            self._commit_candidates_seq += 1
+            for seq, waiting in self._commit_waiting.pop(block.id(), ()):
+                if waiting.id() in self.safe_blocks:
+                    self.__queue_commit_candidate(seq, waiting)
+        # The latest committed block is the grandparent of the highest block within the current view
+        # satisfying the committing conditions. The first block received for a view wins.
+        while self._commit_candidates and self._commit_candidates[0][0] <= self.current_view:
+            view, _, grand_parent = heapq.heappop(self._commit_candidates)
+            if view > self._latest_commit_view:
+                self._latest_commit_view = view
+                self._latest_committed = grand_parent
+        if self._latest_committed is not None:
+            return self._latest_committed
         # genesis blocks is always considered committed
         return self.genesis_block()
 
+    def __queue_commit_candidate(self, seq: int, block: Block):
+        """
+        Push `block` to the commit candidates if it can commit its grandparent, or wait for its missing ancestor.
+        `seq` is the insertion order of the block, the first block received for a view wins.
+        """
+        if block.view == 0:
+            return
+        parent = self.safe_blocks.get(block.parent())
+        if parent is None:
+            self._commit_waiting.setdefault(block.parent(), []).append((seq, block))
+            return
+        if parent.view == 0:
+            # the genesis block has no parent
+            return
+        grand_parent = self.safe_blocks.get(parent.parent())
+        if grand_parent is None:
+            self._commit_waiting.setdefault(parent.parent(), []).append((seq, block))
+            return
+        if self.can_commit_grandparent(block):
+            heapq.heappush(self._commit_candidates, (block.view, seq, grand_parent))
+
     # Given committing conditions, the set of committed blocks is implicit
     # in the safe blocks tree. For convenience, this is an helper method to
     # retrieve that set.
-    def committed_blocks(self) -> Dict[Id, Block]:
+    def committed_blocks(self) -> Mapping[Id, Block]:
         tip = self.latest_committed_block()
-        committed_blocks = {tip.id(): tip, self.genesis_block().id: self.genesis_block()}
-        while tip.view > 0:
-            committed_blocks[tip.id()] = tip
-            tip = self.safe_blocks.get(tip.parent())
-        return committed_blocks
+        if tip is not self._committed_tip:
+            # walk back from the new tip until we meet the committed chain we already know
+            new_blocks = []
+            block = tip
+            while block is not None and block.id() not in self.committed_log:
+                new_blocks.append(block)
+                block = self.safe_blocks.get(block.parent()) if block.view > 0 else None
+            assert self._committed_tip is None or block is self._committed_tip, "committed chain cannot fork"
+            for block in reversed(new_blocks):
+                self.committed_log.append(block)
+            self._committed_tip = tip
+        return MappingProxyType(self.committed_log.blocks)
+
+    def prune_committed(self):
+        """
+        Drop from the safe blocks everything behind the latest committed block, which itself is kept as
+        the parent (or grandparent) of the blocks still in flight:
+            * committed blocks, which are kept in the committed log
+            * blocks in views up to the latest committed one that are not part of the committed chain
+            * blocks whose parent was dropped, they are forks of the committed chain
+        """
+        self.committed_blocks()
+        tip = self._committed_tip
+        for view in [view for view in self.safe_blocks.by_view if view < tip.view]:
+            for block in self.safe_blocks.blocks_in_view(view):
+                del self.safe_blocks[block.id()]
+        for view in sorted(view for view in self.safe_blocks.by_view if view >= tip.view):
+            for block in self.safe_blocks.blocks_in_view(view):
+                if block is not tip and block.parent() not in self.safe_blocks:
+                    del self.safe_blocks[block.id()]
+        for missing in list(self._commit_waiting):
+            waiting = [(seq, block) for seq, block in self._commit_waiting[missing] if block.id() in self.safe_blocks]
+            if waiting:
+                self._commit_waiting[missing] = waiting
+            else:
+                del self._commit_waiting[missing]
 
     def block_is_safe(self, block: Block) -> bool:
         return (
@@ -348,6 +526,11 @@ class Carnot:
                 self.last_view_timeout_qc = timeout_qc
 
     def receive_block(self, block: Block):
+        if block.id() in self.committed_log or (
+                block.parent() in self.committed_log and block.parent() not in self.safe_blocks
+        ):
+            # the block, or its parent, are already committed and have been pruned
+            return
         assert block.parent() in self.safe_blocks
 
         if block.id() in self.safe_blocks:
@@ -365,6 +548,8 @@ class Carnot:
         if self.block_is_safe(block):
             self.safe_blocks[block.id()] = block
             self.update_high_qc(block.qc)
+            if self.prune:
+                self.prune_committed()
 
     def approve_block(self, block: Block, votes: Set[Vote]) -> Event:
         assert block.id() in self.safe_blocks
@@ -415,7 +600,14 @@ class Carnot:
         if self.overlay.is_member_of_root_committee(self.id):
             return Send(to=self.overlay.next_leader(), payload=msg)
 
-    def build_qc(self, view: View, block: Optional[Block], new_views: Optional[Set[NewView]]) -> Qc:
+    def build_qc(
+            self, view: View, block: Optional[Block], new_views: Optional[Set[NewView]],
+            votes: Optional[List[Vote]] = None
+    ) -> Qc:
+        """
+        :param votes: the quorum of votes for `block`, unused here as the spec does not sign votes,
+        see `BeaconizedCarnot.build_qc`
+        """
         # unhappy path
         if new_views:
             new_views = list(new_views)
@@ -439,7 +631,7 @@ class Carnot:
         # happy path
         if isinstance(quorum[0], Vote):
             vote = quorum[0]
-            qc = self.build_qc(vote.view, self.safe_blocks[vote.block], None)
+            qc = self.build_qc(vote.view, self.safe_blocks[vote.block], None, quorum)
         # unhappy path
         elif isinstance(quorum[0], NewView):
             new_view = quorum[0]
@@ -0,0 +1,348 @@
+"""
+Binary wire format of the Carnot payloads.
+
+Every message starts with the codec version and the payload tag, followed by the payload fields in declaration
+order:
+    * integers (views, lengths, counts) are LEB128 varints, a view takes 1 or 2 bytes instead of 8
+    * ids, signatures and bitmaps are length prefixed byte strings
+    * optional fields are preceded by a presence byte
+    * view lists (`AggregateQc.qcs`, `TimeoutQc.qc_views`) are runs of (zigzag delta from the previous view,
+      repetitions), as they are mostly made of the same few views
+    * `TimeoutQc.sender_ids` is a bitmap over the committee members sorted by id (see `carnot.qc.encode_signers`)
+      when the members are known to both ends, a list of ids otherwise
+
+A set of 700 root and child committee members then costs 88 bytes instead of 700 public keys.
+
+The decoder works on a `memoryview` of the message and does not copy it as a whole, only the ids and signatures it
+returns are copied to `bytes`, so that they compare equal to the ids of the node, e.g. as dict keys, and do not keep
+the message alive. Truncated or invalid messages raise a `DecodeError`.
+"""
+from enum import IntEnum
+from typing import List, Optional, Sequence, Tuple
+
+from blspy import G1Element
+
+from carnot.beacon import RandomBeacon
+from carnot.beaconized_carnot import BeaconizedBlock
+from carnot.carnot import (
+    AggregateQc,
+    Block,
+    Id,
+    NewView,
+    Payload,
+    Qc,
+    StandardQc,
+    Timeout,
+    TimeoutQc,
+    View,
+    Vote,
+)
+from carnot.qc import decode_signers, encode_signers
+
+VERSION = 1
+
+
+class Tag(IntEnum):
+    BLOCK = 1
+    BEACONIZED_BLOCK = 2
+    VOTE = 3
+    TIMEOUT = 4
+    NEW_VIEW = 5
+    TIMEOUT_QC = 6
+    STANDARD_QC = 7
+    AGGREGATE_QC = 8
+
+
+# TimeoutQc.sender_ids encodings
+SENDER_LIST = 0
+SENDER_BITMAP = 1
+
+
+class DecodeError(ValueError):
+    """
+    The message is truncated or invalid
+    """
+
+
+class Writer:
+    def __init__(self, members: Optional[Sequence[Id]] = None):
+        self.buffer = bytearray()
+        self.members = members
+
+    def varint(self, value: int):
+        assert value >= 0
+        while value >= 0x80:
+            self.buffer.append(value & 0x7F | 0x80)
+            value >>= 7
+        self.buffer.append(value)
+
+    def zigzag(self, value: int):
+        self.varint(value << 1 if value >= 0 else (-value << 1) - 1)
+
+    def bytes(self, value: bytes):
+        self.varint(len(value))
+        self.buffer += value
+
+    def optional_bytes(self, value: Optional[bytes]):
+        self.buffer.append(value is not None)
+        if value is not None:
+            self.bytes(value)
+
+    def views(self, views: List[View]):
+        runs: List[Tuple[int, int]] = []
+        previous = 0
+        for view in views:
+            delta = view - previous
+            if runs and delta == 0:
+                runs[-1] = (runs[-1][0], runs[-1][1] + 1)
+            else:
+                runs.append((delta, 1))
+            previous = view
+        self.varint(len(runs))
+        for delta, repetitions in runs:
+            self.zigzag(delta)
+            self.varint(repetitions)
+
+    def ids(self, ids):
+        if self.members is not None:
+            self.buffer.append(SENDER_BITMAP)
+            self.bytes(encode_signers(self.members, ids))
+            return
+        self.buffer.append(SENDER_LIST)
+        ids = sorted(ids)
+        self.varint(len(ids))
+        for _id in ids:
+            self.bytes(_id)
+
+    def payload(self, payload: Payload):
+        match payload:
+            case BeaconizedBlock():
+                self.buffer.append(Tag.BEACONIZED_BLOCK)
+                self.block(payload)
+                self.varint(payload.beacon.version)
+                self.bytes(payload.beacon.sig)
+                self.bytes(bytes(payload.pk))
+            case Block():
+                self.buffer.append(Tag.BLOCK)
+                self.block(payload)
+            case Vote():
+                self.buffer.append(Tag.VOTE)
+                self.bytes(payload.block)
+                self.varint(payload.view)
+                self.bytes(payload.voter)
+                self.optional_qc(payload.qc)
+                self.optional_bytes(payload.signature)
+            case Timeout():
+                self.buffer.append(Tag.TIMEOUT)
+                self.varint(payload.view)
+                self.qc(payload.high_qc)
+                self.bytes(payload.sender)
+                self.optional_timeout_qc(payload.timeout_qc)
+            case NewView():
+                self.buffer.append(Tag.NEW_VIEW)
+                self.varint(payload.view)
+                self.qc(payload.high_qc)
+                self.bytes(payload.sender)
+                self.optional_timeout_qc(payload.timeout_qc)
+            case TimeoutQc():
+                self.buffer.append(Tag.TIMEOUT_QC)
+                self.timeout_qc(payload)
+            case StandardQc() | AggregateQc():
+                self.qc(payload)
+            case _:
+                raise TypeError(f"{type(payload).__name__} has no wire format")
+
+    def block(self, block: Block):
+        self.varint(block.view)
+        self.qc(block.qc)
+        self.bytes(block.id())
+
+    def qc(self, qc: Qc):
+        match qc:
+            case StandardQc():
+                self.buffer.append(Tag.STANDARD_QC)
+                self.varint(qc.view)
+                self.bytes(qc.block)
+                self.optional_bytes(qc.signature)
+                self.optional_bytes(qc.signers)
+            case AggregateQc():
+                self.buffer.append(Tag.AGGREGATE_QC)
+                self.views(qc.qcs)
+                self.qc(qc.highest_qc)
+                self.varint(qc.view)
+
+    def optional_qc(self, qc: Optional[Qc]):
+        self.buffer.append(qc is not None)
+        if qc is not None:
+            self.qc(qc)
+
+    def timeout_qc(self, timeout_qc: TimeoutQc):
+        self.varint(timeout_qc.view)
+        self.qc(timeout_qc.high_qc)
+        self.views(timeout_qc.qc_views)
+        self.ids(timeout_qc.sender_ids)
+        self.bytes(timeout_qc.sender)
+
+    def optional_timeout_qc(self, timeout_qc: Optional[TimeoutQc]):
+        self.buffer.append(timeout_qc is not None)
+        if timeout_qc is not None:
+            self.timeout_qc(timeout_qc)
+
+
+class Reader:
+    def __init__(
+        self, data: bytes | memoryview, members: Optional[Sequence[Id]] = None
+    ):
+        self.data = memoryview(data)
+        self.offset = 0
+        self.members = members
+
+    def byte(self) -> int:
+        if self.offset >= len(self.data):
+            raise DecodeError("truncated message")
+        value = self.data[self.offset]
+        self.offset += 1
+        return value
+
+    def varint(self) -> int:
+        value, shift = 0, 0
+        while True:
+            byte = self.byte()
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def zigzag(self) -> int:
+        value = self.varint()
+        return value >> 1 if value & 1 == 0 else -((value + 1) >> 1)
+
+    def bytes(self) -> bytes:
+        length = self.varint()
+        if self.offset + length > len(self.data):
+            raise DecodeError("truncated message")
+        value = bytes(self.data[self.offset : self.offset + length])
+        self.offset += length
+        return value
+
+    def optional_bytes(self) -> Optional[bytes]:
+        return self.bytes() if self.byte() else None
+
+    def views(self) -> List[View]:
+        views: List[View] = []
+        view = 0
+        for _ in range(self.varint()):
+            view += self.zigzag()
+            views += [view] * self.varint()
+        return views
+
+    def ids(self) -> set:
+        encoding = self.byte()
+        if encoding == SENDER_BITMAP:
+            if self.members is None:
+                raise DecodeError("sender bitmaps need the committee members")
+            bitmap = self.bytes()
+            if len(bitmap) != (len(self.members) + 7) // 8:
+                raise DecodeError("sender bitmap does not match the committee members")
+            return set(decode_signers(self.members, bitmap))
+        if encoding == SENDER_LIST:
+            return {self.bytes() for _ in range(self.varint())}
+        raise DecodeError("unknown sender encoding")
+
+    def payload(self) -> Payload:
+        match self.byte():
+            case Tag.BEACONIZED_BLOCK:
+                view, qc, _id = self.block()
+                beacon = RandomBeacon(version=self.varint(), sig=self.bytes())
+                try:
+                    pk = G1Element.from_bytes(self.bytes())
+                except (ValueError, RuntimeError) as e:
+                    raise DecodeError("invalid public key") from e
+                return BeaconizedBlock(view=view, qc=qc, _id=_id, beacon=beacon, pk=pk)
+            case Tag.BLOCK:
+                view, qc, _id = self.block()
+                return Block(view=view, qc=qc, _id=_id)
+            case Tag.VOTE:
+                return Vote(
+                    block=self.bytes(),
+                    view=self.varint(),
+                    voter=self.bytes(),
+                    qc=self.optional_qc(),
+                    signature=self.optional_bytes(),
+                )
+            case Tag.TIMEOUT:
+                return Timeout(
+                    view=self.varint(),
+                    high_qc=self.qc(),
+                    sender=self.bytes(),
+                    timeout_qc=self.optional_timeout_qc(),
+                )
+            case Tag.NEW_VIEW:
+                return NewView(
+                    view=self.varint(),
+                    high_qc=self.qc(),
+                    sender=self.bytes(),
+                    timeout_qc=self.optional_timeout_qc(),
+                )
+            case Tag.TIMEOUT_QC:
+                return self.timeout_qc()
+            case Tag.STANDARD_QC | Tag.AGGREGATE_QC:
+                self.offset -= 1
+                return self.qc()
+        raise DecodeError("unknown payload tag")
+
+    def block(self) -> Tuple[View, Qc, Id]:
+        return self.varint(), self.qc(), self.bytes()
+
+    def qc(self) -> Qc:
+        match self.byte():
+            case Tag.STANDARD_QC:
+                return StandardQc(
+                    view=self.varint(),
+                    block=self.bytes(),
+                    signature=self.optional_bytes(),
+                    signers=self.optional_bytes(),
+                )
+            case Tag.AGGREGATE_QC:
+                return AggregateQc(
+                    qcs=self.views(), highest_qc=self.qc(), view=self.varint()
+                )
+        raise DecodeError("unknown qc tag")
+
+    def optional_qc(self) -> Optional[Qc]:
+        return self.qc() if self.byte() else None
+
+    def timeout_qc(self) -> TimeoutQc:
+        return TimeoutQc(
+            view=self.varint(),
+            high_qc=self.qc(),
+            qc_views=self.views(),
+            sender_ids=self.ids(),
+            sender=self.bytes(),
+        )
+
+    def optional_timeout_qc(self) -> Optional[TimeoutQc]:
+        return self.timeout_qc() if self.byte() else None
+
+
+def encode(payload: Payload, members: Optional[Sequence[Id]] = None) -> bytes:
+    """
+    :param members: root committee and child committees members sorted by id, to send timeout qc senders as a bitmap
+    """
+    writer = Writer(members)
+    writer.varint(VERSION)
+    writer.payload(payload)
+    return bytes(writer.buffer)
+
+
+def decode(data: bytes | memoryview, members: Optional[Sequence[Id]] = None) -> Payload:
+    """
+    :param members: the members the message was encoded with, if any
+    """
+    reader = Reader(data, members)
+    if (version := reader.varint()) != VERSION:
+        raise DecodeError(f"unsupported codec version {version}")
+    payload = reader.payload()
+    if reader.offset != len(reader.data):
+        raise DecodeError("trailing bytes")
+    return payload
@@ -6,15 +6,90 @@ The algorithm computes  the current_probability for the  number_of_nodes=committ
 
 Initially, all number_of_nodes are in one committee, and in subsequent iterations, the number_of_committees is increased by two until the current_probability <= failure_threshold. When the latter condition is violated  then the algorithm stops and outputs the number_of_committees, committee_size, remainder and current_probability.  
 
+All the candidate numbers of committees are evaluated at once with NumPy, in chunks of growing size until one of them fails, and `plan` does it for many network sizes at once. The result can be saved as a `CommitteeTable` and loaded by the nodes, see `CarnotOverlay.from_table`.
+
 A more detailed description of the algorithm,  and of its mathematical aspects, is provided in the "Carnot paper" available at https://www.notion.so/Nomos-Specification-419bfb7a939648e9b3894a90d188c3be?pvs=4   
 """
-import math
+import argparse
+import json
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
 from scipy.stats import binom
 
 
 CARNOT_ADVERSARY_THRESHOLD_PER_COMMITTEE: float = 1/3
 CARNOT_NETWORK_ADVERSARY_THRESHOLD: float = 1 / 4
 
+# number of candidate numbers of committees evaluated in the first chunk, doubled for every next chunk
+INITIAL_CHUNK = 64
+
+
+def failure_probabilities(
+        number_of_nodes: np.ndarray,
+        number_of_committees: np.ndarray,
+        adversaries_threshold_per_committee: float,
+        network_adversary_threshold: float
+) -> np.ndarray:
+    """
+    Probability that at least one committee has more than `adversaries_threshold_per_committee` Byzantine members,
+    for each pair of (broadcast) `number_of_nodes` and `number_of_committees`
+    """
+    committee_size = number_of_nodes // number_of_committees
+    remainder = number_of_nodes % number_of_committees
+    committee_size_probability = binom.cdf(
+        np.floor(adversaries_threshold_per_committee * committee_size),
+        committee_size,
+        network_adversary_threshold
+    )
+    committee_size_plus_one_probability = binom.cdf(
+        np.floor(adversaries_threshold_per_committee * (committee_size + 1)),
+        committee_size + 1,
+        network_adversary_threshold
+    )
+    return (
+            1 - committee_size_probability ** (number_of_committees - remainder)
+            * committee_size_plus_one_probability ** remainder
+    )
+
+
+def plan(
+        number_of_nodes: Iterable[int],
+        failure_threshold: float,
+        adversaries_threshold_per_committee: float,
+        network_adversary_threshold: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :return: the number of committees and the failure probability computed by
+    `compute_optimal_number_of_committees_and_committee_size` for each number of nodes
+    """
+    assert failure_threshold > 0
+    nodes = np.asarray(list(number_of_nodes), dtype=np.int64)
+    # the single committee is the answer until a number of committees fails
+    committees = np.ones(len(nodes), dtype=np.int64)
+    probabilities = np.zeros(len(nodes))
+    unresolved = np.arange(len(nodes))
+    # candidates are the odd numbers of committees 3, 5, 7... and committees can not be empty
+    first, chunk = 1, INITIAL_CHUNK
+    while len(unresolved) and 2 * first + 1 <= nodes[unresolved].max():
+        candidates = 2 * np.arange(first, first + chunk) + 1
+        current = nodes[unresolved, None]
+        failed = failure_probabilities(
+            current, candidates[None, :], adversaries_threshold_per_committee, network_adversary_threshold
+        ) >= failure_threshold
+        # the last candidate before the first failure, or the best of the previous chunks
+        accepted = np.where(failed.any(axis=1), failed.argmax(axis=1), chunk) - 1
+        improved = accepted >= 0
+        rows, best = unresolved[improved], candidates[accepted[improved]]
+        committees[rows] = best
+        probabilities[rows] = failure_probabilities(
+            nodes[rows], best, adversaries_threshold_per_committee, network_adversary_threshold
+        )
+        unresolved = unresolved[~failed.any(axis=1)]
+        first, chunk = first + chunk, chunk * 2
+    return committees, probabilities
+
 
 def compute_optimal_number_of_committees_and_committee_size(
         number_of_nodes: int,
@@ -22,47 +97,109 @@ def compute_optimal_number_of_committees_and_committee_size(
         adversaries_threshold_per_committee: float,
         network_adversary_threshold: float
 ):
-    assert failure_threshold > 0
-    
-    # number_of_nodes is the number of nodes in the network 
+    # number_of_nodes is the number of nodes in the network
     # failure_threshold is the prob. of failure which can be tolerated
     # adversaries_threshold_per_committee is the fraction of Byzantine modes in a committee
     # network_adversary_threshold is the fraction of Byzantine nodes in the network
-    
-    number_of_committees = 1
-    committee_size = number_of_nodes
-    remainder = 0
-    current_probability = 0.0
-    odd_committee = 0
-    while current_probability < failure_threshold:
-        previous_number_of_committees = number_of_committees
-        previous_committee_size = committee_size
-        previous_remainder = remainder
-        previous_probability = current_probability
-        odd_committee = odd_committee + 1
-        number_of_committees = 2 * odd_committee + 1
-        committee_size = number_of_nodes // number_of_committees
-        remainder = number_of_nodes % number_of_committees
-
-        committee_size_probability = binom.cdf(
-            math.floor(adversaries_threshold_per_committee * committee_size),
-            committee_size,
-            network_adversary_threshold
+    committees, probabilities = plan(
+        [number_of_nodes], failure_threshold, adversaries_threshold_per_committee, network_adversary_threshold
+    )
+    number_of_committees = int(committees[0])
+    committee_size, remainder = divmod(number_of_nodes, number_of_committees)
+    return number_of_committees, committee_size, remainder, float(probabilities[0])
+
+
+@dataclass
+class CommitteeTable:
+    """
+    Number of committees for sorted network sizes. A network size between two entries uses the smaller one, i.e.
+    fewer committees than what it could afford.
+    """
+    failure_threshold: float
+    adversaries_threshold_per_committee: float
+    network_adversary_threshold: float
+    number_of_nodes: np.ndarray
+    number_of_committees: np.ndarray
+    failure_probability: np.ndarray
+
+    @classmethod
+    def build(
+            cls,
+            number_of_nodes: Iterable[int],
+            failure_threshold: float,
+            adversaries_threshold_per_committee: float = CARNOT_ADVERSARY_THRESHOLD_PER_COMMITTEE,
+            network_adversary_threshold: float = CARNOT_NETWORK_ADVERSARY_THRESHOLD
+    ) -> "CommitteeTable":
+        nodes = np.unique(np.asarray(list(number_of_nodes), dtype=np.int64))
+        committees, probabilities = plan(
+            nodes, failure_threshold, adversaries_threshold_per_committee, network_adversary_threshold
+        )
+        return cls(
+            failure_threshold, adversaries_threshold_per_committee, network_adversary_threshold,
+            nodes, committees, probabilities
+        )
+
+    def lookup(self, number_of_nodes: int) -> int:
+        i = int(np.searchsorted(self.number_of_nodes, number_of_nodes, side="right")) - 1
+        assert i >= 0, f"no entry for {number_of_nodes} nodes"
+        return int(self.number_of_committees[i])
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump({
+                "failure_threshold": self.failure_threshold,
+                "adversaries_threshold_per_committee": self.adversaries_threshold_per_committee,
+                "network_adversary_threshold": self.network_adversary_threshold,
+                "number_of_nodes": self.number_of_nodes.tolist(),
+                "number_of_committees": self.number_of_committees.tolist(),
+                "failure_probability": self.failure_probability.tolist(),
+            }, f)
+
+    @classmethod
+    def load(cls, path: str) -> "CommitteeTable":
+        with open(path) as f:
+            table = json.load(f)
+        return cls(
+            table["failure_threshold"],
+            table["adversaries_threshold_per_committee"],
+            table["network_adversary_threshold"],
+            np.asarray(table["number_of_nodes"], dtype=np.int64),
+            np.asarray(table["number_of_committees"], dtype=np.int64),
+            np.asarray(table["failure_probability"]),
         )
-        if 0 < remainder:
-            committee_size_plus_one_probability = binom.cdf(
-                math.floor(adversaries_threshold_per_committee * (committee_size + 1)),
-                committee_size + 1,
-                network_adversary_threshold
-            )
-            current_probability = (
-                    1 - committee_size_probability ** (number_of_committees - remainder)
-                    * committee_size_plus_one_probability ** remainder
-            )
-        else:
-            current_probability = 1 - committee_size_probability ** number_of_committees
-            
-    # return the number_of_committees, committee_size, remainder and current_probability
-    # computed at the previous iteration. 
-
-    return previous_number_of_committees, previous_committee_size, previous_remainder, previous_probability
+
+
+def sweep(
+        number_of_nodes: Iterable[int],
+        failure_threshold: float,
+        network_adversary_thresholds: Iterable[float],
+        adversaries_threshold_per_committee: float = CARNOT_ADVERSARY_THRESHOLD_PER_COMMITTEE
+) -> Dict[float, CommitteeTable]:
+    number_of_nodes: List[int] = list(number_of_nodes)
+    return {
+        threshold: CommitteeTable.build(
+            number_of_nodes, failure_threshold, adversaries_threshold_per_committee, threshold
+        )
+        for threshold in network_adversary_thresholds
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs=3, metavar=("START", "STOP", "STEP"), default=[100, 10_001, 100])
+    parser.add_argument("--failure-threshold", type=float, default=1e-6)
+    parser.add_argument("--adversaries-threshold-per-committee", type=float,
+                        default=CARNOT_ADVERSARY_THRESHOLD_PER_COMMITTEE)
+    parser.add_argument("--network-adversary-threshold", type=float, default=CARNOT_NETWORK_ADVERSARY_THRESHOLD)
+    parser.add_argument("--output", help="save the table as json")
+    args = parser.parse_args()
+    table = CommitteeTable.build(
+        range(*args.nodes), args.failure_threshold, args.adversaries_threshold_per_committee,
+        args.network_adversary_threshold
+    )
+    if args.output:
+        table.save(args.output)
+    for nodes, committees, probability in zip(
+            table.number_of_nodes, table.number_of_committees, table.failure_probability
+    ):
+        print(f"{nodes:>8} {committees:>6} {probability:.3e}")
@@ -0,0 +1,259 @@
+"""
+Dissemination of the Carnot events to committees and to the whole network.
+
+Sending a `Send` to a committee, or a `BroadCast`, as one message per recipient makes the sender (the leader for
+blocks) pay for every member. A `Disseminator` sends it through a tree instead:
+    * the recipients are ordered by the hash of the recipient set and of their id: the messages to the same
+      committee follow the same tree, so that relays can batch them, and the trees change with the committees at
+      every view. Broadcasts always follow the same tree.
+    * they are split in `fanout` groups, the first `redundancy` members of a group receive the message with the rest
+      of the group as their relay set, and split it again in the same way
+    * messages bound for the same peer are batched into one `Frame`, sent when the oldest message waited for
+      `window_ms` or when it is full
+    * a relayed message is identified by the hash of its payload and recipients: copies coming from redundant relays
+      are dropped. A payload is handed to the node once, even if it is sent again, e.g. votes forwarded by several
+      root committee members.
+A relay which crashed loses its whole group, unless `redundancy` is larger than one.
+
+Without a `fanout`, every recipient gets the message directly, like one message per recipient, and only the
+batching applies: the envelopes then carry no message id, copies are dropped by the hash of their payload.
+
+Like `CarnotDriver`, a `Disseminator` does no IO: the simulator (or a runtime) delivers the frames it returns and
+calls `flush` when `next_flush` is due. Payloads are encoded once by their origin with `carnot.codec`, relays
+forward the encoding.
+"""
+from dataclasses import dataclass, field
+from hashlib import sha256
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from carnot.carnot import Id, Payload
+from carnot.codec import VERSION, DecodeError, Reader, Writer, decode, encode
+
+MESSAGE_ID_LENGTH = 16
+
+
+@dataclass(frozen=True)
+class Envelope:
+    message_id: bytes
+    # encoded payload
+    data: bytes
+    payload: Payload = field(compare=False)
+    # recipients the receiver forwards the payload to
+    relay: Tuple[Id, ...] = ()
+
+
+@dataclass
+class Frame:
+    envelopes: List[Envelope] = field(default_factory=list)
+
+
+def varint_size(value: int) -> int:
+    return max(1, (value.bit_length() + 6) // 7)
+
+
+def relay_size(relay: Sequence[Id], members: Optional[Sequence[Id]] = None) -> int:
+    """
+    Bytes taken by a relay set, as a bitmap over `members` or as a list of ids, whichever is smaller
+    """
+    size = varint_size(len(relay)) + sum(
+        varint_size(len(_id)) + len(_id) for _id in relay
+    )
+    if members is not None:
+        bitmap = (len(members) + 7) // 8
+        size = min(size, varint_size(bitmap) + bitmap)
+    return 1 + size
+
+
+def relay_as_bitmap(relay: Sequence[Id], members: Optional[Sequence[Id]]) -> bool:
+    return members is not None and relay_size(relay, members) < relay_size(relay)
+
+
+def envelope_size(envelope: Envelope, members: Optional[Sequence[Id]] = None) -> int:
+    """
+    Bytes taken by the envelope in `encode_frame`
+    """
+    return (
+        1
+        + len(envelope.message_id)
+        + varint_size(len(envelope.data))
+        + len(envelope.data)
+        + relay_size(envelope.relay, members)
+    )
+
+
+def frame_size(frame: Frame, members: Optional[Sequence[Id]] = None) -> int:
+    return (
+        varint_size(VERSION)
+        + varint_size(len(frame.envelopes))
+        + sum(envelope_size(envelope, members) for envelope in frame.envelopes)
+    )
+
+
+def encode_frame(frame: Frame, members: Optional[Sequence[Id]] = None) -> bytes:
+    """
+    :param members: all the nodes sorted by id, to send the relay sets as bitmaps
+    """
+    writer = Writer(members)
+    writer.varint(VERSION)
+    writer.varint(len(frame.envelopes))
+    for envelope in frame.envelopes:
+        writer.bytes(envelope.message_id)
+        writer.bytes(envelope.data)
+        writer.members = members if relay_as_bitmap(envelope.relay, members) else None
+        writer.ids(envelope.relay)
+    return bytes(writer.buffer)
+
+
+def decode_frame(
+    data: bytes | memoryview, members: Optional[Sequence[Id]] = None
+) -> Frame:
+    reader = Reader(data, members)
+    if (version := reader.varint()) != VERSION:
+        raise DecodeError(f"unsupported codec version {version}")
+    frame = Frame()
+    for _ in range(reader.varint()):
+        message_id = reader.bytes()
+        payload_data = reader.bytes()
+        relay = tuple(sorted(reader.ids()))
+        frame.envelopes.append(
+            Envelope(message_id, payload_data, decode(payload_data), relay)
+        )
+    if reader.offset != len(reader.data):
+        raise DecodeError("trailing bytes")
+    return frame
+
+
+def recipients_digest(recipients: Sequence[Id]) -> bytes:
+    digest = sha256()
+    for recipient in sorted(recipients):
+        digest.update(recipient)
+    return digest.digest()
+
+
+def message_id(data: bytes, recipients: Sequence[Id]) -> bytes:
+    return sha256(data + recipients_digest(recipients)).digest()[:MESSAGE_ID_LENGTH]
+
+
+class Disseminator:
+    def __init__(
+        self,
+        _id: Id,
+        fanout: Optional[int] = 8,
+        redundancy: int = 1,
+        window_ms: float = 0.0,
+        max_frame_envelopes: int = 64,
+        seen_size: int = 1 << 16,
+    ):
+        """
+        :param fanout: number of groups the recipients of a message are split in, at every hop, or None to send
+            to every recipient directly
+        :param redundancy: number of members of a group receiving the message from the previous hop
+        :param window_ms: how long messages wait for others bound for the same peer
+        :param seen_size: number of message ids and payloads remembered for deduplication
+        """
+        assert (
+            (fanout is None or fanout > 0)
+            and redundancy > 0
+            and max_frame_envelopes > 0
+        )
+        self.id = _id
+        self.fanout = fanout
+        self.redundancy = redundancy
+        self.window_ms = window_ms
+        self.max_frame_envelopes = max_frame_envelopes
+        self.seen_size = seen_size
+        self.pending: Dict[Id, List[Envelope]] = {}
+        self.deadlines: Dict[Id, float] = {}
+        # ids of the messages relayed, and hashes of the payloads delivered, dicts keep the insertion order
+        self.seen: Dict[bytes, None] = {}
+        self.delivered: Dict[bytes, None] = {}
+        self.duplicates = 0
+
+    def send(self, to: Sequence[Id], payload: Payload, now: float) -> List[Payload]:
+        """
+        :return: the payload, if this node is one of its recipients and did not receive it yet
+        """
+        data = encode(payload)
+        recipients = [
+            recipient for recipient in dict.fromkeys(to) if recipient != self.id
+        ]
+        if recipients and self.fanout is None:
+            for recipient in recipients:
+                self.enqueue(recipient, Envelope(b"", data, payload), now)
+        elif recipients:
+            _id = message_id(data, recipients)
+            self.remember(self.seen, _id)
+            self.route(Envelope(_id, data, payload), recipients, now)
+        return [payload] if self.id in to and self.deliver(data) else []
+
+    def receive(self, frame: Frame, now: float) -> List[Payload]:
+        """
+        Relays the messages of `frame`
+        :return: the payloads to hand over to the node, duplicates are left out
+        """
+        payloads = []
+        for envelope in frame.envelopes:
+            if envelope.message_id in self.seen:
+                self.duplicates += 1
+                continue
+            if envelope.message_id:
+                self.remember(self.seen, envelope.message_id)
+            if envelope.relay:
+                self.route(envelope, envelope.relay, now)
+            if self.deliver(envelope.data):
+                payloads.append(envelope.payload)
+        return payloads
+
+    def route(self, envelope: Envelope, recipients: Sequence[Id], now: float):
+        key = recipients_digest(recipients)
+        ordered = sorted(recipients, key=lambda _id: sha256(key + _id).digest())
+        groups = min(self.fanout, len(ordered))
+        size, remainder = divmod(len(ordered), groups)
+        start = 0
+        for group in range(groups):
+            end = start + size + (group < remainder)
+            heads = ordered[start : start + self.redundancy]
+            relay = tuple(sorted(ordered[start + self.redundancy : end]))
+            for head in heads:
+                self.enqueue(
+                    head,
+                    Envelope(
+                        envelope.message_id, envelope.data, envelope.payload, relay
+                    ),
+                    now,
+                )
+            start = end
+
+    def enqueue(self, peer: Id, envelope: Envelope, now: float):
+        if peer not in self.pending:
+            self.pending[peer] = []
+            self.deadlines[peer] = now + self.window_ms
+        self.pending[peer].append(envelope)
+        if len(self.pending[peer]) >= self.max_frame_envelopes:
+            self.deadlines[peer] = now
+
+    def flush(self, now: float) -> List[Tuple[Id, Frame]]:
+        """
+        :return: the frames to send now, with their recipient
+        """
+        due = [peer for peer, deadline in self.deadlines.items() if deadline <= now]
+        frames = []
+        for peer in due:
+            del self.deadlines[peer]
+            frames.append((peer, Frame(self.pending.pop(peer))))
+        return frames
+
+    def next_flush(self) -> Optional[float]:
+        return min(self.deadlines.values(), default=None)
+
+    def deliver(self, data: bytes) -> bool:
+        digest = sha256(data).digest()
+        if digest in self.delivered:
+            return False
+        self.remember(self.delivered, digest)
+        return True
+
+    def remember(self, seen: Dict[bytes, None], key: bytes):
+        seen[key] = None
+        while len(seen) > self.seen_size:
+            del seen[next(iter(seen))]
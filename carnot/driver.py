@@ -0,0 +1,329 @@
+"""
+Sans-IO driver for a BeaconizedCarnot node.
+
+`BeaconizedCarnot` only exposes the protocol steps (receive a block, approve it with the votes of the children, detect
+a timeout...), each one with preconditions on what the node has already seen. The driver turns a stream of incoming
+payloads into those steps: it aggregates votes, timeouts and new views with `QuorumAccumulator`s, buffers messages
+arriving before what they depend on, and returns the events the node wants to send. It does no IO and keeps no
+clock, so the same driver runs in the discrete event simulator and in the asyncio runtime, which deliver the events
+and call `on_local_timeout` when their view timer expires.
+
+Votes (and new views) for a view are aggregated with the overlay the node held when it started voting on that view:
+the overlay changes with every beacon, so messages are not checked against the current one. Root committee members
+forward the votes of their children to the next leader, as its quorum is made of the root committee and its
+children.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple, Type
+
+from carnot.accumulator import Message, QuorumAccumulator, sender
+from carnot.beaconized_carnot import BeaconizedBlock, BeaconizedCarnot
+from carnot.carnot import (
+    Event,
+    Id,
+    NewView,
+    Overlay,
+    Payload,
+    Send,
+    StandardQc,
+    Timeout,
+    TimeoutQc,
+    View,
+    Vote,
+)
+
+
+def recipients(event: Send) -> List[Id]:
+    """
+    `Send.to` is either a single id (a leader), a committee or a list of ids
+    """
+    match event.to:
+        case bytes() as _id:
+            return [_id]
+        case None:
+            return []
+        case to:
+            return list(to)
+
+
+@dataclass
+class Round:
+    """
+    Aggregation of the votes (or new views) of a view, with the overlay they are sent with
+    """
+
+    kind: Type[Vote] | Type[NewView]
+    view: View
+    overlay: Overlay
+    # the node proposing the next block with the quorum of this round
+    proposer: Id
+    # messages from the children of the node, None for leafs
+    children: Optional[QuorumAccumulator]
+    # messages from the root committee and its children, if this node is the proposer
+    leader: Optional[QuorumAccumulator]
+    # root committee members forward the messages of their children to the proposer
+    forward: bool
+    block: Optional[BeaconizedBlock] = None
+    timeout_qc: Optional[TimeoutQc] = None
+    voted: bool = False
+    received: List[Message] = field(default_factory=list)
+    forwarded: Set[Id] = field(default_factory=set)
+
+
+class CarnotDriver:
+    def __init__(self, node: BeaconizedCarnot):
+        self.node = node
+        # blocks whose parent has not been received yet, by parent id
+        self.orphans: Dict[Id, List[BeaconizedBlock]] = defaultdict(list)
+        self.rounds: Dict[Tuple[type, View], Round] = {}
+        # round of the latest block, until the node voted for it or moved past it
+        self.pending: Optional[Round] = None
+        # messages for rounds that are not open yet
+        self.inbox: Dict[Tuple[type, View], List[Message]] = defaultdict(list)
+        self.timeouts: Dict[View, QuorumAccumulator] = {}
+        self.early_timeouts: List[Timeout] = []
+        self.timed_out_view: View = 0
+        # quorum reached as proposer, waiting for the node to move to the next overlay
+        self.ready: Optional[Tuple[Round, List[Message]]] = None
+        self.followed_view: View = 0
+        self.timeout_qc_view: View = -1
+        # incremented on every step forward, runtimes reset their view timer when it changes
+        self.progress: int = 0
+
+    @property
+    def id(self) -> Id:
+        return self.node.id
+
+    def start(self, genesis: BeaconizedBlock):
+        self.node.safe_blocks[genesis.id()] = genesis
+        self.node.local_high_qc = genesis.qc
+        self.node.current_view = 1
+        self.node.overlay = self.node.overlay.advance(genesis.beacon.entropy())
+
+    def propose_first_block(
+        self, genesis: BeaconizedBlock, voters: List[Id]
+    ) -> List[Event]:
+        """
+        There are no votes for the genesis block, the first leader makes them up as in the tests
+        """
+        quorum = {
+            Vote(
+                block=genesis.id(),
+                view=0,
+                voter=voter,
+                qc=StandardQc(block=genesis.id(), view=0),
+            )
+            for voter in voters[
+                : self.node.overlay.leader_super_majority_threshold(self.id)
+            ]
+        }
+        self.progress += 1
+        return [self.node.propose_block(1, quorum)]
+
+    def handle(self, payload: Payload) -> List[Event]:
+        match payload:
+            case BeaconizedBlock():
+                return self.on_block(payload)
+            case Vote() | NewView():
+                return self.on_message(payload)
+            case Timeout():
+                return self.on_timeout(payload)
+            case TimeoutQc():
+                return self.on_timeout_qc(payload)
+        return []
+
+    def on_local_timeout(self) -> List[Event]:
+        # nodes that did not get the votes for the latest block still follow it, so that the timeouts of all nodes
+        # are collected by the same root committee
+        self.abandon_pending()
+        self.ready = None
+        event = self.node.local_timeout()
+        self.timed_out_view = self.node.current_view
+        events = [event] if event is not None else []
+        early, self.early_timeouts = self.early_timeouts, []
+        for timeout in early:
+            events += self.on_timeout(timeout)
+        return events
+
+    def on_block(self, block: BeaconizedBlock) -> List[Event]:
+        parent = block.parent()
+        if (
+            parent not in self.node.safe_blocks
+            and parent not in self.node.committed_log
+        ):
+            self.orphans[parent].append(block)
+            return []
+        self.node.receive_block(block)
+        events = []
+        if block.id() in self.node.safe_blocks and block.view > self.followed_view:
+            events += self.open_block_round(block)
+        for child in self.orphans.pop(block.id(), []):
+            events += self.on_block(child)
+        return events
+
+    def on_message(self, msg: Vote | NewView) -> List[Event]:
+        kind = type(msg)
+        if (round := self.rounds.get((kind, msg.view))) is None:
+            horizon = self.followed_view if kind is Vote else self.timeout_qc_view + 1
+            if msg.view > horizon:
+                self.inbox[(kind, msg.view)].append(msg)
+            return []
+
+        events = []
+        _sender = sender(msg)
+        if round.children is not None and round.overlay.is_member_of_child_committee(
+            self.id, _sender
+        ):
+            if not round.voted:
+                round.received.append(msg)
+                if (quorum := round.children.add(msg)) is not None:
+                    events += self.vote(round, quorum)
+            elif round.forward and _sender not in round.forwarded:
+                round.forwarded.add(_sender)
+                events.append(Send(to=[round.proposer], payload=msg))
+        if round.leader is not None and (quorum := round.leader.add(msg)) is not None:
+            self.ready = (round, quorum)
+            events += self.try_propose()
+        return events
+
+    def on_timeout(self, timeout: Timeout) -> List[Event]:
+        node = self.node
+        if timeout.view < node.current_view:
+            return []
+        if timeout.view > self.timed_out_view:
+            # the overlay of the node may still be behind until it times out itself
+            self.early_timeouts.append(timeout)
+            return []
+        if not node.overlay.is_member_of_root_committee(self.id):
+            return []
+        if (accumulator := self.timeouts.get(timeout.view)) is None:
+            accumulator = self.timeouts[
+                timeout.view
+            ] = QuorumAccumulator.root_and_children(node.overlay, self.id)
+        if (quorum := accumulator.add(timeout)) is not None:
+            return [node.timeout_detected(quorum)]
+        return []
+
+    def on_timeout_qc(self, timeout_qc: TimeoutQc) -> List[Event]:
+        if (
+            timeout_qc.view <= self.timeout_qc_view
+            or timeout_qc.view < self.node.current_view
+        ):
+            return []
+        # the recovery beacon is derived from the beacon of the latest block
+        self.abandon_pending()
+        # same as `receive_timeout_qc` unless the timeout qcs of previous views were missed
+        self.node.catch_up(timeout_qc)
+        self.timeout_qc_view = timeout_qc.view
+        self.timeouts = {
+            view: acc for view, acc in self.timeouts.items() if view > timeout_qc.view
+        }
+        self.early_timeouts = [
+            timeout for timeout in self.early_timeouts if timeout.view > timeout_qc.view
+        ]
+        overlay = self.node.overlay
+        return self.open_round(
+            NewView,
+            timeout_qc.view + 1,
+            overlay,
+            overlay.leader(),
+            timeout_qc=timeout_qc,
+        )
+
+    def open_block_round(self, block: BeaconizedBlock) -> List[Event]:
+        self.abandon_pending()
+        self.followed_view = block.view
+        overlay = self.node.overlay
+        return self.open_round(
+            Vote, block.view, overlay, overlay.next_leader(), block=block
+        )
+
+    def open_round(
+        self,
+        kind: Type[Vote] | Type[NewView],
+        view: View,
+        overlay: Overlay,
+        proposer: Id,
+        block: Optional[BeaconizedBlock] = None,
+        timeout_qc: Optional[TimeoutQc] = None,
+    ) -> List[Event]:
+        self.progress += 1
+        leaf = overlay.super_majority_threshold(self.id) == 0
+        round = Round(
+            kind=kind,
+            view=view,
+            overlay=overlay,
+            proposer=proposer,
+            children=None
+            if leaf
+            else QuorumAccumulator.child_committee(overlay, self.id),
+            leader=QuorumAccumulator.root_and_children(overlay, self.id)
+            if proposer == self.id
+            else None,
+            forward=overlay.is_member_of_root_committee(self.id),
+            block=block,
+            timeout_qc=timeout_qc,
+        )
+        # rounds of older views can not be voted for anymore
+        self.rounds = {key: r for key, r in self.rounds.items() if key[1] >= view - 2}
+        self.rounds[(kind, view)] = round
+        if kind is Vote:
+            self.pending = round
+
+        events = self.vote(round, []) if leaf else []
+        for msg in self.inbox.pop((kind, view), []):
+            events += self.on_message(msg)
+        self.inbox = defaultdict(
+            list, {key: msgs for key, msgs in self.inbox.items() if key[1] > view - 2}
+        )
+        return events
+
+    def vote(self, round: Round, quorum: List[Message]) -> List[Event]:
+        node = self.node
+        if round.kind is Vote:
+            if round is not self.pending or node.highest_voted_view >= round.view:
+                return []
+            event = node.approve_block(round.block, set(quorum))
+            self.pending = None
+        else:
+            if (
+                round.view != self.timeout_qc_view + 1
+                or node.highest_voted_view >= round.view
+            ):
+                return []
+            event = node.approve_new_view(round.timeout_qc, quorum)
+        round.voted = True
+        self.progress += 1
+        events = [event]
+        if round.forward:
+            for msg in round.received:
+                if (_sender := sender(msg)) not in round.forwarded:
+                    round.forwarded.add(_sender)
+                    events.append(Send(to=[round.proposer], payload=msg))
+        return events + self.try_propose()
+
+    def abandon_pending(self):
+        if self.pending is not None:
+            self.node.follow_block(self.pending.block)
+            self.pending = None
+
+    def try_propose(self) -> List[Event]:
+        if self.ready is None:
+            return []
+        round, quorum = self.ready
+        if round.kind is Vote:
+            if round.view != self.followed_view:
+                # a later block was received meanwhile
+                self.ready = None
+                return []
+            # the quorum is there without our own vote, move to the next overlay
+            self.abandon_pending()
+        elif round.view != self.timeout_qc_view + 1:
+            self.ready = None
+            return []
+        self.ready = None
+        if not self.node.overlay.is_leader(self.id):
+            return []
+        self.progress += 1
+        return [self.node.propose_block(round.view + 1, quorum)]
@@ -0,0 +1,219 @@
+import functools
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Self, Sequence
+
+from carnot.carnot import Carnot, View
+from carnot.probe import probe
+
+
+@dataclass
+class Timer:
+    count: int = 0
+    total_s: float = 0.0
+    max_s: float = 0.0
+
+    def record(self, elapsed_s: float):
+        self.count += 1
+        self.total_s += elapsed_s
+        self.max_s = max(self.max_s, elapsed_s)
+
+
+@dataclass(frozen=True)
+class Span:
+    name: str
+    # current view of the node when the span started
+    view: View
+    start_s: float
+    duration_s: float
+
+
+# Carnot methods that are timed when instrumented
+TIMED_METHODS = (
+    "receive_block",
+    "approve_block",
+    "propose_block",
+    "timeout_detected",
+    "approve_new_view",
+)
+# Functions shared by every node, timed by `carnot.probe`
+SHARED_TIMERS = (
+    "overlay_advance",
+    "overlay_advance_many",
+    "beacon_verify",
+)
+
+
+class CarnotInstrumentation:
+    """
+    Opt-in timing spans and counters for the hot path of a Carnot node, by view.
+
+    `Carnot` knows nothing about this class: `attach` shadows the methods of a single
+    node instance with timed wrappers, so nodes which are not instrumented run exactly
+    the same code as before, the shared functions below only look up an unset probe.
+
+    Overlay construction (`CarnotOverlay.advance` and `advance_many`) and beacon
+    verification (`RandomBeaconHandler.verify_happy`, whether it checks the beacon itself
+    or through a shared `BeaconVerifier`) are shared by every node, they report to
+    `carnot.probe.probe`, which the timed methods set for their duration. Their spans go to
+    the node whose timed method runs in the same thread or task; calls made from elsewhere,
+    e.g. by the driver, are not recorded.
+
+    Spans can be exported as a dict with `snapshot`, or as Chrome trace events with
+    `chrome_trace`, to be loaded in `chrome://tracing` or Perfetto.
+    """
+
+    def __init__(self, max_spans: int = 1 << 20):
+        """
+        :param max_spans: spans kept, the following ones are only counted in the timers
+        """
+        self.max_spans = max_spans
+        self.node: Optional[Carnot] = None
+        # name of the thread of the node in Chrome traces
+        self.thread_name: Optional[str] = None
+        self.spans: List[Span] = []
+        self.dropped_spans = 0
+        self.invalid_beacons = 0
+        self.timers: Dict[str, Timer] = {
+            name: Timer() for name in (*TIMED_METHODS, *SHARED_TIMERS)
+        }
+
+    def attach(self, node: Carnot) -> Self:
+        assert self.node is None, "instrumentation is already attached"
+        self.node = node
+        self.thread_name = f"node {bytes(node.id).hex()[:8]}"
+        for name in TIMED_METHODS:
+            setattr(node, name, self.__timed(name, getattr(node, name)))
+        return self
+
+    def detach(self):
+        assert self.node is not None, "instrumentation is not attached"
+        for name in TIMED_METHODS:
+            # drop the instance attribute so that lookups resolve to the class again
+            delattr(self.node, name)
+        self.node = None
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_):
+        if self.node is not None:
+            self.detach()
+
+    def __timed(self, name: str, method: Callable) -> Callable:
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            view = self.node.current_view
+            token = probe.set(self.__probe)
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                probe.reset(token)
+                self.record(name, start, elapsed, view)
+
+        return timed
+
+    def __probe(self, name: str, start_s: float, elapsed_s: float, result: Any):
+        if self.node is None:
+            return
+        self.record(name, start_s, elapsed_s)
+        if name == "beacon_verify" and not result:
+            self.invalid_beacons += 1
+
+    def record(
+        self, name: str, start_s: float, elapsed_s: float, view: Optional[View] = None
+    ):
+        self.timers[name].record(elapsed_s)
+        if len(self.spans) >= self.max_spans:
+            self.dropped_spans += 1
+            return
+        if view is None:
+            view = self.node.current_view if self.node is not None else -1
+        self.spans.append(Span(name, view, start_s, elapsed_s))
+
+    def views(self) -> Dict[View, Dict[str, Timer]]:
+        """
+        Timers of the spans by view
+        """
+        views: Dict[View, Dict[str, Timer]] = defaultdict(lambda: defaultdict(Timer))
+        for span in self.spans:
+            views[span.view][span.name].record(span.duration_s)
+        return views
+
+    def snapshot(self) -> dict:
+        return {
+            "timers": {
+                name: {
+                    "count": timer.count,
+                    "total_s": timer.total_s,
+                    "max_s": timer.max_s,
+                }
+                for name, timer in self.timers.items()
+            },
+            "views": {
+                view: {
+                    name: {
+                        "count": timer.count,
+                        "total_s": timer.total_s,
+                        "max_s": timer.max_s,
+                    }
+                    for name, timer in timers.items()
+                }
+                for view, timers in sorted(self.views().items())
+            },
+            "counters": {
+                "blocks": self.timers["receive_block"].count,
+                "votes": self.timers["approve_block"].count
+                + self.timers["approve_new_view"].count,
+                "proposals": self.timers["propose_block"].count,
+                "timeout_qcs": self.timers["timeout_detected"].count,
+                "overlays": self.timers["overlay_advance"].count
+                + self.timers["overlay_advance_many"].count,
+                "beacon_verifications": self.timers["beacon_verify"].count,
+                "invalid_beacons": self.invalid_beacons,
+                "dropped_spans": self.dropped_spans,
+            },
+        }
+
+    def trace_events(self, pid: int = 0, tid: int = 0) -> List[dict]:
+        """
+        Spans as complete ("X") Chrome trace events, in microseconds
+        """
+        events = []
+        if self.thread_name is not None:
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": self.thread_name},
+                }
+            )
+        for span in self.spans:
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": "carnot",
+                    "ph": "X",
+                    "pid": pid,
+                    "tid": tid,
+                    "ts": span.start_s * 1e6,
+                    "dur": span.duration_s * 1e6,
+                    "args": {"view": span.view},
+                }
+            )
+        return events
+
+
+def chrome_trace(instrumentations: Sequence[CarnotInstrumentation]) -> dict:
+    """
+    Trace of several nodes, one thread each, to be written with `json.dump`
+    """
+    events = []
+    for tid, instrumentation in enumerate(instrumentations):
+        events += instrumentation.trace_events(tid=tid)
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
@@ -0,0 +1,327 @@
+"""
+asyncio runtime for a `BeaconizedCarnot` node.
+
+The protocol logic lives in the sans-IO `CarnotDriver`, the runtime only feeds it and delivers what it returns:
+    * the receiver takes payloads from the bounded inbound queue and hands them to the driver
+    * the sender takes the events of the driver from the bounded outbound queue and delivers them through a
+      `Transport`
+    * the view timer calls `on_local_timeout` when the driver made no progress for a whole view timeout
+Full inbound queues block the senders of the peers: a node that can not keep up slows down its peers instead of
+buffering without bound. The receiver never waits for the sender, events which do not fit in the outbound queue are
+dropped and counted, otherwise two nodes sending to each other could both wait for the other to receive.
+
+The view timeout adapts to the network: it is a multiple of the moving average of the duration of the views that
+completed without a timeout, doubled after each consecutive timeout, within fixed bounds.
+
+With a `SafetyLog`, the safety state of the node is restored when it starts and checkpointed after every step, before
+its events are sent, so that a restarted node does not vote twice (see `carnot.wal`).
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from abc import abstractmethod
+from collections import Counter
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Self, TypeAlias
+
+from carnot.beaconized_carnot import BeaconizedBlock
+from carnot.carnot import BroadCast, Event, Id, Payload, Send, View
+from carnot.driver import CarnotDriver, recipients
+from carnot.wal import SafetyLog
+
+PayloadQueue: TypeAlias = "asyncio.Queue[Payload]"
+EventQueue: TypeAlias = "asyncio.Queue[Event]"
+
+
+class Transport:
+    @abstractmethod
+    def members(self) -> List[Id]:
+        """
+        Ids of all the nodes, the recipients of a broadcast
+        """
+        pass
+
+    @abstractmethod
+    async def send(self, to: List[Id], payload: Payload):
+        """
+        Returns once the payload has been handed over to every recipient, which can take a while if they are busy
+        """
+        pass
+
+    def warm_up(self, peers: List[Id]):
+        """
+        Hint that messages will be sent to `peers` soon, e.g. the upcoming leaders, transports can open connections
+        to them ahead of time
+        """
+        pass
+
+
+class LocalTransport(Transport):
+    """
+    Delivers payloads to the inbound queues of nodes running in the same event loop
+    """
+
+    def __init__(self):
+        self.queues: Dict[Id, PayloadQueue] = {}
+        self.ids: List[Id] = []
+
+    def connect(self, _id: Id, queue_size: int = 1024) -> PayloadQueue:
+        """
+        :return: the inbound queue of the node
+        """
+        queue = self.queues[_id] = asyncio.Queue(maxsize=queue_size)
+        self.ids.append(_id)
+        return queue
+
+    def disconnect(self, _id: Id):
+        """
+        Payloads to a disconnected node are dropped, as if it crashed
+        """
+        self.queues.pop(_id, None)
+
+    def members(self) -> List[Id]:
+        return self.ids
+
+    async def send(self, to: List[Id], payload: Payload):
+        for recipient in to:
+            if (queue := self.queues.get(recipient)) is not None:
+                await queue.put(payload)
+
+
+class AdaptiveTimeout:
+    def __init__(
+        self,
+        initial_s: float = 1.0,
+        min_s: float = 0.05,
+        max_s: float = 30.0,
+        multiplier: float = 4.0,
+        smoothing: float = 0.2,
+    ):
+        """
+        :param initial_s: view timeout until a view completes
+        :param multiplier: view timeout as a multiple of the average view duration
+        :param smoothing: weight of the latest view in the moving average
+        """
+        assert 0 < min_s <= initial_s <= max_s
+        self.min_s = min_s
+        self.max_s = max_s
+        self.multiplier = multiplier
+        self.smoothing = smoothing
+        self.average_s: Optional[float] = None
+        self.initial_s = initial_s
+        self.consecutive_timeouts = 0
+
+    def observe(self, duration_s: float):
+        """
+        A view completed without timing out
+        """
+        if self.average_s is None:
+            self.average_s = duration_s
+        else:
+            self.average_s += self.smoothing * (duration_s - self.average_s)
+        self.consecutive_timeouts = 0
+
+    def expired(self):
+        self.consecutive_timeouts += 1
+
+    def timeout(self) -> float:
+        base = (
+            self.initial_s
+            if self.average_s is None
+            else self.multiplier * self.average_s
+        )
+        return min(self.max_s, max(self.min_s, base) * 2**self.consecutive_timeouts)
+
+
+@dataclass
+class NodeMetrics:
+    # Seconds spent in each view, from entering it to entering the next one
+    view_latency_s: Dict[View, float] = field(default_factory=dict)
+    # Views left through a timeout
+    timed_out_views: List[View] = field(default_factory=list)
+    # Depth of the inbound queue, sampled at every view change
+    inbound_queue_depth: List[int] = field(default_factory=list)
+    # Seconds the sender waited for the peers to take its payloads
+    backpressure_s: float = 0.0
+    # Events dropped because the outbound queue was full
+    outbound_dropped: int = 0
+    payloads_handled: int = 0
+    # Payloads the node refused, e.g. out of order or invalid
+    payloads_rejected: int = 0
+    # Messages sent by payload type, a payload to a committee counts once per member
+    messages_sent: Counter = field(default_factory=Counter)
+    local_timeouts: int = 0
+
+
+class CarnotNode:
+    """
+    Runs a `CarnotDriver` in real time, see the module documentation.
+    """
+
+    driver: CarnotDriver
+    transport: Transport
+    view_timeout: AdaptiveTimeout
+    now: Callable[[], float]
+    # Payloads received from other nodes
+    inbound_queue: PayloadQueue
+    # Events of the driver, waiting to be sent
+    outbound_queue: EventQueue
+    metrics: NodeMetrics
+    # set whenever the driver makes progress, to restart the view timer
+    progressed: asyncio.Event
+    last_progress: int
+    upcoming_timeouts: int
+    safety_log: Optional[SafetyLog]
+    strict: bool
+    view: View
+    view_started: float
+    timed_out: bool
+    tasks: List[
+        asyncio.Task
+    ]  # References just to prevent tasks from being garbage collected
+
+    @classmethod
+    async def new(
+        cls,
+        driver: CarnotDriver,
+        transport: Transport,
+        genesis: BeaconizedBlock,
+        view_timeout: Optional[AdaptiveTimeout] = None,
+        now: Callable[[], float] = time.monotonic,
+        inbound_queue: Optional[PayloadQueue] = None,
+        outbound_queue_size: int = 1024,
+        upcoming_timeouts: int = 1,
+        safety_log: Optional[SafetyLog] = None,
+        strict: bool = False,
+    ) -> Self:
+        """
+        :param inbound_queue: the queue the transport delivers to, e.g. from `LocalTransport.connect`
+        :param upcoming_timeouts: the transport is warmed up with the leaders proposing after up to this many timeouts
+        :param safety_log: restores the state of the node, if it ran before, and persists it
+        :param strict: a payload failing an assertion of the node stops the receiver instead of being counted as
+        rejected, the assertion is raised by `cancel`
+        """
+        self = cls()
+        self.driver = driver
+        self.transport = transport
+        self.view_timeout = (
+            view_timeout if view_timeout is not None else AdaptiveTimeout()
+        )
+        self.now = now
+        self.inbound_queue = (
+            inbound_queue if inbound_queue is not None else asyncio.Queue(maxsize=1024)
+        )
+        self.outbound_queue = asyncio.Queue(maxsize=outbound_queue_size)
+        self.metrics = NodeMetrics()
+        self.progressed = asyncio.Event()
+        self.upcoming_timeouts = upcoming_timeouts
+        self.safety_log = safety_log
+        self.strict = strict
+
+        driver.start(genesis)
+        restored = safety_log.open(driver.node) if safety_log is not None else False
+        self.last_progress = driver.progress
+        self.view = driver.node.current_view
+        self.view_started = now()
+        self.timed_out = False
+        self.tasks = [
+            asyncio.create_task(self.__receive()),
+            asyncio.create_task(self.__send()),
+            asyncio.create_task(self.__timer()),
+        ]
+        if not restored and driver.node.overlay.is_leader(driver.id):
+            self.__dispatch(driver.propose_first_block(genesis, transport.members()))
+        return self
+
+    @property
+    def id(self) -> Id:
+        return self.driver.id
+
+    async def __receive(self):
+        while True:
+            payload = await self.inbound_queue.get()
+            try:
+                try:
+                    events = self.driver.handle(payload)
+                except AssertionError:
+                    if self.strict:
+                        raise
+                    self.metrics.payloads_rejected += 1
+                    continue
+                self.metrics.payloads_handled += 1
+                self.__dispatch(events)
+            finally:
+                self.inbound_queue.task_done()
+
+    def __dispatch(self, events: List[Event]):
+        if self.safety_log is not None:
+            self.safety_log.checkpoint()
+        self.__observe_view()
+        if self.driver.progress != self.last_progress:
+            self.last_progress = self.driver.progress
+            self.progressed.set()
+        for event in events:
+            try:
+                self.outbound_queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.metrics.outbound_dropped += 1
+
+    def __observe_view(self):
+        view = self.driver.node.current_view
+        if view <= self.view:
+            return
+        now = self.now()
+        self.metrics.view_latency_s[self.view] = now - self.view_started
+        self.metrics.inbound_queue_depth.append(self.inbound_queue.qsize())
+        if self.timed_out:
+            self.metrics.timed_out_views.append(self.view)
+        else:
+            self.view_timeout.observe(now - self.view_started)
+        self.view, self.view_started, self.timed_out = view, now, False
+        self.transport.warm_up(
+            self.driver.node.upcoming_leaders(self.upcoming_timeouts)
+        )
+
+    async def __send(self):
+        while True:
+            event = await self.outbound_queue.get()
+            try:
+                match event:
+                    case BroadCast(payload=payload):
+                        to = self.transport.members()
+                    case Send(payload=payload) as send:
+                        to = recipients(send)
+                    case _:
+                        continue
+                self.metrics.messages_sent[type(payload).__name__] += len(to)
+                start = self.now()
+                await self.transport.send(to, payload)
+                self.metrics.backpressure_s += self.now() - start
+            finally:
+                self.outbound_queue.task_done()
+
+    async def __timer(self):
+        while True:
+            self.progressed.clear()
+            try:
+                # unlike `wait_for`, does not swallow a cancellation arriving along with the progress
+                async with asyncio.timeout(self.view_timeout.timeout()):
+                    await self.progressed.wait()
+            except TimeoutError:
+                self.metrics.local_timeouts += 1
+                self.view_timeout.expired()
+                self.timed_out = True
+                self.__dispatch(self.driver.on_local_timeout())
+
+    async def cancel(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        try:
+            for task in self.tasks:
+                with suppress(asyncio.CancelledError):
+                    await task
+        finally:
+            if self.safety_log is not None:
+                self.safety_log.close()
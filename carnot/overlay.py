@@ -1,7 +1,9 @@
-import random
 from abc import abstractmethod
-from typing import Set, Optional, List, Self
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Callable, Dict, Set, Optional, List, Self, Sequence, Tuple
+from carnot.beacon import RecoveryMode
 from carnot.carnot import Overlay, Id, Committee, View
+import sampling
 
 
 class EntropyOverlay(Overlay):
@@ -9,6 +11,100 @@ class EntropyOverlay(Overlay):
     def advance(self, entropy: bytes) -> Self:
         pass
 
+    def advance_many(self, entropies: Sequence[bytes]) -> Self:
+        """
+        Same as advancing with each entropy in turn, e.g. after consecutive timeouts. Overlays that are expensive to
+        build can skip the intermediate ones.
+        """
+        overlay = self
+        for entropy in entropies:
+            overlay = overlay.advance(entropy)
+        return overlay
+
+    def leaders_after(self, entropies: Sequence[bytes]) -> List[Id]:
+        """
+        :return: the leader of each overlay reached by advancing with `entropies` in turn, starting with `next_leader`.
+        Overlays that are expensive to build can draw the leaders without building the overlays.
+        """
+        leaders, overlay = [], self
+        for i, entropy in enumerate(entropies):
+            leaders.append(overlay.next_leader())
+            if i + 1 < len(entropies):
+                overlay = overlay.advance(entropy)
+        return leaders
+
+    @property
+    def leader_schedule(self) -> "LeaderSchedule":
+        if (schedule := self.__dict__.get("_leader_schedule")) is None:
+            schedule = self._leader_schedule = LeaderSchedule(self)
+        return schedule
+
+    def prefetch(self, entropy: bytes):
+        """
+        Hint that `advance(entropy)` is likely to be called soon, overlays that are expensive to build
+        can start building it in the background
+        """
+        pass
+
+
+class LeaderSchedule:
+    """
+    Leaders of the upcoming views of an overlay.
+
+    The next leader is drawn from the entropy of the overlay, it is known as soon as the overlay is built. The leaders
+    after it depend on beacons which are not known yet, unless views time out: the recovery beacon of a failed view
+    is the hash of the last beacon and of the view, so the leaders proposing after consecutive timeouts can be drawn
+    in advance as well, and nodes can connect to them ahead of time. Leaders are drawn on first use and cached with
+    the overlay.
+    """
+    def __init__(self, overlay: EntropyOverlay):
+        self.overlay = overlay
+        # by last beacon entropy and first failed view
+        self.recoveries: Dict[Tuple[bytes, View], List[Id]] = {}
+
+    def leader(self) -> Id:
+        return self.overlay.leader()
+
+    def next(self) -> Id:
+        return self.overlay.next_leader()
+
+    def recovery(self, view: View, timeouts: int = 1, last_beacon_entropy: Optional[bytes] = None) -> List[Id]:
+        """
+        :param last_beacon_entropy: entropy of the last beacon of the node, the overlay entropy by default
+        :return: the leaders proposing after `view`, `view + 1`... time out, for `timeouts` consecutive views
+        """
+        if last_beacon_entropy is None:
+            last_beacon_entropy = self.overlay.entropy
+        key = (last_beacon_entropy, view)
+        leaders = self.recoveries.get(key, [])
+        if len(leaders) < timeouts:
+            beacons = RecoveryMode.fast_forward(last_beacon_entropy, range(view, view + timeouts))
+            leaders = self.recoveries[key] = self.overlay.leaders_after([beacon.entropy() for beacon in beacons])
+        return leaders[:timeouts]
+
+    def upcoming(self, view: View, timeouts: int = 1, last_beacon_entropy: Optional[bytes] = None) -> List[Id]:
+        """
+        The current and the next leader, and the leaders proposing after up to `timeouts` views time out, without
+        duplicates
+        """
+        return list(dict.fromkeys([self.leader(), self.next(), *self.recovery(view, timeouts, last_beacon_entropy)]))
+
+
+class OverlayPipeline:
+    """
+    Builds overlays off the critical path.
+    Defaults to a single worker thread, a `ProcessPoolExecutor` can be used instead when overlays are large enough
+    for the build to be worth pickling the result back.
+    """
+    def __init__(self, executor: Optional[Executor] = None):
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="overlay")
+
+    def submit(self, build: Callable[..., EntropyOverlay], *args) -> Future:
+        return self.executor.submit(build, *args)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
 
 class FlatOverlay(EntropyOverlay):
 
@@ -16,10 +112,18 @@ class FlatOverlay(EntropyOverlay):
         self.current_leader = current_leader
         self.nodes = nodes
         self.entropy = entropy
+        self._next_leader: Optional[Id] = None
 
     def next_leader(self) -> Id:
-        random.seed(a=self.entropy, version=2)
-        return random.choice(self.nodes)
+        if self._next_leader is None:
+            self._next_leader = sampling.choice(self.nodes, self.entropy)
+        return self._next_leader
+
+    def leaders_after(self, entropies: Sequence[bytes]) -> List[Id]:
+        if len(entropies) == 0:
+            return []
+        # the nodes never change
+        return [self.next_leader(), *(sampling.choice(self.nodes, entropy) for entropy in entropies[:-1])]
 
     def advance(self, entropy: bytes):
         return FlatOverlay(self.next_leader(), self.nodes, entropy)
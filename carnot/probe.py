@@ -0,0 +1,35 @@
+"""
+Timing of the functions shared by every node, e.g. overlay construction and beacon verification.
+
+`probed` functions report their time and result to `probe`, a context variable which `carnot.instrumentation` sets
+while a method of an instrumented node runs. Calls made outside of an instrumented method, or from another thread or
+task, see no probe and only pay for its lookup.
+"""
+import functools
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+# receives the name, start, duration and result of the probed calls
+probe: ContextVar[Optional[Callable[[str, float, float, Any], None]]] = ContextVar(
+    "probe", default=None
+)
+
+
+def probed(name: str):
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if (record := probe.get()) is None:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            result = None
+            try:
+                result = function(*args, **kwargs)
+                return result
+            finally:
+                record(name, start, time.perf_counter() - start, result)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,139 @@
+"""
+Signed votes and aggregated quorum certificates.
+
+Votes are signed with the BLS proof of possession scheme, so that all the votes for the same (view, block) sign the
+same message and can be checked at once: the public keys of the signers are aggregated and a single pairing check
+verifies the aggregated signature of the whole QC, instead of one pairing check per vote.
+
+The proof of possession scheme is only secure against rogue key attacks if every public key has been checked with
+`verify_possession` before being admitted as a committee member.
+
+A QC refers to its signers through a bitmap over the committee members sorted by id, which keeps QCs small
+(one bit per member) and lets every node rebuild the exact same list of public keys.
+"""
+from functools import lru_cache
+from typing import Callable, Iterable, List, Optional, Sequence
+
+from blspy import G1Element, G2Element, PopSchemeMPL, PrivateKey
+
+from carnot.carnot import Id, StandardQc, View, Vote
+from carnot.beacon import view_to_bytes
+
+VOTE_TAG = b"carnot-vote"
+
+
+def vote_message(block: Id, view: View) -> bytes:
+    return VOTE_TAG + view_to_bytes(view) + block
+
+
+@lru_cache(maxsize=1 << 16)
+def public_key(_id: Id) -> G1Element:
+    """
+    Node ids are the serialized public keys of the nodes (see BeaconizedCarnot).
+    Deserializing a G1 point is expensive compared to adding it, so they are cached.
+    """
+    return G1Element.from_bytes(_id)
+
+
+def prove_possession(sk: PrivateKey) -> bytes:
+    return bytes(PopSchemeMPL.pop_prove(sk))
+
+
+def verify_possession(pk: Id, proof: bytes) -> bool:
+    return PopSchemeMPL.pop_verify(public_key(pk), G2Element.from_bytes(proof))
+
+
+def sign_vote(sk: PrivateKey, vote: Vote) -> Vote:
+    signature = PopSchemeMPL.sign(sk, vote_message(vote.block, vote.view))
+    return Vote(
+        block=vote.block,
+        view=vote.view,
+        voter=vote.voter,
+        qc=vote.qc,
+        signature=bytes(signature),
+    )
+
+
+def verify_vote(vote: Vote) -> bool:
+    """
+    Check a single vote, this is what verifying a QC would cost per signer without aggregation
+    """
+    if vote.signature is None:
+        return False
+    return PopSchemeMPL.verify(
+        public_key(vote.voter),
+        vote_message(vote.block, vote.view),
+        G2Element.from_bytes(vote.signature),
+    )
+
+
+def encode_signers(members: Sequence[Id], signers: Iterable[Id]) -> bytes:
+    """
+    :param members: committee members sorted by id
+    :return: bitmap where bit `i % 8` of byte `i // 8` is set if `members[i]` is a signer
+    """
+    index = {member: i for i, member in enumerate(members)}
+    bitmap = bytearray((len(members) + 7) // 8)
+    for signer in signers:
+        i = index[signer]
+        bitmap[i // 8] |= 1 << (i % 8)
+    return bytes(bitmap)
+
+
+def decode_signers(members: Sequence[Id], bitmap: bytes) -> List[Id]:
+    assert len(bitmap) == (len(members) + 7) // 8
+    return [member for i, member in enumerate(members) if bitmap[i // 8] >> (i % 8) & 1]
+
+
+def aggregate_qc(votes: Iterable[Vote], members: Sequence[Id]) -> StandardQc:
+    """
+    Build a QC for the signed votes of a single (view, block)
+    """
+    votes = list(votes)
+    assert len(votes) > 0
+    block, view = votes[0].block, votes[0].view
+    assert all(vote.block == block and vote.view == view for vote in votes)
+    assert all(vote.signature is not None for vote in votes)
+    signature = PopSchemeMPL.aggregate(
+        [G2Element.from_bytes(vote.signature) for vote in votes]
+    )
+    return StandardQc(
+        block=block,
+        view=view,
+        signature=bytes(signature),
+        signers=encode_signers(members, (vote.voter for vote in votes)),
+    )
+
+
+def verify_qc(
+    qc: StandardQc,
+    members: Sequence[Id],
+    threshold: Optional[int] = None,
+    is_eligible: Optional[Callable[[Id], bool]] = None,
+) -> bool:
+    """
+    :param members: committee members sorted by id, as used to build the QC
+    :param threshold: minimum number of signers, if any
+    :param is_eligible: whether a member may sign the QC, e.g. belongs to the committees which voted in its view
+    :return: true if the aggregated signature is valid for the signers in the bitmap, false for malformed QCs
+    """
+    if (
+        qc.signature is None
+        or qc.signers is None
+        or len(qc.signers) != (len(members) + 7) // 8
+    ):
+        return False
+    signers = decode_signers(members, qc.signers)
+    if len(signers) == 0 or (threshold is not None and len(signers) < threshold):
+        return False
+    if is_eligible is not None and not all(is_eligible(signer) for signer in signers):
+        return False
+    try:
+        return PopSchemeMPL.fast_aggregate_verify(
+            [public_key(signer) for signer in signers],
+            vote_message(qc.block, qc.view),
+            G2Element.from_bytes(qc.signature),
+        )
+    except (ValueError, RuntimeError):
+        # the signature or a public key is not a valid point
+        return False
@@ -0,0 +1,492 @@
+"""
+Discrete event simulation of a network of `BeaconizedCarnot` nodes.
+
+Every node runs a `CarnotDriver`. Messages are delivered in virtual time, after a latency drawn for each recipient
+(`latency_ms` plus a uniform jitter), and may be dropped. Crashed nodes neither send nor process anything. Each node
+has a view timer which is reset whenever its driver makes progress and calls `on_local_timeout` when it expires,
+so leader crashes go through the timeout path of the protocol.
+
+Events are sent as one message per recipient (`unicast`), or through the fan-out trees of `carnot.dissemination`
+(`tree`), in which case a message is one hop of a payload. With a `batch_window_ms`, the messages bound for the same
+peer are batched into the frames of `carnot.dissemination`, in both cases.
+
+All the nodes hold the same overlays, which are built once for the whole network by `SharedOverlay`, and share a
+`BeaconVerifier` so that each beacon is checked once.
+
+    python -m carnot.simulation [--nodes 1000] [--committees 31] [--views 10] [--dissemination tree]
+
+Limitations coming from the specification: nodes missing a block can not download it, so they stop voting until
+the next timeout, and drops close to a view change can leave nodes with different overlays.
+"""
+import argparse
+import heapq
+import random
+from collections import Counter
+from dataclasses import dataclass
+from hashlib import sha256
+from typing import Callable, Dict, List, Self, Sequence, Set
+
+import numpy as np
+from blspy import BasicSchemeMPL
+
+import sampling
+from carnot.beacon import NormalMode, RecoveryMode
+from carnot.beacon_verifier import BeaconVerifier
+from carnot.beaconized_carnot import BeaconizedBlock, BeaconizedCarnot
+from carnot.carnot import BroadCast, Event, Id, Payload, Send, StandardQc, View
+from carnot.codec import encode
+from carnot.dissemination import Disseminator, Frame, envelope_size
+from carnot.driver import CarnotDriver, recipients
+from carnot.overlay import EntropyOverlay
+from carnot.tree_overlay import CarnotOverlay
+
+
+@dataclass
+class SimulationConfig:
+    number_of_nodes: int = 100
+    number_of_committees: int = 7
+    branching_factor: int = 2
+    # one way latency of every message, plus a uniform jitter in [0, jitter_ms)
+    latency_ms: float = 50.0
+    jitter_ms: float = 20.0
+    drop_rate: float = 0.0
+    # fraction of the nodes crashed from the start
+    crashed: float = 0.0
+    view_timeout_ms: float = 1000.0
+    sign_votes: bool = False
+    seed: int = 0
+    # "unicast" or "tree"
+    dissemination: str = "unicast"
+    fanout: int = 8
+    redundancy: int = 1
+    # batches the messages bound for the same peer, with either dissemination
+    batch_window_ms: float = 0.0
+    # a payload failing an assertion of a node raises it, unless not strict where the payload is recorded in
+    # `Simulation.rejections`, e.g. to explore lossy networks
+    strict: bool = True
+
+
+@dataclass
+class SimulationReport:
+    views: int
+    blocks_proposed: int
+    # committed by at least 2/3 of the honest nodes
+    blocks_committed: int
+    elapsed_s: float
+    commit_latency_mean_ms: float
+    commit_latency_p50_ms: float
+    commit_latency_p95_ms: float
+    # messages sent (a message to a committee counts once per member) per view, by type
+    messages_per_view: Dict[str, float]
+    # bytes sent per view by type, encoded with `carnot.codec`
+    bytes_per_view: Dict[str, float]
+    # messages, batched or not, sent per view
+    frames_per_view: float
+    # messages sent per view by the busiest node
+    busiest_node_messages_per_view: float
+    local_timeouts: int
+    timeout_qcs: int
+    dropped: int
+    rejected: int
+
+    @property
+    def views_per_second(self) -> float:
+        return self.views / self.elapsed_s if self.elapsed_s else 0.0
+
+    @property
+    def blocks_per_second(self) -> float:
+        return self.blocks_committed / self.elapsed_s if self.elapsed_s else 0.0
+
+
+@dataclass(frozen=True)
+class Rejection:
+    node: Id
+    payload: Payload
+    error: AssertionError
+
+
+class SharedOverlay(EntropyOverlay):
+    """
+    Builds the successor of an overlay once for all the nodes of the simulation
+    """
+
+    def __init__(self, overlay: EntropyOverlay):
+        self.overlay = overlay
+        self.successors: Dict[bytes, SharedOverlay] = {}
+
+    def __getattr__(self, name):
+        return getattr(self.overlay, name)
+
+    def advance(self, entropy: bytes) -> Self:
+        if (successor := self.successors.get(entropy)) is None:
+            successor = self.successors[entropy] = SharedOverlay(
+                self.overlay.advance(entropy)
+            )
+        return successor
+
+    def is_leader(self, _id: Id):
+        return self.overlay.is_leader(_id)
+
+    def leader(self) -> Id:
+        return self.overlay.leader()
+
+    def next_leader(self) -> Id:
+        return self.overlay.next_leader()
+
+    def leaders_after(self, entropies: Sequence[bytes]) -> List[Id]:
+        return self.overlay.leaders_after(entropies)
+
+    def is_member_of_leaf_committee(self, _id: Id) -> bool:
+        return self.overlay.is_member_of_leaf_committee(_id)
+
+    def is_member_of_root_committee(self, _id: Id) -> bool:
+        return self.overlay.is_member_of_root_committee(_id)
+
+    def is_member_of_child_committee(self, parent: Id, child: Id) -> bool:
+        return self.overlay.is_member_of_child_committee(parent, child)
+
+    def parent_committee(self, _id: Id):
+        return self.overlay.parent_committee(_id)
+
+    def leaf_committees(self):
+        return self.overlay.leaf_committees()
+
+    def root_committee(self):
+        return self.overlay.root_committee()
+
+    def is_child_of_root_committee(self, _id: Id) -> bool:
+        return self.overlay.is_child_of_root_committee(_id)
+
+    def leader_super_majority_threshold(self, _id: Id) -> int:
+        return self.overlay.leader_super_majority_threshold(_id)
+
+    def super_majority_threshold(self, _id: Id) -> int:
+        return self.overlay.super_majority_threshold(_id)
+
+
+class Simulation:
+    def __init__(self, config: SimulationConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        keys = [
+            BasicSchemeMPL.key_gen(sha256(f"{config.seed}:{i}".encode()).digest())
+            for i in range(config.number_of_nodes)
+        ]
+        genesis_sk = BasicSchemeMPL.key_gen(
+            sha256(f"{config.seed}:genesis".encode()).digest()
+        )
+        entropy = RecoveryMode.generate_beacon(bytes(genesis_sk), -1).entropy()
+        ids = [bytes(key.get_g1()) for key in keys]
+        overlay = SharedOverlay(
+            CarnotOverlay(
+                ids,
+                sampling.choice(ids, entropy),
+                entropy,
+                config.number_of_committees,
+                branching_factor=config.branching_factor,
+            )
+        )
+        self.genesis = BeaconizedBlock(
+            view=0,
+            qc=StandardQc(block=b"", view=0),
+            _id=b"",
+            beacon=NormalMode.generate_beacon(genesis_sk, -1),
+            pk=genesis_sk.get_g1(),
+        )
+        self.ids: List[Id] = ids
+        # every node checks the same beacons
+        verifier = BeaconVerifier()
+        self.drivers: Dict[Id, CarnotDriver] = {
+            key_id: CarnotDriver(
+                BeaconizedCarnot(
+                    key,
+                    overlay,
+                    entropy,
+                    sign_votes=config.sign_votes,
+                    beacon_verifier=verifier,
+                )
+            )
+            for key, key_id in zip(keys, ids)
+        }
+        self.crashed: Set[Id] = set(
+            self.rng.sample(ids, int(config.crashed * len(ids)))
+        )
+        assert config.dissemination in ("unicast", "tree")
+        self.disseminators: Dict[Id, Disseminator] = (
+            {
+                _id: Disseminator(
+                    _id,
+                    fanout=config.fanout if config.dissemination == "tree" else None,
+                    redundancy=config.redundancy,
+                    window_ms=config.batch_window_ms,
+                )
+                for _id in ids
+            }
+            if config.dissemination == "tree" or config.batch_window_ms > 0
+            else {}
+        )
+        # relay sets are sent as bitmaps over all the nodes
+        self.members: List[Id] = sorted(ids)
+        self.flush_at: Dict[Id, float] = {}
+
+        self.started = False
+        self.now: float = 0.0
+        self.queue = []
+        self.seq = 0
+        self.timers: Dict[Id, int] = Counter()
+        self.progress: Dict[Id, int] = {}
+
+        self.sent: Counter = Counter()
+        self.sent_bytes: Counter = Counter()
+        self.frames = 0
+        self.sent_by: Counter = Counter()
+        self.dropped = 0
+        self.rejections: List[Rejection] = []
+        self.local_timeouts = 0
+        self.timeout_qcs: Set[View] = set()
+        self.proposals: Dict[View, float] = {}
+        self.commits: Dict[View, float] = {}
+        self.commit_counts: Counter = Counter()
+        self.committed_view: Dict[Id, View] = {}
+
+    def crash(self, _id: Id):
+        self.crashed.add(_id)
+
+    def schedule(self, delay: float, fn: Callable, *args):
+        heapq.heappush(self.queue, (self.now + delay, self.seq, fn, args))
+        self.seq += 1
+
+    def start(self):
+        self.started = True
+        for _id, driver in self.drivers.items():
+            driver.start(self.genesis)
+            self.progress[_id] = driver.progress
+            self.arm_timer(_id)
+        leader = self.drivers[next(iter(self.drivers.values())).node.overlay.leader()]
+        if leader.id not in self.crashed:
+            self.dispatch(leader.id, leader.propose_first_block(self.genesis, self.ids))
+
+    def run(self, views: int, max_time_ms: float) -> SimulationReport:
+        """
+        Run until block `views` is committed, or for `max_time_ms` of virtual time
+        """
+        if not self.started:
+            self.start()
+        while max(self.commits, default=0) < views and self.step(max_time_ms):
+            pass
+        return self.report()
+
+    def step(self, max_time_ms: float = float("inf")) -> bool:
+        """
+        Process the next event, if any before `max_time_ms`
+        """
+        if not self.queue or self.queue[0][0] > max_time_ms:
+            return False
+        self.now, _, fn, args = heapq.heappop(self.queue)
+        fn(*args)
+        return True
+
+    def arm_timer(self, _id: Id):
+        self.timers[_id] += 1
+        self.schedule(
+            self.config.view_timeout_ms, self.fire_timer, _id, self.timers[_id]
+        )
+
+    def fire_timer(self, _id: Id, generation: int):
+        if generation != self.timers[_id] or _id in self.crashed:
+            return
+        self.local_timeouts += 1
+        self.dispatch(_id, self.drivers[_id].on_local_timeout())
+        self.arm_timer(_id)
+
+    def deliver(self, _id: Id, payload: Payload):
+        if _id in self.crashed:
+            return
+        driver = self.drivers[_id]
+        try:
+            events = driver.handle(payload)
+        except AssertionError as e:
+            if self.config.strict:
+                raise
+            self.rejections.append(Rejection(_id, payload, e))
+            return
+        if isinstance(payload, BeaconizedBlock):
+            self.record_commits(driver)
+        self.dispatch(_id, events)
+
+    def dispatch(self, _id: Id, events: List[Event]):
+        driver = self.drivers[_id]
+        if driver.progress != self.progress[_id]:
+            self.progress[_id] = driver.progress
+            self.arm_timer(_id)
+        for event in events:
+            match event:
+                case BroadCast(payload=payload):
+                    to = self.ids
+                    if isinstance(payload, BeaconizedBlock):
+                        self.proposals.setdefault(payload.view, self.now)
+                    else:
+                        self.timeout_qcs.add(payload.view)
+                case Send() as send:
+                    to = recipients(send)
+                case _:
+                    continue
+            if self.disseminators:
+                for payload in self.disseminators[_id].send(
+                    to, event.payload, self.now
+                ):
+                    self.schedule(0, self.deliver, _id, payload)
+                continue
+            self.sent[type(event.payload).__name__] += len(to)
+            self.sent_bytes[type(event.payload).__name__] += len(to) * len(
+                encode(event.payload)
+            )
+            self.frames += len(to)
+            self.sent_by[_id] += len(to)
+            for recipient in to:
+                if self.rng.random() < self.config.drop_rate:
+                    self.dropped += 1
+                    continue
+                delay = (
+                    self.config.latency_ms + self.rng.random() * self.config.jitter_ms
+                )
+                self.schedule(delay, self.deliver, recipient, event.payload)
+        if self.disseminators:
+            self.flush(_id)
+
+    def deliver_frame(self, _id: Id, frame: Frame):
+        if _id in self.crashed:
+            return
+        for payload in self.disseminators[_id].receive(frame, self.now):
+            self.deliver(_id, payload)
+        # relays
+        self.flush(_id)
+
+    def flush(self, _id: Id):
+        disseminator = self.disseminators[_id]
+        for peer, frame in disseminator.flush(self.now):
+            self.frames += 1
+            self.sent_by[_id] += len(frame.envelopes)
+            for envelope in frame.envelopes:
+                self.sent[type(envelope.payload).__name__] += 1
+                self.sent_bytes[type(envelope.payload).__name__] += envelope_size(
+                    envelope, self.members
+                )
+            if self.rng.random() < self.config.drop_rate:
+                self.dropped += 1
+                continue
+            delay = self.config.latency_ms + self.rng.random() * self.config.jitter_ms
+            self.schedule(delay, self.deliver_frame, peer, frame)
+        deadline = disseminator.next_flush()
+        if deadline is not None and self.flush_at.get(_id, float("inf")) > deadline:
+            self.flush_at[_id] = deadline
+            self.schedule(deadline - self.now, self.flush_due, _id)
+
+    def flush_due(self, _id: Id):
+        if self.flush_at.get(_id) == self.now:
+            del self.flush_at[_id]
+        if _id not in self.crashed:
+            self.flush(_id)
+
+    def record_commits(self, driver: CarnotDriver):
+        node = driver.node
+        last = self.committed_view.get(driver.id, 0)
+        block = node.latest_committed_block()
+        if block.view <= last:
+            return
+        self.committed_view[driver.id] = block.view
+        quorum = (len(self.ids) - len(self.crashed)) * 2 // 3 + 1
+        while block is not None and block.view > last:
+            self.commit_counts[block.view] += 1
+            if self.commit_counts[block.view] == quorum:
+                self.commits[block.view] = self.now
+            block = node.safe_blocks.get(block.parent())
+
+    def report(self) -> SimulationReport:
+        latencies = np.array(
+            [
+                at - self.proposals[view]
+                for view, at in self.commits.items()
+                if view in self.proposals
+            ]
+        )
+        views = max(self.proposals, default=0)
+        return SimulationReport(
+            views=views,
+            blocks_proposed=len(self.proposals),
+            blocks_committed=len(self.commits),
+            elapsed_s=self.now / 1000,
+            commit_latency_mean_ms=float(latencies.mean()) if len(latencies) else 0.0,
+            commit_latency_p50_ms=float(np.percentile(latencies, 50))
+            if len(latencies)
+            else 0.0,
+            commit_latency_p95_ms=float(np.percentile(latencies, 95))
+            if len(latencies)
+            else 0.0,
+            messages_per_view={
+                kind: count / max(views, 1) for kind, count in sorted(self.sent.items())
+            },
+            bytes_per_view={
+                kind: count / max(views, 1)
+                for kind, count in sorted(self.sent_bytes.items())
+            },
+            frames_per_view=self.frames / max(views, 1),
+            busiest_node_messages_per_view=max(self.sent_by.values(), default=0)
+            / max(views, 1),
+            local_timeouts=self.local_timeouts,
+            timeout_qcs=len(self.timeout_qcs),
+            dropped=self.dropped,
+            rejected=len(self.rejections),
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--nodes", type=int, default=1000)
+    parser.add_argument("--committees", type=int, default=31)
+    parser.add_argument("--branching-factor", type=int, default=2)
+    parser.add_argument("--views", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--crashed", type=float, default=0.0)
+    parser.add_argument("--view-timeout-ms", type=float, default=1000.0)
+    parser.add_argument("--max-time-ms", type=float, default=60_000.0)
+    parser.add_argument("--sign-votes", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--dissemination", choices=["unicast", "tree"], default="unicast"
+    )
+    parser.add_argument("--fanout", type=int, default=8)
+    parser.add_argument("--redundancy", type=int, default=1)
+    parser.add_argument("--batch-window-ms", type=float, default=0.0)
+    parser.add_argument(
+        "--lenient",
+        action="store_true",
+        help="count the payloads rejected by the nodes instead of stopping on the first one",
+    )
+    args = parser.parse_args()
+    config = SimulationConfig(
+        number_of_nodes=args.nodes,
+        number_of_committees=args.committees,
+        branching_factor=args.branching_factor,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        drop_rate=args.drop_rate,
+        crashed=args.crashed,
+        view_timeout_ms=args.view_timeout_ms,
+        sign_votes=args.sign_votes,
+        seed=args.seed,
+        dissemination=args.dissemination,
+        fanout=args.fanout,
+        redundancy=args.redundancy,
+        batch_window_ms=args.batch_window_ms,
+        strict=not args.lenient,
+    )
+    report = Simulation(config).run(args.views, args.max_time_ms)
+    for name, value in vars(report).items():
+        print(f"{name}: {value}")
+    print(f"views_per_second: {report.views_per_second:.2f}")
+    print(f"blocks_per_second: {report.blocks_per_second:.2f}")
@@ -0,0 +1,159 @@
+from unittest import TestCase
+
+from carnot.accumulator import QuorumAccumulator
+from carnot.carnot import (
+    Carnot,
+    Id,
+    NewView,
+    Overlay,
+    StandardQc,
+    Timeout,
+    Vote,
+    int_to_id,
+)
+from carnot.test_unhappy_path import MockOverlay, add_genesis_block
+from carnot.tree_overlay import CarnotOverlay
+
+
+def vote(voter: int, view: int = 1, block: bytes = b"1") -> Vote:
+    return Vote(block=block, view=view, voter=int_to_id(voter), qc=None)
+
+
+class LargeCommitteeOverlay(Overlay):
+    """
+    Node 0 has a child committee made of all ids in [1, size]
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def is_member_of_child_committee(self, parent: Id, child: Id) -> bool:
+        return parent == int_to_id(0) and 1 <= int(child) <= self.size
+
+    def super_majority_threshold(self, _id: Id) -> int:
+        return self.size * 2 // 3 + 1
+
+
+class TestQuorumAccumulator(TestCase):
+    def test_fires_once_at_threshold(self):
+        accumulator = QuorumAccumulator.child_committee(MockOverlay(), int_to_id(1))
+        self.assertIsNone(accumulator.add(vote(3)))
+        self.assertEqual(accumulator.count(1, b"1"), 1)
+        quorum = accumulator.add(vote(4))
+        self.assertEqual(set(quorum), {vote(3), vote(4)})
+        # later messages for the same view and block do not fire again
+        self.assertIsNone(accumulator.add(vote(4)))
+
+    def test_deduplicates_and_rejects_non_members(self):
+        accumulator = QuorumAccumulator.child_committee(MockOverlay(), int_to_id(1))
+        self.assertIsNone(accumulator.add(vote(3)))
+        self.assertIsNone(accumulator.add(vote(3)))
+        # node 2 is a child of the root, not of node 1
+        self.assertIsNone(accumulator.add(vote(2)))
+        self.assertEqual(accumulator.rejected, 1)
+        self.assertEqual(accumulator.count(1, b"1"), 1)
+
+    def test_votes_for_different_blocks_are_counted_apart(self):
+        accumulator = QuorumAccumulator.child_committee(MockOverlay(), int_to_id(1))
+        self.assertIsNone(accumulator.add(vote(3, block=b"a")))
+        self.assertIsNone(accumulator.add(vote(4, block=b"b")))
+        self.assertIsNotNone(accumulator.add(vote(4, block=b"a")))
+
+    def test_quorum_is_accepted_by_carnot(self):
+        overlay = MockOverlay()
+        node = Carnot(int_to_id(1))
+        node.overlay = overlay
+        genesis = add_genesis_block(node)
+        block = type(genesis)(
+            view=1, qc=StandardQc(block=genesis.id(), view=0), _id=b"1"
+        )
+        node.receive_block(block)
+
+        accumulator = QuorumAccumulator.child_committee(overlay, node.id)
+        quorum = None
+        for voter in (3, 4):
+            quorum = accumulator.add(vote(voter))
+        event = node.approve_block(block, quorum)
+        self.assertEqual(event.payload.voter, node.id)
+
+    def test_timeouts_and_new_views_for_root(self):
+        overlay = MockOverlay()
+        accumulator = QuorumAccumulator.root_and_children(overlay, int_to_id(0))
+        timeouts = [
+            Timeout(view=2, high_qc=None, sender=int_to_id(i), timeout_qc=None)
+            for i in (0, 1, 3, 2)
+        ]
+        # 3 is not part of the root committee nor its children
+        fired = [accumulator.add(timeout) for timeout in timeouts]
+        self.assertEqual(fired[:3], [None, None, None])
+        self.assertEqual(
+            len(fired[3]), overlay.leader_super_majority_threshold(int_to_id(0))
+        )
+
+        new_views = QuorumAccumulator.child_committee(overlay, int_to_id(0))
+        new_views.add(
+            NewView(view=3, high_qc=None, sender=int_to_id(1), timeout_qc=None)
+        )
+        self.assertIsNotNone(
+            new_views.add(
+                NewView(view=3, high_qc=None, sender=int_to_id(2), timeout_qc=None)
+            )
+        )
+
+    def test_timeouts_and_new_views_are_counted_apart(self):
+        overlay = MockOverlay()
+        accumulator = QuorumAccumulator.child_committee(overlay, int_to_id(0))
+        self.assertIsNone(
+            accumulator.add(
+                Timeout(view=3, high_qc=None, sender=int_to_id(1), timeout_qc=None)
+            )
+        )
+        # a new view of the same view does not complete the quorum of timeouts
+        self.assertIsNone(
+            accumulator.add(
+                NewView(view=3, high_qc=None, sender=int_to_id(2), timeout_qc=None)
+            )
+        )
+        self.assertEqual(accumulator.count(3, kind=Timeout), 1)
+        self.assertEqual(accumulator.count(3, kind=NewView), 1)
+        quorum = accumulator.add(
+            NewView(view=3, high_qc=None, sender=int_to_id(1), timeout_qc=None)
+        )
+        self.assertTrue(all(isinstance(msg, NewView) for msg in quorum))
+
+    def test_large_committee(self):
+        size = 30000
+        accumulator = QuorumAccumulator.child_committee(
+            LargeCommitteeOverlay(size), int_to_id(0)
+        )
+        fired = [i for i in range(1, size + 1) if accumulator.add(vote(i)) is not None]
+        self.assertEqual(fired, [size * 2 // 3 + 1])
+
+        accumulator.discard_views_before(2)
+        self.assertEqual(accumulator.count(1, b"1"), 0)
+
+    def test_k_ary_child_committees(self):
+        nodes = [int_to_id(i) for i in range(130)]
+        for branching_factor in (3, 4):
+            overlay = CarnotOverlay(
+                nodes, nodes[0], b"0" * 32, 13, branching_factor=branching_factor
+            )
+            root = next(iter(overlay.root_committee()))
+            children = sorted(
+                (
+                    member
+                    for member in nodes
+                    if overlay.is_member_of_child_committee(root, member)
+                ),
+                key=bytes,
+            )
+            self.assertEqual(len(children), branching_factor * 10)
+            accumulator = QuorumAccumulator.child_committee(overlay, root)
+            fired = [
+                i
+                for i, child in enumerate(children, start=1)
+                if accumulator.add(Vote(block=b"1", view=1, voter=child, qc=None))
+                is not None
+            ]
+            # a supermajority of all the children, not of a single committee
+            self.assertEqual(fired, [len(children) * 2 // 3 + 1])
@@ -0,0 +1,147 @@
+import random
+from functools import partial
+from unittest import TestCase
+
+from carnot.array_tree import ArrayCarnotTree, NodeIndex
+from carnot.tree_overlay import CarnotOverlay, CarnotTree
+
+
+def gen_nodes(size: int):
+    return [int.to_bytes(i, length=32, byteorder="little") for i in range(size)]
+
+
+class TestArrayCarnotTree(TestCase):
+    def assert_same_tree(self, expected: CarnotTree, tree: ArrayCarnotTree):
+        self.assertEqual(tree.inner_committees, expected.inner_committees)
+        self.assertEqual(tree.leaf_committees(), expected.leaf_committees())
+        self.assertEqual(tree.root_committee(), expected.root_committee())
+        for idx in range(expected.number_of_committees):
+            committee_id = expected.committee_id(idx)
+            self.assertEqual(
+                tree.committee_by_committee_idx(idx),
+                expected.committee_by_committee_idx(idx),
+            )
+            self.assertEqual(
+                tree.parent_committee(committee_id),
+                expected.parent_committee(committee_id),
+            )
+            self.assertEqual(
+                tree.child_committees(committee_id),
+                expected.child_committees(committee_id),
+            )
+        self.assertEqual(dict(tree.routing_table()), expected.routing_table())
+        for member in expected.committees_by_member:
+            self.assertEqual(
+                tree.committee_idx_by_member_id(member),
+                expected.committee_idx_by_member_id(member),
+            )
+            self.assertEqual(
+                tree.parent_committee_from_member_id(member),
+                expected.parent_committee_from_member_id(member),
+            )
+
+    def test_same_committees_as_carnot_tree(self):
+        for size, number_of_committees in ((10, 3), (20, 7), (64, 7), (5, 1), (3, 5)):
+            nodes = gen_nodes(size)
+            random.Random(size).shuffle(nodes)
+            with self.subTest(size=size, number_of_committees=number_of_committees):
+                self.assert_same_tree(
+                    CarnotTree(nodes, number_of_committees),
+                    ArrayCarnotTree(nodes, number_of_committees),
+                )
+
+    def test_k_ary(self):
+        nodes = gen_nodes(100)
+        for branching_factor in (3, 4):
+            self.assert_same_tree(
+                CarnotTree(nodes, 21, branching_factor=branching_factor),
+                ArrayCarnotTree(nodes, 21, branching_factor=branching_factor),
+            )
+
+    def test_shared_node_index(self):
+        nodes = gen_nodes(50)
+        index = NodeIndex(nodes)
+        shuffled = nodes.copy()
+        random.Random(0).shuffle(shuffled)
+        # node subsets and unknown ids
+        tree = ArrayCarnotTree(shuffled[:30], 5, index)
+        self.assert_same_tree(CarnotTree(shuffled[:30], 5), tree)
+        self.assertIsNone(tree.committee_idx_by_member_id(shuffled[40]))
+        self.assertIsNone(tree.committee_idx_by_member_id(b"unknown"))
+        self.assertNotIn(shuffled[40], tree.routing_table())
+
+    def test_overlay(self):
+        nodes = gen_nodes(100)
+        overlay = CarnotOverlay(nodes, nodes[0], b"0" * 32, 7)
+        array_overlay = CarnotOverlay(
+            nodes, nodes[0], b"0" * 32, 7, tree=ArrayCarnotTree
+        )
+        index = array_overlay.carnot_tree.node_index
+        for view in range(1, 4):
+            overlay = overlay.advance(bytes([view]) * 32)
+            previous_nodes = array_overlay.nodes
+            array_overlay = array_overlay.advance(bytes([view]) * 32)
+            # the index is built once, the next trees permute the order of the previous one
+            self.assertIs(array_overlay.carnot_tree.node_index, index)
+            self.assertEqual(
+                [index.ids[i] for i in array_overlay.carnot_tree.permutation.tolist()],
+                previous_nodes,
+            )
+            self.assertEqual(array_overlay.leader(), overlay.leader())
+            self.assertEqual(array_overlay.leaf_committees(), overlay.leaf_committees())
+            self.assertEqual(
+                array_overlay.leader_super_majority_threshold(nodes[0]),
+                overlay.leader_super_majority_threshold(nodes[0]),
+            )
+            for node in nodes:
+                self.assertEqual(
+                    array_overlay.parent_committee(node), overlay.parent_committee(node)
+                )
+                self.assertEqual(
+                    array_overlay.super_majority_threshold(node),
+                    overlay.super_majority_threshold(node),
+                )
+                self.assertEqual(
+                    array_overlay.is_member_of_leaf_committee(node),
+                    overlay.is_member_of_leaf_committee(node),
+                )
+                self.assertEqual(
+                    array_overlay.is_member_of_root_committee(node),
+                    overlay.is_member_of_root_committee(node),
+                )
+                self.assertEqual(
+                    array_overlay.is_child_of_root_committee(node),
+                    overlay.is_child_of_root_committee(node),
+                )
+                self.assertEqual(
+                    array_overlay.is_member_of_child_committee(nodes[1], node),
+                    overlay.is_member_of_child_committee(nodes[1], node),
+                )
+
+    def test_overlay_advance_many(self):
+        nodes = gen_nodes(100)
+        entropies = [bytes([view]) * 32 for view in range(1, 5)]
+        overlay = CarnotOverlay(nodes, nodes[0], b"0" * 32, 7).advance_many(entropies)
+        array_overlay = CarnotOverlay(
+            nodes,
+            nodes[0],
+            b"0" * 32,
+            7,
+            tree=partial(ArrayCarnotTree, node_index=NodeIndex(nodes)),
+        ).advance_many(entropies)
+        self.assertEqual(array_overlay.nodes, overlay.nodes)
+        self.assertEqual(array_overlay.leader(), overlay.leader())
+        self.assert_same_tree(overlay.carnot_tree, array_overlay.carnot_tree)
+        self.assert_same_tree(
+            overlay.advance(b"5" * 32).carnot_tree,
+            array_overlay.advance(b"5" * 32).carnot_tree,
+        )
+
+    def test_large_tree_is_built_lazily(self):
+        nodes = gen_nodes(100_000)
+        tree = ArrayCarnotTree(nodes, 1023, NodeIndex(nodes))
+        routes = tree.routing_table()
+        self.assertEqual(routes[nodes[-1]].committee_idx, 100_000 - 1 - 1023 * 97)
+        self.assertEqual(len(routes), 100_000)
+        # only the queried committee and its parent have been built
+        self.assertEqual(len(tree._committees), 2)
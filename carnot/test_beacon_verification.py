@@ -37,3 +37,28 @@ class TestRandomBeaconVerification(TestCase):
             self.beacon.verify_happy(new_beacon, pk, i)
             new_beacon = self.unhappy_beacon(self.beacon.last_beacon.entropy(), i+1)
             self.beacon.verify_unhappy(new_beacon, i+1)
+
+    def test_large_views(self):
+        self.assertEqual(view_to_bytes(0), b"")
+        self.assertEqual(view_to_bytes(-1), b"\xff")
+        self.assertEqual(view_to_bytes(127), b"\x7f")
+        for view in (128, 255, 256, 70_000):
+            new_beacon, pk = self.happy_beacon_and_pk(view)
+            self.assertTrue(self.beacon.verify_happy(new_beacon, pk, view))
+
+    def test_fast_forward(self):
+        views = range(1, 100)
+        expected = []
+        last_beacon = self.beacon.last_beacon
+        for view in views:
+            last_beacon = self.unhappy_beacon(last_beacon.entropy(), view)
+            expected.append(last_beacon)
+        self.assertEqual(RecoveryMode.fast_forward(self.beacon.last_beacon.entropy(), views), expected)
+
+        served = RandomBeaconHandler(self.beacon.last_beacon)
+        self.assertEqual(self.beacon.fast_forward(views), expected)
+        self.assertEqual(self.beacon.last_beacon, expected[-1])
+        self.assertEqual(self.beacon.recovery_beacon(50), expected[49])
+        self.assertFalse(served.verify_unhappy_many(expected[1:], views[1:]))
+        self.assertTrue(served.verify_unhappy_many(expected, views))
+        self.assertEqual(served.last_beacon, expected[-1])
@@ -0,0 +1,98 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest import TestCase
+
+from blspy import BasicSchemeMPL, G2Element
+
+from carnot.beacon import NormalMode, RandomBeacon, RandomBeaconHandler, RecoveryMode
+from carnot.beacon_verifier import (
+    BeaconVerifier,
+    linear_combination,
+    multiply,
+    verify_claims,
+)
+
+
+def keys(n):
+    return [
+        BasicSchemeMPL.key_gen(i.to_bytes(32, byteorder="little")) for i in range(n)
+    ]
+
+
+class TestBeaconVerifier(TestCase):
+    def setUp(self):
+        self.sks = keys(8)
+        # two beacons per view, from different leaders
+        self.beacons = [
+            (NormalMode.generate_beacon(sk, i // 2), sk.get_g1(), i // 2)
+            for i, sk in enumerate(self.sks)
+        ]
+
+    def test_scalar_multiplication(self):
+        pk = self.sks[0].get_g1()
+        self.assertEqual(multiply(pk, 5), pk + pk + pk + pk + pk)
+        sigs = [beacon.sig for beacon, _, _ in self.beacons[:3]]
+        points = [G2Element.from_bytes(sig) for sig in sigs]
+        self.assertEqual(
+            linear_combination(points, [3, 1, 6]),
+            multiply(points[0], 3) + points[1] + multiply(points[2], 6),
+        )
+
+    def test_valid_batch(self):
+        verifier = BeaconVerifier()
+        self.assertEqual(verifier.verify_many(self.beacons), [True] * len(self.beacons))
+
+    def test_invalid_beacons_are_isolated(self):
+        beacons = list(self.beacons)
+        beacon, pk, view = beacons[1]
+        # wrong view
+        beacons[1] = (beacon, pk, view + 1)
+        # wrong leader
+        beacons[4] = (beacons[4][0], self.sks[0].get_g1(), beacons[4][2])
+        # not a signature
+        beacons[6] = (
+            RandomBeacon(version=0, sig=bytes(96)),
+            beacons[6][1],
+            beacons[6][2],
+        )
+        expected = [i not in (1, 4, 6) for i in range(len(beacons))]
+        self.assertEqual(BeaconVerifier().verify_many(beacons), expected)
+        self.assertEqual(BeaconVerifier(batch_size=3).verify_many(beacons), expected)
+
+    def test_matches_normal_mode(self):
+        verifier = BeaconVerifier()
+        for beacon, pk, view in self.beacons:
+            for v in (view, view + 1):
+                self.assertEqual(
+                    verifier.verify(beacon, pk, v), NormalMode.verify(beacon, pk, v)
+                )
+
+    def test_cache(self):
+        verifier = BeaconVerifier(cache_size=4)
+        verifier.verify_many(self.beacons)
+        self.assertEqual(len(verifier.outcomes), 4)
+        # remembered outcomes are not checked again
+        claim = BeaconVerifier.claim(*self.beacons[-1])
+        verifier.outcomes[claim] = False
+        self.assertFalse(verifier.verify(*self.beacons[-1]))
+        self.assertEqual(verify_claims([claim]), [True])
+
+    def test_executors(self):
+        beacons = self.beacons + [(self.beacons[0][0], self.beacons[0][1], 100)]
+        expected = [True] * len(self.beacons) + [False]
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            self.assertEqual(
+                BeaconVerifier(executor, batch_size=3).verify_many(beacons), expected
+            )
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            self.assertEqual(
+                BeaconVerifier(executor, batch_size=3).verify_many(beacons), expected
+            )
+
+    def test_handler(self):
+        handler = RandomBeaconHandler(
+            RecoveryMode.generate_beacon(b"", -1), BeaconVerifier()
+        )
+        beacon, pk, view = self.beacons[0]
+        self.assertFalse(handler.verify_happy(beacon, pk, view + 1))
+        self.assertTrue(handler.verify_happy(beacon, pk, view))
+        self.assertEqual(handler.last_beacon, beacon)
@@ -1,14 +1,15 @@
-import random
 from typing import Dict, List
 from unittest import TestCase
 from itertools import chain
 
 from blspy import PrivateKey
 
-from carnot.carnot import Id, Carnot, Block, Overlay, Vote, StandardQc, NewView
+from carnot.carnot import Id, Carnot, Block, Overlay, Vote, StandardQc, NewView, TimeoutQc
 from carnot.beacon import generate_random_sk, RandomBeacon, NormalMode, RecoveryMode
 from carnot.beaconized_carnot import BeaconizedCarnot, BeaconizedBlock
-from carnot.overlay import FlatOverlay, EntropyOverlay
+import sampling
+from carnot.overlay import FlatOverlay, EntropyOverlay, OverlayPipeline
+from carnot.tree_overlay import CarnotOverlay
 from carnot.test_unhappy_path import parents_from_childs
 
 
@@ -114,8 +115,7 @@ def initial_setup(test_case: TestCase, size: int) -> (Dict[Id, Carnot], Carnot,
     genesis_sk = generate_random_sk()
     entropy = RecoveryMode.generate_beacon(bytes(genesis_sk), -1).entropy()
 
-    random.seed(a=entropy, version=2)
-    current_leader = random.choice(nodes_ids)
+    current_leader = sampling.choice(nodes_ids, entropy)
 
     nodes = dict(gen_node(key, FlatOverlay(current_leader, nodes_ids, entropy), entropy) for key in keys)
     genesis_block = None
@@ -178,3 +178,78 @@ class TestBeaconizedCarnot(TestCase):
         for node in nodes.values():
             for view in committed_blocks:
                 self.assertIn(view, [block.view for block in node.committed_blocks().values()])
+
+    def test_overlay_is_prefetched_on_block_reception(self):
+        keys = [generate_random_sk() for _ in range(10)]
+        nodes_ids = [bytes(key.get_g1()) for key in keys]
+        genesis_sk = generate_random_sk()
+        pipeline = OverlayPipeline()
+        node = BeaconizedCarnot(keys[0], CarnotOverlay(nodes_ids, nodes_ids[0], b"0" * 32, 3, pipeline=pipeline))
+        genesis_block = add_genesis_block(node, genesis_sk)
+
+        beacon = NormalMode.generate_beacon(genesis_sk, 0)
+        block = BeaconizedBlock(
+            view=1, qc=StandardQc(block=genesis_block.id(), view=0), _id=b"1", beacon=beacon, pk=genesis_sk.get_g1()
+        )
+        node.receive_block(block)
+        self.assertIn(beacon.entropy(), node.overlay.successors)
+        expected = CarnotOverlay(node.overlay.nodes, node.overlay.next_leader(), beacon.entropy(), 3)
+        self.assertEqual(node.overlay.advance(beacon.entropy()).nodes, expected.nodes)
+        pipeline.shutdown()
+
+    def test_catch_up_after_consecutive_timeouts(self):
+        keys = [generate_random_sk() for _ in range(20)]
+        ids = [bytes(key.get_g1()) for key in keys]
+        genesis_sk = generate_random_sk()
+        entropy = RecoveryMode.generate_beacon(bytes(genesis_sk), -1).entropy()
+
+        def node(sk: PrivateKey) -> BeaconizedCarnot:
+            carnot = BeaconizedCarnot(sk, CarnotOverlay(ids, ids[0], entropy, 3), entropy)
+            add_genesis_block(carnot, genesis_sk)
+            return carnot
+
+        def timeout_qc(view: int) -> TimeoutQc:
+            return TimeoutQc(view=view, high_qc=StandardQc(block=b"", view=0), qc_views=[view], sender_ids=set(),
+                             sender=ids[0])
+
+        online, rejoining = node(keys[0]), node(keys[1])
+        for view in range(1, 6):
+            online.receive_timeout_qc(timeout_qc(view))
+        rejoining.catch_up(timeout_qc(5))
+
+        self.assertEqual(rejoining.current_view, online.current_view)
+        self.assertEqual(rejoining.random_beacon.last_beacon, online.random_beacon.last_beacon)
+        self.assertEqual(rejoining.overlay.leader(), online.overlay.leader())
+        self.assertEqual(rejoining.overlay.nodes, online.overlay.nodes)
+        self.assertEqual(rejoining.overlay.root_committee(), online.overlay.root_committee())
+        # both can serve the intermediate beacons
+        for view in range(1, 6):
+            self.assertIsNotNone(online.recovery_beacon(view))
+            self.assertEqual(rejoining.recovery_beacon(view), online.recovery_beacon(view))
+
+        # a peer checks the served beacons against its last beacon
+        late = node(keys[2])
+        served = [online.recovery_beacon(view) for view in range(1, 6)]
+        self.assertFalse(late.random_beacon.verify_unhappy_many(served[1:], range(2, 6)))
+        self.assertTrue(late.random_beacon.verify_unhappy_many(served, range(1, 6)))
+        self.assertEqual(late.random_beacon.last_beacon, online.random_beacon.last_beacon)
+
+    def test_upcoming_leaders(self):
+        keys = [generate_random_sk() for _ in range(20)]
+        ids = [bytes(key.get_g1()) for key in keys]
+        genesis_sk = generate_random_sk()
+        entropy = RecoveryMode.generate_beacon(bytes(genesis_sk), -1).entropy()
+        node = BeaconizedCarnot(keys[0], CarnotOverlay(ids, ids[0], entropy, 3), entropy)
+        add_genesis_block(node, genesis_sk)
+
+        upcoming = node.upcoming_leaders(timeouts=3)
+        predicted = node.overlay.leader_schedule.recovery(
+            node.current_view, 3, node.random_beacon.last_beacon.entropy()
+        )
+        self.assertEqual(set(upcoming), {node.overlay.leader(), node.overlay.next_leader(), *predicted})
+        for view, leader in zip(range(1, 4), predicted):
+            node.receive_timeout_qc(TimeoutQc(
+                view=view, high_qc=StandardQc(block=b"", view=0), qc_views=[view], sender_ids=set(), sender=ids[0]
+            ))
+            # the leader proposing after the timeout
+            self.assertEqual(node.overlay.leader(), leader)
@@ -0,0 +1,151 @@
+from unittest import TestCase
+
+from blspy import BasicSchemeMPL
+
+from carnot.beacon import NormalMode
+from carnot.beaconized_carnot import BeaconizedBlock
+from carnot.carnot import (
+    AggregateQc,
+    Block,
+    NewView,
+    StandardQc,
+    Timeout,
+    TimeoutQc,
+    Vote,
+    int_to_id,
+)
+from carnot.codec import VERSION, DecodeError, Reader, Writer, decode, encode
+
+
+def timeout_qc(members, view=5) -> TimeoutQc:
+    return TimeoutQc(
+        view=view,
+        high_qc=StandardQc(block=int_to_id(3), view=3),
+        qc_views=[view] * len(members),
+        sender_ids=set(members),
+        sender=members[0],
+    )
+
+
+class TestCodec(TestCase):
+    def setUp(self):
+        self.members = sorted(int_to_id(i).rjust(48, b"\x00") for i in range(100))
+
+    def assertRoundTrip(self, payload, members=None):
+        self.assertEqual(decode(encode(payload, members), members), payload)
+
+    def test_payloads(self):
+        qc = StandardQc(
+            block=int_to_id(1), view=1, signature=b"s" * 96, signers=b"\x0f"
+        )
+        aggregate_qc = AggregateQc(
+            qcs=[3, 3, 2, 3, 1],
+            highest_qc=StandardQc(block=int_to_id(3), view=3),
+            view=5,
+        )
+        self.assertRoundTrip(Block(view=2, qc=qc, _id=int_to_id(2)))
+        self.assertRoundTrip(Block(view=6, qc=aggregate_qc, _id=int_to_id(6)))
+        self.assertRoundTrip(
+            Vote(block=int_to_id(2), view=2, voter=self.members[0], qc=None)
+        )
+        self.assertRoundTrip(
+            Vote(
+                block=int_to_id(2),
+                view=2,
+                voter=self.members[0],
+                qc=qc,
+                signature=b"v" * 96,
+            )
+        )
+        self.assertRoundTrip(
+            Timeout(view=4, high_qc=qc, sender=self.members[1], timeout_qc=None)
+        )
+        self.assertRoundTrip(
+            Timeout(
+                view=6,
+                high_qc=qc,
+                sender=self.members[1],
+                timeout_qc=timeout_qc(self.members),
+            )
+        )
+        self.assertRoundTrip(
+            NewView(
+                view=6,
+                high_qc=qc,
+                sender=self.members[2],
+                timeout_qc=timeout_qc(self.members),
+            )
+        )
+        self.assertRoundTrip(timeout_qc(self.members))
+        self.assertRoundTrip(aggregate_qc)
+
+    def test_beaconized_block(self):
+        sk = BasicSchemeMPL.key_gen(bytes(32))
+        block = BeaconizedBlock(
+            view=1,
+            qc=StandardQc(block=b"", view=0),
+            _id=int_to_id(1),
+            beacon=NormalMode.generate_beacon(sk, 0),
+            pk=sk.get_g1(),
+        )
+        decoded = decode(encode(block))
+        self.assertEqual(decoded, block)
+        self.assertTrue(NormalMode.verify(decoded.beacon, decoded.pk, 0))
+
+    def test_signers_bitmap(self):
+        senders = self.members[::3]
+        qc = TimeoutQc(
+            view=5,
+            high_qc=StandardQc(block=b"", view=0),
+            qc_views=[5],
+            sender_ids=set(senders),
+            sender=senders[0],
+        )
+        self.assertRoundTrip(qc, self.members)
+        with_ids, with_bitmap = encode(qc), encode(qc, self.members)
+        self.assertGreater(len(with_ids), len(senders) * 48)
+        self.assertLess(len(with_bitmap), 100)
+        # the bitmap can only be read back with the members
+        with self.assertRaises(DecodeError):
+            decode(with_bitmap)
+        with self.assertRaises(DecodeError):
+            decode(with_bitmap, self.members[:-8])
+
+    def test_view_lists(self):
+        for views in (
+            [],
+            [0],
+            [7] * 1000,
+            [1, 5, 3, 3, 3, 0, 2**40],
+            list(range(100)),
+        ):
+            writer = Writer()
+            writer.views(views)
+            self.assertEqual(Reader(bytes(writer.buffer)).views(), views)
+        writer = Writer()
+        writer.views([7] * 1000)
+        self.assertEqual(len(writer.buffer), 4)
+
+    def test_ids_are_bytes(self):
+        data = bytearray(
+            encode(Vote(block=int_to_id(2), view=2, voter=self.members[0], qc=None))
+        )
+        vote = decode(data)
+        self.assertIs(type(vote.voter), bytes)
+        self.assertIs(type(vote.block), bytes)
+        # ids do not share the message buffer
+        data[:] = bytes(len(data))
+        self.assertEqual(vote.voter, self.members[0])
+        self.assertEqual({vote.voter: 1}, {self.members[0]: 1})
+
+    def test_malformed(self):
+        data = encode(Vote(block=int_to_id(2), view=2, voter=self.members[0], qc=None))
+        with self.assertRaises(DecodeError):
+            decode(bytes([VERSION + 1]) + data[1:])
+        with self.assertRaises(DecodeError):
+            decode(data + b"\x00")
+        for length in range(len(data)):
+            with self.assertRaises(DecodeError):
+                decode(data[:length])
+        with self.assertRaises(DecodeError):
+            decode(bytes([VERSION, 0xFF]))
@@ -0,0 +1,125 @@
+import math
+import os
+import tempfile
+from unittest import TestCase
+
+from scipy.stats import binom
+
+from carnot.carnot import int_to_id
+from carnot.committee_sizes import (
+    CommitteeTable,
+    compute_optimal_number_of_committees_and_committee_size,
+    plan,
+    sweep,
+)
+from carnot.tree_overlay import CarnotOverlay
+
+
+def reference(
+    number_of_nodes,
+    failure_threshold,
+    adversaries_threshold_per_committee,
+    network_adversary_threshold,
+):
+    """
+    One candidate at a time, as the planner used to do
+    """
+    number_of_committees, probability = 1, 0.0
+    for candidate in range(3, number_of_nodes + 1, 2):
+        committee_size, remainder = divmod(number_of_nodes, candidate)
+        current = (
+            1
+            - binom.cdf(
+                math.floor(adversaries_threshold_per_committee * committee_size),
+                committee_size,
+                network_adversary_threshold,
+            )
+            ** (candidate - remainder)
+            * binom.cdf(
+                math.floor(adversaries_threshold_per_committee * (committee_size + 1)),
+                committee_size + 1,
+                network_adversary_threshold,
+            )
+            ** remainder
+        )
+        if current >= failure_threshold:
+            break
+        number_of_committees, probability = candidate, current
+    return number_of_committees, probability
+
+
+class TestCommitteeSizes(TestCase):
+    def test_same_as_one_candidate_at_a_time(self):
+        for number_of_nodes in (10, 100, 1000, 2500, 10_000, 33_333):
+            for failure_threshold in (1e-3, 1e-6, 1e-9):
+                for network_adversary_threshold in (0.1, 0.25):
+                    expected, probability = reference(
+                        number_of_nodes,
+                        failure_threshold,
+                        1 / 3,
+                        network_adversary_threshold,
+                    )
+                    (
+                        committees,
+                        size,
+                        remainder,
+                        current,
+                    ) = compute_optimal_number_of_committees_and_committee_size(
+                        number_of_nodes,
+                        failure_threshold,
+                        1 / 3,
+                        network_adversary_threshold,
+                    )
+                    self.assertEqual(committees, expected)
+                    self.assertEqual(
+                        (size, remainder), divmod(number_of_nodes, expected)
+                    )
+                    self.assertAlmostEqual(
+                        current, probability, delta=probability * 1e-6
+                    )
+
+    def test_plan_many_network_sizes(self):
+        nodes = list(range(100, 5000, 37))
+        committees, probabilities = plan(nodes, 1e-6, 1 / 3, 0.1)
+        for n, c, p in zip(nodes, committees, probabilities):
+            self.assertEqual(
+                c,
+                compute_optimal_number_of_committees_and_committee_size(
+                    n, 1e-6, 1 / 3, 0.1
+                )[0],
+            )
+            self.assertLess(p, 1e-6)
+
+    def test_sweep(self):
+        tables = sweep([1000, 10_000], 1e-6, [0.1, 0.25])
+        self.assertEqual(set(tables), {0.1, 0.25})
+        # a stronger adversary needs larger committees
+        self.assertTrue(
+            all(tables[0.1].number_of_committees >= tables[0.25].number_of_committees)
+        )
+
+    def test_table(self):
+        table = CommitteeTable.build(
+            [2000, 1000, 10_000], 1e-6, network_adversary_threshold=0.1
+        )
+        self.assertEqual(table.number_of_nodes.tolist(), [1000, 2000, 10_000])
+        self.assertEqual(table.lookup(1000), 15)
+        # between two entries the smaller network is used
+        self.assertEqual(table.lookup(1999), 15)
+        self.assertEqual(table.lookup(20_000), table.number_of_committees[-1])
+        with self.assertRaises(AssertionError):
+            table.lookup(999)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "table.json")
+            table.save(path)
+            loaded = CommitteeTable.load(path)
+        self.assertEqual(
+            loaded.number_of_committees.tolist(), table.number_of_committees.tolist()
+        )
+        self.assertEqual(loaded.failure_threshold, table.failure_threshold)
+
+        nodes = [int_to_id(i) for i in range(1000)]
+        overlay = CarnotOverlay.from_table(nodes, nodes[0], b"entropy", loaded)
+        self.assertEqual(overlay.number_of_committees, 15)
+        self.assertEqual(overlay.advance(b"next").number_of_committees, 15)
@@ -0,0 +1,184 @@
+from collections import Counter
+from typing import Dict, List
+from unittest import TestCase
+
+from carnot.carnot import Id, StandardQc, Vote, int_to_id
+from carnot.codec import DecodeError
+from carnot.dissemination import (
+    Disseminator,
+    Frame,
+    decode_frame,
+    encode_frame,
+    frame_size,
+)
+
+
+def vote(view: int, voter: Id) -> Vote:
+    return Vote(
+        block=int_to_id(view),
+        view=view,
+        voter=voter,
+        qc=StandardQc(block=int_to_id(view - 1), view=view - 1),
+    )
+
+
+class Network:
+    """
+    Delivers every frame right away, until no node has anything left to send
+    """
+
+    def __init__(self, ids: List[Id], **kwargs):
+        self.disseminators: Dict[Id, Disseminator] = {
+            _id: Disseminator(_id, **kwargs) for _id in ids
+        }
+        self.received: Dict[Id, List] = {_id: [] for _id in ids}
+        self.frames_sent: Counter = Counter()
+        self.crashed = set()
+
+    def send(self, origin: Id, to: List[Id], payload):
+        self.received[origin] += self.disseminators[origin].send(to, payload, 0)
+        self.run([origin])
+
+    def run(self, senders: List[Id]):
+        while senders:
+            frames = [
+                (sender, frame)
+                for sender in senders
+                for frame in self.disseminators[sender].flush(0)
+            ]
+            senders = []
+            for sender, (peer, frame) in frames:
+                self.frames_sent[sender] += 1
+                if peer in self.crashed:
+                    continue
+                self.received[peer] += self.disseminators[peer].receive(frame, 0)
+                senders.append(peer)
+
+
+class TestDissemination(TestCase):
+    def setUp(self):
+        self.ids = [int_to_id(i) for i in range(200)]
+
+    def test_tree(self):
+        network = Network(self.ids, fanout=4)
+        payload = vote(1, self.ids[0])
+        network.send(self.ids[0], self.ids, payload)
+        self.assertTrue(
+            all(received == [payload] for received in network.received.values())
+        )
+        self.assertEqual(network.frames_sent[self.ids[0]], 4)
+        self.assertLessEqual(max(network.frames_sent.values()), 4)
+        # one message per recipient
+        self.assertEqual(sum(network.frames_sent.values()), len(self.ids) - 1)
+
+    def test_small_committee(self):
+        network = Network(self.ids, fanout=8)
+        committee = self.ids[10:15]
+        network.send(self.ids[0], committee, vote(1, self.ids[0]))
+        self.assertEqual(network.frames_sent[self.ids[0]], 5)
+        self.assertEqual(sum(network.frames_sent.values()), 5)
+        self.assertEqual(
+            [_id for _id, received in network.received.items() if received], committee
+        )
+
+    def test_redundancy(self):
+        network = Network(self.ids, fanout=4, redundancy=2)
+        network.crashed = set(self.ids[1:200:10])
+        payload = vote(1, self.ids[0])
+        network.send(self.ids[0], self.ids, payload)
+        alive = [_id for _id in self.ids if _id not in network.crashed]
+        self.assertTrue(all(network.received[_id] == [payload] for _id in alive))
+        self.assertGreater(sum(d.duplicates for d in network.disseminators.values()), 0)
+
+    def test_deliver_once(self):
+        network = Network(self.ids, fanout=4)
+        payload = vote(1, self.ids[0])
+        network.send(self.ids[0], self.ids[:50], payload)
+        # forwarded again, with other recipients
+        network.send(self.ids[1], self.ids[:100], payload)
+        self.assertTrue(
+            all(
+                received == [payload]
+                for received in network.received.values()
+                if received
+            )
+        )
+        self.assertEqual(
+            sum(1 for received in network.received.values() if received), 100
+        )
+
+    def test_duplicate_recipients(self):
+        network = Network(self.ids, fanout=8)
+        committee = self.ids[10:15]
+        network.send(self.ids[0], committee + committee[:1], vote(1, self.ids[0]))
+        # the sender is not a recipient
+        self.assertEqual(network.received[self.ids[0]], [])
+        self.assertEqual(
+            [_id for _id, received in network.received.items() if received], committee
+        )
+
+    def test_direct(self):
+        network = Network(self.ids, fanout=None)
+        payload = vote(1, self.ids[0])
+        network.send(self.ids[0], self.ids, payload)
+        self.assertTrue(
+            all(received == [payload] for received in network.received.values())
+        )
+        # no relays
+        self.assertEqual(network.frames_sent[self.ids[0]], len(self.ids) - 1)
+        self.assertEqual(sum(network.frames_sent.values()), len(self.ids) - 1)
+        disseminator = Disseminator(self.ids[0], fanout=None, window_ms=10)
+        disseminator.send(self.ids[1:3], vote(2, self.ids[0]), now=0)
+        disseminator.send(self.ids[1:3], vote(3, self.ids[0]), now=5)
+        frames = disseminator.flush(10)
+        self.assertEqual(
+            [(peer, len(frame.envelopes)) for peer, frame in frames],
+            [(self.ids[1], 2), (self.ids[2], 2)],
+        )
+        self.assertEqual(
+            decode_frame(encode_frame(frames[0][1])).envelopes, frames[0][1].envelopes
+        )
+        # copies are dropped by their payload
+        receiver = network.disseminators[self.ids[1]]
+        self.assertEqual(len(receiver.receive(frames[0][1], 10)), 2)
+        self.assertEqual(receiver.receive(frames[0][1], 10), [])
+
+    def test_batching(self):
+        disseminator = Disseminator(self.ids[0], window_ms=10, max_frame_envelopes=3)
+        disseminator.send([self.ids[1]], vote(1, self.ids[0]), now=0)
+        disseminator.send([self.ids[1]], vote(2, self.ids[0]), now=4)
+        disseminator.send([self.ids[2]], vote(2, self.ids[0]), now=5)
+        self.assertEqual(disseminator.flush(9), [])
+        self.assertEqual(disseminator.next_flush(), 10)
+        frames = disseminator.flush(10)
+        self.assertEqual(
+            [(peer, len(frame.envelopes)) for peer, frame in frames], [(self.ids[1], 2)]
+        )
+        self.assertEqual(disseminator.next_flush(), 15)
+        # full frames do not wait
+        for view in range(3, 6):
+            disseminator.send([self.ids[2]], vote(view, self.ids[0]), now=11)
+        frames = disseminator.flush(11)
+        self.assertEqual(
+            [(peer, len(frame.envelopes)) for peer, frame in frames], [(self.ids[2], 4)]
+        )
+        self.assertIsNone(disseminator.next_flush())
+
+    def test_frame_codec(self):
+        disseminator = Disseminator(self.ids[0], fanout=2, window_ms=10)
+        disseminator.send(self.ids[:50], vote(1, self.ids[0]), now=0)
+        disseminator.send(self.ids[:50], vote(2, self.ids[0]), now=0)
+        members = sorted(self.ids)
+        for peer, frame in disseminator.flush(10):
+            self.assertEqual(len(frame.envelopes), 2)
+            for encoding_members in (None, members):
+                data = encode_frame(frame, encoding_members)
+                self.assertEqual(len(data), frame_size(frame, encoding_members))
+                decoded = decode_frame(data, encoding_members)
+                self.assertEqual(decoded, frame)
+                self.assertEqual(
+                    [e.payload for e in decoded.envelopes],
+                    [e.payload for e in frame.envelopes],
+                )
+        with self.assertRaises(DecodeError):
+            decode_frame(encode_frame(Frame()) + b"\x00")
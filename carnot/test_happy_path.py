@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 from carnot.carnot import *
 from unittest import TestCase
 
@@ -178,6 +181,105 @@ class TestCarnotHappyPath(TestCase):
         self.assertEqual(carnot.latest_committed_view(), 3)
         self.assertEqual(carnot.local_high_qc.view, 4)
 
+    def test_long_run_keeps_view_index_and_committed_chain(self):
+        carnot = Carnot(int_to_id(0))
+        genesis_block = self.add_genesis_block(carnot)
+        parent = genesis_block
+        for view in range(1, 1001):
+            block = Block(view=view, qc=StandardQc(block=parent.id(), view=view - 1), _id=int_to_id(view))
+            carnot.receive_block(block)
+            parent = block
+            if view >= 3:
+                self.assertEqual(carnot.latest_committed_view(), view - 2)
+
+        self.assertEqual(carnot.blocks_in_view(500), [carnot.safe_blocks[int_to_id(500)]])
+        self.assertEqual(carnot.blocks_in_view(1001), [])
+        self.assertEqual(set(carnot.committed_blocks()), {b"", *(int_to_id(view) for view in range(1, 999))})
+
+    def test_view_index_follows_direct_updates(self):
+        carnot = Carnot(int_to_id(0))
+        genesis_block = self.add_genesis_block(carnot)
+        block1 = Block(view=1, qc=StandardQc(block=genesis_block.id(), view=0), _id=b"1")
+        carnot.safe_blocks[block1.id()] = block1
+        self.assertEqual(carnot.blocks_in_view(1), [block1])
+        del carnot.safe_blocks[block1.id()]
+        self.assertEqual(carnot.blocks_in_view(1), [])
+        self.assertEqual(carnot.genesis_block(), genesis_block)
+
+    def test_pruning_keeps_safe_blocks_bounded(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "committed.log")
+            carnot = Carnot(int_to_id(0), committed_log=CommittedLog(path), prune=True)
+            genesis_block = self.add_genesis_block(carnot)
+            parent = genesis_block
+            for view in range(1, 101):
+                block = Block(view=view, qc=StandardQc(block=parent.id(), view=view - 1), _id=int_to_id(view))
+                carnot.receive_block(block)
+                parent = block
+                # the committed tip, its child and the latest block
+                self.assertLessEqual(len(carnot.safe_blocks), 3)
+
+            self.assertEqual(carnot.latest_committed_view(), 98)
+            self.assertEqual(carnot.genesis_block(), genesis_block)
+            self.assertEqual([block.view for block in carnot.committed_blocks().values()], list(range(0, 99)))
+            with open(path) as f:
+                self.assertEqual([int(line.split()[0]) for line in f], list(range(0, 99)))
+
+    def test_pruning_drops_uncommittable_forks(self):
+        carnot = Carnot(int_to_id(0), prune=True)
+        genesis_block = self.add_genesis_block(carnot)
+        block1 = Block(view=1, qc=StandardQc(block=genesis_block.id(), view=0), _id=b"1")
+        carnot.receive_block(block1)
+        block2 = Block(view=2, qc=StandardQc(block=block1.id(), view=1), _id=b"2")
+        carnot.receive_block(block2)
+        # a fork from block1, will never be committed once block2 is
+        fork = Block(view=3, qc=StandardQc(block=block1.id(), view=2), _id=b"fork")
+        carnot.safe_blocks[fork.id()] = fork
+        block3 = Block(view=4, qc=StandardQc(block=block2.id(), view=3), _id=b"3")
+        carnot.safe_blocks[block3.id()] = block3
+        carnot.current_view = 4
+        block4 = Block(view=5, qc=StandardQc(block=block3.id(), view=4), _id=b"4")
+        carnot.receive_block(block4)
+        block5 = Block(view=6, qc=StandardQc(block=block4.id(), view=5), _id=b"5")
+        carnot.receive_block(block5)
+
+        self.assertEqual(carnot.latest_committed_view(), 4)
+        self.assertNotIn(fork.id(), carnot.safe_blocks)
+        self.assertNotIn(block1.id(), carnot.safe_blocks)
+        self.assertIn(block1.id(), carnot.committed_blocks())
+        # a late block built on pruned history is ignored
+        carnot.receive_block(Block(view=7, qc=StandardQc(block=block1.id(), view=6), _id=b"late"))
+        self.assertNotIn(b"late", carnot.safe_blocks)
+
+    def test_blocks_inserted_before_their_ancestors(self):
+        def walk(carnot: Carnot) -> Block:
+            # the committed block as derived by scanning every view, blocks missing an ancestor are skipped
+            for view in range(carnot.current_view, 0, -1):
+                for block in carnot.blocks_in_view(view):
+                    parent = carnot.safe_blocks.get(block.parent())
+                    if parent is not None and parent.parent() in carnot.safe_blocks \
+                            and carnot.can_commit_grandparent(block):
+                        return carnot.safe_blocks[parent.parent()]
+            return carnot.genesis_block()
+
+        carnot = Carnot(int_to_id(0))
+        genesis_block = self.add_genesis_block(carnot)
+        blocks = [genesis_block]
+        for view in range(1, 21):
+            blocks.append(Block(view=view, qc=StandardQc(block=blocks[-1].id(), view=view - 1), _id=int_to_id(view)))
+        # a fork committing nothing, from view 3
+        blocks.append(Block(view=8, qc=StandardQc(block=int_to_id(3), view=7), _id=b"fork"))
+        carnot.current_view = 20
+        # children first, parents and grandparents later
+        order = blocks[1:]
+        order = order[10::-1] + order[:10:-3] + order[-2:10:-3] + order[-3:10:-3]
+        self.assertEqual(sorted(block.id() for block in order), sorted(block.id() for block in blocks[1:]))
+        for block in order:
+            carnot.safe_blocks[block.id()] = block
+            self.assertEqual(carnot.latest_committed_block(), walk(carnot))
+        self.assertEqual(carnot.latest_committed_view(), 18)
+        self.assertEqual(set(carnot.committed_blocks()), {b"", *(int_to_id(view) for view in range(1, 19))})
+
     # Test cases for  vote:
     def test_vote_for_received_block(self):
         """
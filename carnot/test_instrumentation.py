@@ -0,0 +1,173 @@
+import json
+from unittest import TestCase
+
+from blspy import BasicSchemeMPL
+
+from carnot.beacon import NormalMode, RandomBeaconHandler, RecoveryMode
+from carnot.beaconized_carnot import BeaconizedBlock, BeaconizedCarnot
+from carnot.carnot import StandardQc, int_to_id
+from carnot.instrumentation import CarnotInstrumentation, chrome_trace
+from carnot.overlay import FlatOverlay
+from carnot.probe import probe
+from carnot.simulation import Simulation, SimulationConfig
+from carnot.tree_overlay import CarnotOverlay
+
+
+class TestCarnotInstrumentation(TestCase):
+    def setUp(self):
+        leader = BasicSchemeMPL.key_gen(bytes(32))
+        pk = leader.get_g1()
+        self.chain = [
+            BeaconizedBlock(
+                view=0,
+                qc=StandardQc(block=b"", view=0),
+                _id=b"",
+                beacon=NormalMode.generate_beacon(leader, -1),
+                pk=pk,
+            )
+        ]
+        for view in range(1, 4):
+            self.chain.append(
+                BeaconizedBlock(
+                    view=view,
+                    qc=StandardQc(block=self.chain[-1].id(), view=view - 1),
+                    _id=int_to_id(view),
+                    beacon=NormalMode.generate_beacon(leader, view - 1),
+                    pk=pk,
+                )
+            )
+
+    def node(self, i: int) -> BeaconizedCarnot:
+        entropy = RecoveryMode.generate_beacon(b"", -1).entropy()
+        node = BeaconizedCarnot(
+            BasicSchemeMPL.key_gen(bytes([i + 1]) * 32),
+            FlatOverlay(int_to_id(0), [int_to_id(0)], entropy),
+            sign_votes=False,
+        )
+        node.safe_blocks[self.chain[0].id()] = self.chain[0]
+        return node
+
+    def test_spans(self):
+        node, other = self.node(0), self.node(1)
+        with CarnotInstrumentation().attach(
+            node
+        ) as instrumentation, CarnotInstrumentation().attach(
+            other
+        ) as other_instrumentation:
+            for block in self.chain[1:]:
+                node.receive_block(block)
+                node.approve_block(block, set())
+            snapshot = instrumentation.snapshot()
+
+        self.assertEqual(snapshot["counters"]["blocks"], 3)
+        self.assertEqual(snapshot["counters"]["votes"], 3)
+        self.assertEqual(snapshot["counters"]["beacon_verifications"], 3)
+        self.assertEqual(snapshot["counters"]["invalid_beacons"], 0)
+        # beacons are verified while the block is approved
+        self.assertGreaterEqual(
+            snapshot["timers"]["approve_block"]["total_s"],
+            snapshot["timers"]["beacon_verify"]["total_s"],
+        )
+        self.assertEqual(sorted(snapshot["views"]), [0, 1, 2, 3])
+        self.assertEqual(snapshot["views"][1]["receive_block"]["count"], 1)
+        self.assertEqual(snapshot["views"][1]["approve_block"]["count"], 1)
+        self.assertEqual(snapshot["views"][1]["beacon_verify"]["count"], 1)
+        # the other node did nothing
+        self.assertEqual(other_instrumentation.spans, [])
+
+    def test_chrome_trace(self):
+        node = self.node(0)
+        with CarnotInstrumentation().attach(node) as instrumentation:
+            for block in self.chain[1:]:
+                node.receive_block(block)
+                node.approve_block(block, set())
+        trace = json.loads(json.dumps(chrome_trace([instrumentation])))
+        complete = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+        self.assertEqual(len(complete), len(instrumentation.spans))
+        self.assertEqual(
+            {event["name"] for event in complete},
+            {"receive_block", "approve_block", "beacon_verify"},
+        )
+        self.assertTrue(all(event["dur"] >= 0 for event in complete))
+        self.assertEqual([event["ph"] for event in trace["traceEvents"]].count("M"), 1)
+
+    def test_detach_restores_node(self):
+        advance, verify_happy = CarnotOverlay.advance, RandomBeaconHandler.verify_happy
+        node = self.node(0)
+        instrumentation = CarnotInstrumentation().attach(node)
+        # nothing shared by every node is patched
+        self.assertIs(CarnotOverlay.advance, advance)
+        self.assertIs(RandomBeaconHandler.verify_happy, verify_happy)
+        instrumentation.detach()
+
+        self.assertNotIn("receive_block", vars(node))
+        self.assertIsNone(probe.get())
+        node.receive_block(self.chain[1])
+        self.assertEqual(instrumentation.snapshot()["counters"]["blocks"], 0)
+
+    def test_shared_timings_outside_of_nodes_are_dropped(self):
+        nodes = [self.node(i) for i in range(3)]
+        instrumentations = [CarnotInstrumentation().attach(node) for node in nodes]
+        try:
+            # verified by none of the nodes, e.g. by a driver
+            handler = RandomBeaconHandler(self.chain[0].beacon)
+            self.assertTrue(
+                handler.verify_happy(self.chain[1].beacon, self.chain[1].pk, 0)
+            )
+            nodes[0].receive_block(self.chain[1])
+            nodes[0].approve_block(self.chain[1], set())
+        finally:
+            for instrumentation in instrumentations:
+                instrumentation.detach()
+        verifications = [
+            instrumentation.snapshot()["counters"]["beacon_verifications"]
+            for instrumentation in instrumentations
+        ]
+        self.assertEqual(verifications, [1, 0, 0])
+
+    def test_max_spans(self):
+        node = self.node(0)
+        with CarnotInstrumentation(max_spans=2).attach(node) as instrumentation:
+            for block in self.chain[1:]:
+                node.receive_block(block)
+        self.assertEqual(len(instrumentation.spans), 2)
+        self.assertEqual(instrumentation.dropped_spans, 1)
+        self.assertEqual(instrumentation.timers["receive_block"].count, 3)
+
+    def test_simulation(self):
+        simulation = Simulation(
+            SimulationConfig(number_of_nodes=20, number_of_committees=3)
+        )
+        instrumentations = [
+            CarnotInstrumentation().attach(driver.node)
+            for driver in simulation.drivers.values()
+        ]
+        try:
+            simulation.run(views=3, max_time_ms=10_000)
+        finally:
+            for instrumentation in instrumentations:
+                instrumentation.detach()
+        snapshots = [instrumentation.snapshot() for instrumentation in instrumentations]
+        self.assertTrue(
+            all(snapshot["counters"]["blocks"] >= 3 for snapshot in snapshots)
+        )
+        self.assertGreaterEqual(
+            sum(snapshot["counters"]["proposals"] for snapshot in snapshots), 3
+        )
+        self.assertGreater(
+            sum(snapshot["counters"]["overlays"] for snapshot in snapshots), 0
+        )
+        # the simulation checks the beacons through a shared BeaconVerifier
+        self.assertTrue(
+            all(
+                snapshot["counters"]["beacon_verifications"] >= 3
+                for snapshot in snapshots
+            )
+        )
+        self.assertEqual(
+            sum(snapshot["counters"]["invalid_beacons"] for snapshot in snapshots), 0
+        )
+        trace = chrome_trace(instrumentations)
+        self.assertEqual(
+            {event["tid"] for event in trace["traceEvents"]}, set(range(20))
+        )
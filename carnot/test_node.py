@@ -0,0 +1,187 @@
+import asyncio
+import os
+import tempfile
+from typing import Dict, List, Optional, Set
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from carnot.carnot import Carnot, Id
+from carnot.node import AdaptiveTimeout, CarnotNode, LocalTransport
+from carnot.simulation import Simulation, SimulationConfig
+from carnot.wal import SafetyLog
+
+
+class WarmedUpTransport(LocalTransport):
+    def __init__(self):
+        super().__init__()
+        self.warmed_up: Set[Id] = set()
+
+    def warm_up(self, peers: List[Id]):
+        self.warmed_up.update(peers)
+
+
+async def start_network(
+    number_of_nodes: int,
+    crashed: Optional[Set[Id]] = None,
+    initial_timeout_s: float = 1.0,
+    transport: Optional[LocalTransport] = None,
+    directory: Optional[str] = None,
+) -> Dict[Id, CarnotNode]:
+    # the simulation builds the keys, the overlay and the genesis block of the network
+    simulation = Simulation(
+        SimulationConfig(number_of_nodes=number_of_nodes, number_of_committees=3)
+    )
+    transport = transport if transport is not None else LocalTransport()
+    queues = {_id: transport.connect(_id) for _id in simulation.ids}
+    nodes = {}
+    for i, (_id, driver) in enumerate(simulation.drivers.items()):
+        if crashed and _id in crashed:
+            transport.disconnect(_id)
+            continue
+        nodes[_id] = await CarnotNode.new(
+            driver,
+            transport,
+            simulation.genesis,
+            AdaptiveTimeout(initial_s=initial_timeout_s, min_s=0.05),
+            inbound_queue=queues[_id],
+            safety_log=SafetyLog(os.path.join(directory, str(i)))
+            if directory
+            else None,
+            strict=True,
+        )
+    return nodes
+
+
+def committed_view(node: CarnotNode):
+    return node.driver.node.latest_committed_block().view
+
+
+class TestAdaptiveTimeout(TestCase):
+    def test_timeout(self):
+        timeout = AdaptiveTimeout(
+            initial_s=1, min_s=0.1, max_s=10, multiplier=4, smoothing=0.5
+        )
+        self.assertEqual(timeout.timeout(), 1)
+        timeout.observe(0.1)
+        self.assertAlmostEqual(timeout.timeout(), 0.4)
+        timeout.observe(0.3)
+        self.assertAlmostEqual(timeout.timeout(), 0.8)
+        # exponential backoff while views keep failing
+        timeout.expired()
+        timeout.expired()
+        self.assertAlmostEqual(timeout.timeout(), 3.2)
+        for _ in range(5):
+            timeout.expired()
+        self.assertEqual(timeout.timeout(), 10)
+        # the average is unchanged, the backoff is reset
+        timeout.observe(0.2)
+        self.assertAlmostEqual(timeout.timeout(), 0.8)
+        timeout.observe(0.0)
+        timeout.observe(0.0)
+        timeout.observe(0.0)
+        self.assertAlmostEqual(timeout.timeout(), 0.1)
+
+
+class TestCarnotNode(IsolatedAsyncioTestCase):
+    async def test_happy_path(self):
+        nodes = await start_network(20)
+        try:
+            while min(committed_view(node) for node in nodes.values()) < 5:
+                await asyncio.sleep(0.01)
+        finally:
+            for node in nodes.values():
+                await node.cancel()
+
+        chains = [list(node.driver.node.committed_blocks()) for node in nodes.values()]
+        longest = max(chains, key=len)
+        self.assertTrue(all(chain == longest[: len(chain)] for chain in chains))
+        for node in nodes.values():
+            self.assertEqual(node.metrics.local_timeouts, 0)
+            self.assertEqual(node.metrics.payloads_rejected, 0)
+            self.assertGreaterEqual(len(node.metrics.view_latency_s), 5)
+            self.assertTrue(node.metrics.inbound_queue_depth)
+            # the view timeout follows the duration of the views
+            self.assertLess(node.view_timeout.timeout(), 1.0)
+
+    async def test_crashed_first_leader(self):
+        simulation = Simulation(
+            SimulationConfig(number_of_nodes=20, number_of_committees=3)
+        )
+        leader = (
+            next(iter(simulation.drivers.values()))
+            .node.overlay.advance(simulation.genesis.beacon.entropy())
+            .leader()
+        )
+        nodes = await start_network(20, crashed={leader}, initial_timeout_s=0.2)
+        try:
+            while min(committed_view(node) for node in nodes.values()) < 3:
+                await asyncio.sleep(0.01)
+        finally:
+            for node in nodes.values():
+                await node.cancel()
+
+        for node in nodes.values():
+            self.assertGreaterEqual(node.metrics.local_timeouts, 1)
+            self.assertIn(1, node.metrics.timed_out_views)
+            self.assertGreater(node.metrics.view_latency_s[1], 0.2)
+
+    async def test_backpressure(self):
+        nodes = await start_network(20)
+        node = next(iter(nodes.values()))
+        # the sender can not deliver anything, the receiver drops the events which do not fit
+        node.tasks[1].cancel()
+        node.outbound_queue = asyncio.Queue(maxsize=1)
+        try:
+            while node.metrics.outbound_dropped == 0:
+                await asyncio.sleep(0.01)
+            handled = node.metrics.payloads_handled
+            # the peers keep timing out and sending to the node, which keeps receiving
+            while node.metrics.payloads_handled == handled:
+                await asyncio.sleep(0.01)
+        finally:
+            for peer in nodes.values():
+                await peer.cancel()
+        # a full outbound queue can not block the receiver, so two nodes whose senders wait for each other to
+        # receive do not deadlock
+        self.assertTrue(node.outbound_queue.full())
+
+    async def test_warm_up_upcoming_leaders(self):
+        transport = WarmedUpTransport()
+        nodes = await start_network(20, transport=transport)
+        try:
+            while min(committed_view(node) for node in nodes.values()) < 5:
+                await asyncio.sleep(0.01)
+        finally:
+            for node in nodes.values():
+                await node.cancel()
+        node = next(iter(nodes.values()))
+        proposers = {
+            bytes(block.pk)
+            for block in node.driver.node.committed_blocks().values()
+            if block.view > 1
+        }
+        self.assertTrue(proposers)
+        self.assertLessEqual(proposers, transport.warmed_up)
+
+    async def test_safety_log(self):
+        with tempfile.TemporaryDirectory() as directory:
+            nodes = await start_network(20, directory=directory)
+            try:
+                while min(committed_view(node) for node in nodes.values()) < 3:
+                    await asyncio.sleep(0.01)
+            finally:
+                for node in nodes.values():
+                    await node.cancel()
+
+            for i, node in enumerate(nodes.values()):
+                recovered = Carnot(node.id)
+                log = SafetyLog(os.path.join(directory, str(i)))
+                log.open(recovered)
+                log.close()
+                self.assertEqual(
+                    recovered.highest_voted_view, node.driver.node.highest_voted_view
+                )
+                self.assertEqual(recovered.current_view, node.driver.node.current_view)
+                self.assertEqual(
+                    recovered.latest_committed_block().id(),
+                    node.driver.node.latest_committed_block().id(),
+                )
@@ -0,0 +1,118 @@
+from typing import List, Tuple
+from unittest import TestCase
+
+from blspy import BasicSchemeMPL, PrivateKey
+
+from carnot.carnot import Id, Vote
+from carnot.qc import (
+    aggregate_qc,
+    decode_signers,
+    encode_signers,
+    prove_possession,
+    sign_vote,
+    verify_possession,
+    verify_qc,
+    verify_vote,
+)
+from carnot.test_beaconized_carnot import initial_setup, succeed
+
+
+def committee(size: int) -> Tuple[List[PrivateKey], List[Id]]:
+    sks = [
+        BasicSchemeMPL.key_gen(i.to_bytes(32, byteorder="little")) for i in range(size)
+    ]
+    sks.sort(key=lambda sk: bytes(sk.get_g1()))
+    return sks, [bytes(sk.get_g1()) for sk in sks]
+
+
+def signed_votes(
+    sks: List[PrivateKey], block: Id = b"block", view: int = 1
+) -> List[Vote]:
+    return [
+        sign_vote(sk, Vote(block=block, view=view, voter=bytes(sk.get_g1()), qc=None))
+        for sk in sks
+    ]
+
+
+class TestQc(TestCase):
+    def setUp(self):
+        self.sks, self.members = committee(10)
+
+    def test_bitmap_roundtrip(self):
+        signers = [self.members[i] for i in (0, 3, 8, 9)]
+        bitmap = encode_signers(self.members, reversed(signers))
+        self.assertEqual(len(bitmap), 2)
+        self.assertEqual(decode_signers(self.members, bitmap), signers)
+
+    def test_aggregated_qc(self):
+        votes = signed_votes(self.sks[:7])
+        self.assertTrue(all(verify_vote(vote) for vote in votes))
+        qc = aggregate_qc(votes, self.members)
+        self.assertEqual((qc.block, qc.view), (b"block", 1))
+        self.assertTrue(verify_qc(qc, self.members, threshold=7))
+        self.assertFalse(verify_qc(qc, self.members, threshold=8))
+
+    def test_invalid_qcs(self):
+        qc = aggregate_qc(signed_votes(self.sks[:7]), self.members)
+        # claiming an extra signer
+        forged = encode_signers(self.members, self.members[:8])
+        self.assertFalse(
+            verify_qc(type(qc)(qc.block, qc.view, qc.signature, forged), self.members)
+        )
+        # different block or view
+        self.assertFalse(
+            verify_qc(
+                type(qc)(b"other", qc.view, qc.signature, qc.signers), self.members
+            )
+        )
+        self.assertFalse(
+            verify_qc(type(qc)(qc.block, 2, qc.signature, qc.signers), self.members)
+        )
+        # unsigned
+        self.assertFalse(verify_qc(type(qc)(qc.block, qc.view), self.members))
+        # votes for another block can not be aggregated in
+        with self.assertRaises(AssertionError):
+            aggregate_qc(
+                signed_votes(self.sks[:2])
+                + signed_votes(self.sks[2:3], block=b"other"),
+                self.members,
+            )
+
+    def test_malformed_qcs(self):
+        qc = aggregate_qc(signed_votes(self.sks[:7]), self.members)
+        # not a point
+        self.assertFalse(
+            verify_qc(type(qc)(qc.block, qc.view, bytes(96), qc.signers), self.members)
+        )
+        self.assertFalse(
+            verify_qc(type(qc)(qc.block, qc.view, b"short", qc.signers), self.members)
+        )
+        # a member id which is not a public key
+        members = [bytes(48)] + self.members[1:]
+        self.assertFalse(verify_qc(qc, members))
+        # signers outside of the committee which voted
+        self.assertFalse(
+            verify_qc(
+                qc, self.members, is_eligible=lambda signer: signer != self.members[0]
+            )
+        )
+        self.assertTrue(
+            verify_qc(
+                qc, self.members, is_eligible=lambda signer: signer in self.members
+            )
+        )
+
+    def test_proof_of_possession(self):
+        proof = prove_possession(self.sks[0])
+        self.assertTrue(verify_possession(self.members[0], proof))
+        self.assertFalse(verify_possession(self.members[1], proof))
+
+    def test_beaconized_votes_are_signed(self):
+        nodes, leader, proposed_block, overlay = initial_setup(self, 5)
+        for node in nodes.values():
+            node.sign_votes = True
+        votes, _ = succeed(nodes, proposed_block, overlay)
+        members = sorted(vote.voter for vote in votes)
+        self.assertTrue(
+            verify_qc(aggregate_qc(votes, members), members, threshold=len(members))
+        )
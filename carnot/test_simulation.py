@@ -0,0 +1,195 @@
+from unittest import TestCase
+
+from carnot.beaconized_carnot import BeaconizedBlock
+from carnot.carnot import StandardQc, Vote
+from carnot.qc import aggregate_qc, sign_vote, verify_qc
+from carnot.simulation import Simulation, SimulationConfig
+
+
+class TestSimulation(TestCase):
+    def test_happy_path(self):
+        simulation = Simulation(
+            SimulationConfig(number_of_nodes=50, number_of_committees=7)
+        )
+        report = simulation.run(views=5, max_time_ms=10_000)
+        self.assertGreaterEqual(report.blocks_committed, 5)
+        self.assertEqual(report.rejected, 0)
+        self.assertEqual(report.local_timeouts, 0)
+        # block, two aggregation levels and the votes to the next leader
+        self.assertLess(report.commit_latency_p95_ms, 4 * 3 * 70)
+        # nodes committed prefixes of the same chain
+        chains = [
+            list(driver.node.committed_blocks())
+            for driver in simulation.drivers.values()
+        ]
+        longest = max(chains, key=len)
+        self.assertGreaterEqual(len(longest), 6)
+        self.assertTrue(all(chain == longest[: len(chain)] for chain in chains))
+
+    def test_crashed_leader(self):
+        simulation = Simulation(
+            SimulationConfig(
+                number_of_nodes=50,
+                number_of_committees=7,
+                view_timeout_ms=500,
+            )
+        )
+        simulation.start()
+        # crash the leader proposing the block after view 2, once the others know who it is
+        while not any(
+            (Vote, 2) in driver.rounds for driver in simulation.drivers.values()
+        ):
+            self.assertTrue(simulation.step())
+        driver = next(
+            driver
+            for driver in simulation.drivers.values()
+            if (Vote, 2) in driver.rounds
+        )
+        simulation.crash(driver.rounds[(Vote, 2)].proposer)
+
+        report = simulation.run(views=6, max_time_ms=20_000)
+        self.assertGreaterEqual(report.timeout_qcs, 1)
+        self.assertGreaterEqual(max(simulation.commits), 6)
+        self.assertEqual(report.rejected, 0)
+
+    def test_deterministic(self):
+        config = SimulationConfig(
+            number_of_nodes=30, number_of_committees=3, drop_rate=0.01, seed=7
+        )
+        first = Simulation(config).run(views=3, max_time_ms=10_000)
+        second = Simulation(config).run(views=3, max_time_ms=10_000)
+        self.assertEqual(first, second)
+
+    def test_tree_dissemination(self):
+        config = SimulationConfig(
+            number_of_nodes=50,
+            number_of_committees=7,
+            dissemination="tree",
+            fanout=4,
+        )
+        unbatched = Simulation(config).run(views=5, max_time_ms=10_000)
+        config.batch_window_ms = 10
+        report = Simulation(config).run(views=5, max_time_ms=10_000)
+        self.assertGreaterEqual(report.blocks_committed, 5)
+        self.assertEqual(report.local_timeouts, 0)
+        self.assertEqual(report.rejected, 0)
+        # relays batch the votes bound for the same committee
+        self.assertLess(report.frames_per_view, unbatched.frames_per_view * 0.75)
+
+    def test_batched_unicast(self):
+        config = SimulationConfig(
+            number_of_nodes=50, number_of_committees=7, batch_window_ms=10
+        )
+        simulation = Simulation(config)
+        report = simulation.run(views=5, max_time_ms=10_000)
+        self.assertGreaterEqual(report.blocks_committed, 5)
+        self.assertEqual(report.local_timeouts, 0)
+        # every message goes straight to its recipient
+        self.assertTrue(
+            all(d.fanout is None for d in simulation.disseminators.values())
+        )
+        self.assertEqual(
+            sum(d.duplicates for d in simulation.disseminators.values()), 0
+        )
+
+    def test_signed_votes(self):
+        simulation = Simulation(
+            SimulationConfig(
+                number_of_nodes=20, number_of_committees=3, sign_votes=True
+            )
+        )
+        report = simulation.run(views=4, max_time_ms=10_000)
+        self.assertGreaterEqual(report.blocks_committed, 3)
+        self.assertEqual(report.rejected, 0)
+        node = next(iter(simulation.drivers.values())).node
+        blocks = [block for block in node.safe_blocks.values() if block.qc.view > 0]
+        self.assertTrue(blocks)
+        for block in blocks:
+            # the QC aggregates the votes of a supermajority of the root committee and its children
+            self.assertIsNotNone(block.qc.signature)
+            self.assertTrue(
+                verify_qc(
+                    block.qc,
+                    node.members(),
+                    node.overlay.leader_super_majority_threshold(node.id),
+                )
+            )
+        # a block whose QC is not signed is rejected
+        block = blocks[-1]
+        forged = BeaconizedBlock(
+            view=block.view + 1,
+            qc=StandardQc(block=block.id(), view=block.view),
+            _id=b"forged",
+            beacon=block.beacon,
+            pk=block.pk,
+        )
+        with self.assertRaises(AssertionError):
+            node.receive_block(forged)
+
+    def test_qc_signers_belong_to_the_committees_of_its_view(self):
+        simulation = Simulation(
+            SimulationConfig(
+                number_of_nodes=30, number_of_committees=7, sign_votes=True
+            )
+        )
+        simulation.run(views=3, max_time_ms=10_000)
+        node = next(iter(simulation.drivers.values())).node
+        block = max(node.safe_blocks.values(), key=lambda block: block.view)
+        overlay = node.overlay_of(block.view)
+        outsiders = [
+            driver.node
+            for driver in simulation.drivers.values()
+            if not overlay.is_member_of_root_committee(driver.id)
+            and not overlay.is_child_of_root_committee(driver.id)
+        ]
+        threshold = overlay.leader_super_majority_threshold(node.id)
+        self.assertGreaterEqual(len(outsiders), threshold)
+        # enough valid signatures, from nodes which did not vote in the view
+        votes = [
+            sign_vote(
+                outsider.sk,
+                Vote(block=block.id(), view=block.view, voter=outsider.id, qc=None),
+            )
+            for outsider in outsiders[:threshold]
+        ]
+        qc = aggregate_qc(votes, node.members())
+        self.assertTrue(verify_qc(qc, node.members(), threshold))
+        self.assertFalse(node.qc_is_valid(qc))
+        # only the genesis block is exempt from signatures
+        self.assertTrue(
+            node.qc_is_valid(StandardQc(block=simulation.genesis.id(), view=0))
+        )
+        self.assertFalse(node.qc_is_valid(StandardQc(block=block.id(), view=0)))
+
+    def test_strict(self):
+        simulation = Simulation(
+            SimulationConfig(
+                number_of_nodes=20,
+                number_of_committees=3,
+                sign_votes=True,
+                strict=False,
+            )
+        )
+        simulation.run(views=2, max_time_ms=10_000)
+        driver = next(iter(simulation.drivers.values()))
+        block = max(driver.node.safe_blocks.values(), key=lambda block: block.view)
+        # the QC is not signed
+        forged = BeaconizedBlock(
+            view=block.view + 1,
+            qc=StandardQc(block=block.id(), view=block.view),
+            _id=b"forged",
+            beacon=block.beacon,
+            pk=block.pk,
+        )
+        simulation.deliver(driver.id, forged)
+        self.assertEqual(len(simulation.rejections), 1)
+        rejection = simulation.rejections[0]
+        self.assertEqual(rejection.node, driver.id)
+        self.assertIs(rejection.payload, forged)
+        self.assertIn("invalid qc", str(rejection.error))
+        self.assertEqual(simulation.report().rejected, 1)
+
+        simulation.config.strict = True
+        with self.assertRaisesRegex(AssertionError, "invalid qc"):
+            simulation.deliver(driver.id, forged)
+        self.assertEqual(len(simulation.rejections), 1)
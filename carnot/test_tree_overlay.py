@@ -1,5 +1,7 @@
+from concurrent.futures import ProcessPoolExecutor
 from unittest import TestCase
 
+from carnot.overlay import FlatOverlay, OverlayPipeline
 from carnot.tree_overlay import CarnotOverlay, CarnotTree
 
 
@@ -25,6 +27,37 @@ class TestCarnotTree(TestCase):
         two = self.tree.inner_committees[2]
         self.assertEqual(self.tree.child_committees(root), (one, two))
 
+    def test_deep_parenting(self):
+        tree = CarnotTree(self.nodes, 7)
+        for idx in range(1, 7):
+            parent = tree.parent_committee(tree.inner_committees[idx])
+            self.assertIn(tree.inner_committees[idx], tree.child_committees(parent))
+
+    def test_routing_table(self):
+        tree = CarnotTree(self.nodes, 7)
+        routes = tree.routing_table()
+        self.assertEqual(set(routes), set(self.nodes))
+        for member, route in routes.items():
+            self.assertIs(route.committee, tree.committee_by_member_id(member))
+            self.assertEqual(route.parent, tree.parent_committee_from_member_id(member))
+            self.assertEqual(route.is_leaf, route.committee in tree.leaf_committees().values())
+            self.assertEqual(route.is_child_of_root, route.parent_idx == 0)
+        # members of the same committee share their route
+        self.assertIs(routes[self.nodes[0]], routes[self.nodes[7]])
+
+    def test_k_ary_tree(self):
+        nodes = [int.to_bytes(i, length=32, byteorder="little") for i in range(40)]
+        tree = CarnotTree(nodes, 13, branching_factor=3)
+        root = tree.inner_committees[0]
+        self.assertEqual(tree.child_committees(root), tuple(tree.inner_committees[1:4]))
+        self.assertEqual(tree.child_committees(tree.inner_committees[4]), (None, None, None))
+        self.assertEqual(tree.leaf_committee_idxs(), range(4, 13))
+        for idx in range(1, 13):
+            parent = tree.parent_committee(tree.inner_committees[idx])
+            self.assertIn(tree.inner_committees[idx], tree.child_committees(parent))
+        # a binary tree of 13 committees has 4 levels, a ternary one only 3
+        self.assertEqual(tree.parent_committee_idx(tree.parent_committee_idx(12)), 0)
+
 
 class TestTreeOverlay(TestCase):
     def setUp(self) -> None:
@@ -49,9 +82,99 @@ class TestTreeOverlay(TestCase):
         self.assertEqual(self.tree.super_majority_threshold(self.nodes[-2]), 0)
 
     def test_super_majority_threshold_for_root_member(self):
-        self.assertEqual(self.tree.super_majority_threshold(self.nodes[0]), 3)
+        # a supermajority of the members of both child committees, 3 members each
+        self.assertEqual(self.tree.super_majority_threshold(self.nodes[0]), 5)
 
     def test_leader_super_majority_threshold(self):
         self.assertEqual(self.tree.leader_super_majority_threshold(self.nodes[0]), 7)
 
+    def test_k_ary_leader_super_majority_threshold(self):
+        nodes = [int.to_bytes(i, length=32, byteorder="little") for i in range(40)]
+        overlay = CarnotOverlay(nodes, nodes[0], b"0"*32, 8, branching_factor=3)
+        # root and its 3 children, 5 members each
+        self.assertEqual(overlay.leader_super_majority_threshold(nodes[0]), 20 * 2 // 3 + 1)
+        self.assertEqual(overlay.advance(b"1"*32).branching_factor, 3)
+        leaf = next(iter(next(iter(overlay.leaf_committees()))))
+        self.assertTrue(overlay.is_member_of_child_committee(next(iter(overlay.parent_committee(leaf))), leaf))
+
+    def test_parent_and_child_committees(self):
+        root, leaf = self.nodes[0], self.nodes[3]
+        self.assertIsNone(self.tree.parent_committee(root))
+        self.assertEqual(self.tree.parent_committee(leaf), self.tree.root_committee())
+        self.assertTrue(self.tree.is_child_of_root_committee(leaf))
+        self.assertFalse(self.tree.is_child_of_root_committee(root))
+        self.assertTrue(self.tree.is_member_of_child_committee(root, leaf))
+        self.assertFalse(self.tree.is_member_of_child_committee(leaf, root))
+        self.assertFalse(self.tree.is_member_of_child_committee(self.nodes[6], leaf))
+        self.assertTrue(self.tree.is_member_of_leaf_committee(leaf))
+        self.assertFalse(self.tree.is_member_of_leaf_committee(root))
+        self.assertFalse(self.tree.is_member_of_root_committee(b"unknown"))
+
 
+
+
+class TestOverlayPipeline(TestCase):
+    def setUp(self) -> None:
+        self.nodes = [int.to_bytes(i, length=32, byteorder="little") for i in range(100)]
+
+    def assert_same_overlay(self, a: CarnotOverlay, b: CarnotOverlay):
+        self.assertEqual(a.nodes, b.nodes)
+        self.assertEqual(a.leader(), b.leader())
+        self.assertEqual(a.entropy, b.entropy)
+        self.assertEqual(a.routes, b.routes)
+
+    def check_pipeline(self, pipeline: OverlayPipeline):
+        overlay = CarnotOverlay(self.nodes, self.nodes[0], b"0" * 32, 7)
+        pipelined = CarnotOverlay(self.nodes, self.nodes[0], b"0" * 32, 7, pipeline=pipeline)
+        for view in range(1, 4):
+            entropy = bytes([view]) * 32
+            pipelined.prefetch(entropy)
+            # speculative builds that are not used are dropped
+            pipelined.prefetch(b"unused")
+            self.assertIn(entropy, pipelined.successors)
+            overlay = overlay.advance(entropy)
+            pipelined = pipelined.advance(entropy)
+            self.assertIs(pipelined.pipeline, pipeline)
+            self.assertEqual(pipelined.successors, {})
+            self.assert_same_overlay(overlay, pipelined)
+
+    def test_thread_pipeline(self):
+        pipeline = OverlayPipeline()
+        self.check_pipeline(pipeline)
+        pipeline.shutdown()
+
+    def test_process_pipeline(self):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            self.check_pipeline(OverlayPipeline(executor))
+
+    def test_advance_without_prefetch(self):
+        pipeline = OverlayPipeline()
+        overlay = CarnotOverlay(self.nodes, self.nodes[0], b"0" * 32, 7, pipeline=pipeline)
+        expected = CarnotOverlay(self.nodes, self.nodes[0], b"0" * 32, 7).advance(b"1" * 32)
+        self.assert_same_overlay(overlay.advance(b"1" * 32), expected)
+        pipeline.shutdown()
+
+    def test_advance_many(self):
+        entropies = [bytes([i]) * 32 for i in range(1, 6)]
+        overlay = CarnotOverlay(self.nodes, self.nodes[0], b"0" * 32, 7)
+        expected = overlay
+        for entropy in entropies:
+            expected = expected.advance(entropy)
+        self.assert_same_overlay(overlay.advance_many(entropies), expected)
+        self.assertEqual(overlay.advance_many(entropies).next_leader(), expected.next_leader())
+        self.assertIs(overlay.advance_many([]), overlay)
+
+    def test_leaders_after(self):
+        entropies = [bytes([i]) * 32 for i in range(1, 6)]
+        overlays = (CarnotOverlay(self.nodes, self.nodes[0], b"0" * 32, 3), FlatOverlay(self.nodes[0], self.nodes, b"0" * 32))
+        for overlay in overlays:
+            expected = []
+            advanced = overlay
+            for entropy in entropies:
+                expected.append(advanced.next_leader())
+                advanced = advanced.advance(entropy)
+            self.assertEqual(overlay.leaders_after(entropies), expected)
+            self.assertEqual(overlay.leaders_after([]), [])
+            # the next leader is drawn once
+            self.assertIs(overlay.next_leader(), overlay.next_leader())
+            self.assertIs(overlay.leader_schedule, overlay.leader_schedule)
@@ -0,0 +1,168 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from carnot.carnot import Block, Carnot, StandardQc, TimeoutQc, int_to_id
+from carnot.wal import SafetyLog
+
+
+def genesis_node() -> Carnot:
+    node = Carnot(int_to_id(0))
+    genesis = Block(view=0, qc=StandardQc(block=b"", view=0), _id=b"")
+    node.safe_blocks[genesis.id()] = genesis
+    node.local_high_qc = genesis.qc
+    node.current_view = 1
+    return node
+
+
+def run_views(node: Carnot, log: SafetyLog, views: range):
+    """
+    The node receives the block of every view and votes for it
+    """
+    for view in views:
+        parent = node.blocks_in_view(view - 1)[0]
+        node.receive_block(
+            Block(
+                view=view,
+                qc=StandardQc(block=parent.id(), view=view - 1),
+                _id=int_to_id(view),
+            )
+        )
+        log.checkpoint()
+        node.highest_voted_view = view
+        log.checkpoint()
+
+
+def state(node: Carnot):
+    return (
+        node.current_view,
+        node.highest_voted_view,
+        node.local_high_qc,
+        node.last_view_timeout_qc,
+        {
+            view: [block.id() for block in node.blocks_in_view(view)]
+            for view in node.safe_blocks.by_view
+        },
+        node.latest_committed_block().id(),
+    )
+
+
+class TestSafetyLog(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open_log(self, node: Carnot, snapshot_interval: int = 1000) -> SafetyLog:
+        log = SafetyLog(self.directory.name, snapshot_interval)
+        log.open(node)
+        self.addCleanup(log.close)
+        return log
+
+    def test_recover(self):
+        node = genesis_node()
+        log = SafetyLog(self.directory.name)
+        self.assertFalse(log.open(node))
+        run_views(node, log, range(1, 11))
+        # view 10 times out
+        node.local_timeout()
+        log.checkpoint()
+        node.receive_timeout_qc(
+            TimeoutQc(
+                view=10,
+                high_qc=node.local_high_qc,
+                qc_views=[11],
+                sender_ids={int_to_id(1)},
+                sender=int_to_id(1),
+            )
+        )
+        log.checkpoint()
+        log.close()
+
+        recovered = Carnot(int_to_id(0))
+        recovered_log = SafetyLog(self.directory.name)
+        self.assertTrue(recovered_log.open(recovered))
+        recovered_log.close()
+        self.assertEqual(state(recovered), state(node))
+        self.assertEqual(recovered.latest_committed_view(), 8)
+        self.assertEqual(
+            list(recovered.committed_blocks()), list(node.committed_blocks())
+        )
+        self.assertEqual(recovered.current_view, 11)
+        self.assertEqual(recovered.highest_voted_view, 10)
+        self.assertEqual(recovered.last_view_timeout_qc.view, 10)
+
+    def test_group_commit(self):
+        node = genesis_node()
+        log = self.open_log(node)
+        syncs = log.syncs
+        run_views(node, log, range(1, 21))
+        # once per vote, the blocks and view changes are synced along
+        self.assertEqual(log.syncs - syncs, 20)
+
+    def test_unsynced_updates_are_lost(self):
+        node = genesis_node()
+        log = self.open_log(node)
+        run_views(node, log, range(1, 6))
+        node.receive_block(
+            Block(view=6, qc=StandardQc(block=int_to_id(5), view=5), _id=int_to_id(6))
+        )
+        log.checkpoint()
+
+        recovered = Carnot(int_to_id(0))
+        self.open_log(recovered)
+        self.assertEqual(recovered.current_view, 5)
+        self.assertEqual(recovered.highest_voted_view, 5)
+        self.assertEqual(recovered.blocks_in_view(6), [])
+
+    def test_torn_record(self):
+        node = genesis_node()
+        log = self.open_log(node)
+        run_views(node, log, range(1, 6))
+        size = os.path.getsize(log.wal_path)
+        run_views(node, log, range(6, 7))
+        # the last vote was cut in the middle of its record
+        with open(log.wal_path, "r+b") as f:
+            f.truncate(os.path.getsize(log.wal_path) - 1)
+        self.assertGreater(os.path.getsize(log.wal_path), size)
+
+        recovered = Carnot(int_to_id(0))
+        self.open_log(recovered)
+        self.assertEqual(recovered.highest_voted_view, 5)
+        self.assertEqual(recovered.current_view, 6)
+        self.assertEqual(recovered.blocks_in_view(6)[0].id(), int_to_id(6))
+
+    def test_snapshot(self):
+        node = genesis_node()
+        log = self.open_log(node, snapshot_interval=10)
+        run_views(node, log, range(1, 10))
+        with open(log.wal_path, "rb") as f:
+            old_updates = f.read()
+        run_views(node, log, range(10, 26))
+        self.assertEqual(log.snapshots, 3)
+        # the log only holds the updates of the views since the last snapshot
+        self.assertLess(
+            os.path.getsize(log.wal_path), os.path.getsize(log.snapshot_path) / 2
+        )
+        log.close()
+
+        # a crash between a snapshot and the truncation of the log replays older updates over the snapshot
+        with open(log.wal_path, "ab") as f:
+            f.write(old_updates)
+        recovered = Carnot(int_to_id(0))
+        self.open_log(recovered)
+        self.assertEqual(state(recovered), state(node))
+
+    def test_recover_pruned(self):
+        node = genesis_node()
+        node.prune = True
+        log = self.open_log(node, snapshot_interval=5)
+        run_views(node, log, range(1, 13))
+        log.close()
+
+        recovered = Carnot(int_to_id(0), prune=True)
+        self.open_log(recovered)
+        self.assertEqual(sorted(recovered.safe_blocks.by_view), [10, 11, 12])
+        self.assertEqual(recovered.latest_committed_view(), 10)
+        self.assertEqual(recovered.local_high_qc, node.local_high_qc)
@@ -1,9 +1,13 @@
 import itertools
+from dataclasses import dataclass
 from hashlib import blake2b
-from typing import List, Dict, Tuple, Set, Optional, Self
+from concurrent.futures import Future
+from typing import Callable, Iterable, List, Dict, Mapping, Sequence, Tuple, Set, Optional, Self
 from carnot.carnot import Id, Committee
-from carnot.overlay import EntropyOverlay
-import random
+from carnot.committee_sizes import CommitteeTable
+from carnot.overlay import EntropyOverlay, OverlayPipeline
+from carnot.probe import probed
+import sampling
 
 
 def blake2b_hash(committee: Committee) -> bytes:
@@ -15,45 +19,71 @@ def blake2b_hash(committee: Committee) -> bytes:
 
 def fisher_yates_shuffle(nodes: List[Id], entropy: bytes):
     """
-    Fisher-yates shuffling algorithm
-    It is the one used by python by default
+    Fisher-yates shuffling algorithm, see `sampling`
     https://en.wikipedia.org/wiki/Fisher%E2%80%93Yates_shuffle
-    https://softwareengineering.stackexchange.com/a/215780
     :param nodes:
     :param entropy:
     :return:
     """
-    random.seed(a=entropy, version=2)
-    random.shuffle(nodes)
+    sampling.shuffle(nodes, entropy)
+
+
+def super_majority_threshold(sizes: Iterable[int]) -> int:
+    """
+    Votes needed from a group of committees of the given sizes: a supermajority of all their members combined
+    """
+    return sum(sizes) * 2 // 3 + 1
+
+
+@dataclass(frozen=True)
+class Route:
+    """
+    Everything a member needs to know about its position in the tree. Members of the same committee share
+    the same route.
+    """
+    committee_idx: int
+    committee: Committee
+    parent_idx: Optional[int]
+    parent: Optional[Committee]
+    child_idxs: Tuple[int, ...]
+    is_leaf: bool
+    is_root: bool
+    is_child_of_root: bool
+    # votes needed from all the child committees combined, 0 for leafs
+    super_majority_threshold: int
 
 
 class CarnotTree:
     """
-    This balanced binary tree implementation uses a combination of indexes and keys to easily calculate parenting
+    This balanced k-ary tree implementation (binary by default) uses a combination of indexes and keys to easily calculate parenting
     committee relationships. It also has caching on different kind of access to conveniently retrieve the committees
     based on:
         * Member of a committee
         * Committee id (hash)
 
-    It is composed of `inner_committees`, an array that matches a binary tree node distribution:
+    It is composed of `inner_committees`, an array that matches a k-ary tree node distribution, for k = 2:
           0,  1,  2,  3..
         [c0, c1, c2, c3  ]
         where `cX` is the committee id (hash of the set with the committee members ids)
-    The number of leafs in the committee is calculated with:
-        total_leafs = (len(inner_committees) + 1) // 2
+    The first leaf, the first committee without children, is calculated with:
+        first_leaf = (len(inner_committees) + k - 2) // k
     Parenting relation can be calculated for a committee index (idx) with:
-        parent_committee_idx = committee_idx // 2 - 1
+        parent_committee_idx = (committee_idx - 1) // k
     Children relation is calculated with those indexes (idx) as well:
-        left_child, right_child = (committee_idx*2 + 1, committee_idx*2 + 2)
+        children = (committee_idx*k + 1, ..., committee_idx*k + k)
+    A wider tree has fewer levels, hence fewer vote aggregation hops, at the cost of more votes per parent.
 
     Then we have some dictionaries/maps that matches different information to those indexes:
         * `membership_committees`: matches committee idx to the actual committee set of participants
         * `committee_id_to_index`: matches committee id (hash) to committee index (idx) in `inner_committees`
         * `committee_by_member`: matches member id to the committee id that is a member from
     """
-    def __init__(self, nodes: List[Id], number_of_committees: int):
+    def __init__(self, nodes: List[Id], number_of_committees: int, branching_factor: int = 2):
         # useless to build an overlay with no committees
         assert number_of_committees > 0
+        assert branching_factor > 1
+        self.number_of_committees = number_of_committees
+        self.branching_factor = branching_factor
         # inner_committees: list of tree nodes (int index) matching hashed external committee id
         self.inner_committees: List[Id]
         # membership committees: matching committee idx to the set of members of a committee
@@ -93,30 +123,48 @@ class CarnotTree:
 
         return hashes, dict(enumerate(committees))
 
-    def parent_committee(self, committee_id: Id) -> Optional[Id]:
+    def parent_committee_idx(self, committee_idx: int) -> Optional[int]:
         # root committee doesnt have a parent
-        if committee_id == self.inner_committees[0]:
+        if committee_idx == 0:
             return None
-        return self.inner_committees[max(self.committee_id_to_index[committee_id] // 2 - 1, 0)]
+        return (committee_idx - 1) // self.branching_factor
+
+    def child_committee_idxs(self, committee_idx: int) -> Tuple[int, ...]:
+        base = committee_idx * self.branching_factor
+        return tuple(range(base + 1, min(base + self.branching_factor + 1, self.number_of_committees)))
 
-    def child_committees(self, committee_id: Id) -> Tuple[Optional[Id], Optional[Id]]:
-        base = self.committee_id_to_index[committee_id] * 2
-        committees_size = len(self.inner_committees)
-        first_child = base + 1
-        second_child = base + 2
-        first_child = self.inner_committees[first_child] if first_child < committees_size else None
-        second_child = self.inner_committees[second_child] if second_child < committees_size else None
-        return first_child, second_child
+    def leaf_committee_idxs(self) -> range:
+        first_leaf = (self.number_of_committees + self.branching_factor - 2) // self.branching_factor
+        return range(first_leaf, self.number_of_committees)
+
+    def committee_id(self, committee_idx: int) -> Id:
+        return self.inner_committees[committee_idx]
+
+    def committee_idx_by_committee_id(self, committee_id: Id) -> Optional[int]:
+        return self.committee_id_to_index.get(committee_id)
+
+    def parent_committee(self, committee_id: Id) -> Optional[Id]:
+        if (parent_idx := self.parent_committee_idx(self.committee_idx_by_committee_id(committee_id))) is not None:
+            return self.committee_id(parent_idx)
+
+    def child_committees(self, committee_id: Id) -> Tuple[Optional[Id], ...]:
+        """
+        :return: the `branching_factor` children ids, `None` for missing children
+        """
+        base = self.committee_idx_by_committee_id(committee_id) * self.branching_factor
+        return tuple(
+            self.committee_id(child) if child < self.number_of_committees else None
+            for child in range(base + 1, base + self.branching_factor + 1)
+        )
 
     def leaf_committees(self) -> Dict[Id, Committee]:
-        total_leafs = (len(self.inner_committees) + 1) // 2
         return {
-            self.inner_committees[i]: self.membership_committees[i]
-            for i in range(len(self.inner_committees) - total_leafs, len(self.inner_committees))
+            self.committee_id(i): self.committee_by_committee_idx(i)
+            for i in self.leaf_committee_idxs()
         }
 
     def root_committee(self) -> Committee:
-        return self.membership_committees[0]
+        return self.committee_by_committee_idx(0)
 
     def committee_by_committee_idx(self, committee_idx: int) -> Optional[Committee]:
         return self.membership_committees.get(committee_idx)
@@ -125,34 +173,156 @@ class CarnotTree:
         return self.committees_by_member.get(member_id)
 
     def committee_id_by_member_id(self, member_id: Id) -> Id:
-        return self.inner_committees[self.committees_by_member.get(member_id)]
+        return self.committee_id(self.committee_idx_by_member_id(member_id))
 
     def committee_by_member_id(self, member_id: Id) -> Optional[Committee]:
         if (committee_idx := self.committee_idx_by_member_id(member_id)) is not None:
             return self.committee_by_committee_idx(committee_idx)
 
     def committee_by_committee_id(self, committee_id: Id) -> Optional[Committee]:
-        if (committee_idx := self.committee_id_to_index.get(committee_id)) is not None:
+        if (committee_idx := self.committee_idx_by_committee_id(committee_id)) is not None:
             return self.committee_by_committee_idx(committee_idx)
 
     def parent_committee_from_member_id(self, _id):
         if (parent_id := self.parent_committee(
                 self.committee_id_by_member_id(_id)
         )) is not None:
-            return self.committee_by_committee_idx(self.committee_id_to_index[parent_id])
+            return self.committee_by_committee_id(parent_id)
+
+    def route(self, committee_idx: int) -> Route:
+        committee = self.committee_by_committee_idx(committee_idx)
+        parent_idx = self.parent_committee_idx(committee_idx)
+        is_leaf = committee_idx in self.leaf_committee_idxs()
+        child_idxs = self.child_committee_idxs(committee_idx)
+        return Route(
+            committee_idx=committee_idx,
+            committee=committee,
+            parent_idx=parent_idx,
+            parent=self.committee_by_committee_idx(parent_idx) if parent_idx is not None else None,
+            child_idxs=child_idxs,
+            is_leaf=is_leaf,
+            is_root=committee_idx == 0,
+            is_child_of_root=parent_idx == 0,
+            super_majority_threshold=0 if is_leaf else super_majority_threshold(
+                len(self.committee_by_committee_idx(child)) for child in child_idxs
+            ),
+        )
+
+    def routing_table(self) -> Mapping[Id, Route]:
+        """
+        Resolve the position of every committee once, so that any overlay query about a member is a single lookup
+        """
+        routes = [self.route(idx) for idx in range(self.number_of_committees)]
+        return {member: routes[idx] for member, idx in self.committees_by_member.items()}
+
+    def successor(self, tree: Callable[..., "CarnotTree"], positions: List[int]) -> Callable[..., "CarnotTree"]:
+        """
+        Builder of the tree of the nodes `[nodes[p] for p in positions]`, `nodes` being the nodes of this tree.
+        Trees keeping state from one view to the next, e.g. `carnot.array_tree.ArrayCarnotTree`, carry it there.
+        """
+        return tree
 
 
 class CarnotOverlay(EntropyOverlay):
-    def __init__(self, nodes: List[Id], current_leader: Id, entropy: bytes, number_of_committees: int):
+    def __init__(
+            self,
+            nodes: List[Id],
+            current_leader: Id,
+            entropy: bytes,
+            number_of_committees: int,
+            pipeline: Optional[OverlayPipeline] = None,
+            tree: Callable[..., CarnotTree] = CarnotTree,
+            branching_factor: int = 2
+    ):
+        """
+        :param tree: builds the committees tree from the nodes, the number of committees and the branching factor,
+        see `carnot.array_tree.ArrayCarnotTree` for large networks
+        :param branching_factor: number of child committees of each inner committee
+        """
+        self.pipeline = pipeline
+        self.tree = tree
+        self.branching_factor = branching_factor
+        # overlays being built in the pipeline, by the entropy they are advanced with
+        self.successors: Dict[bytes, Future] = {}
         self.entropy = entropy
         self.number_of_committees = number_of_committees
-        self.nodes = nodes.copy()
         self.current_leader = current_leader
-        fisher_yates_shuffle(self.nodes, self.entropy)
-        self.carnot_tree = CarnotTree(nodes, number_of_committees)
+        self._next_leader: Optional[Id] = None
+        # the shuffle is drawn over the positions of the nodes, for the tree of the next overlay to follow it
+        positions = list(range(len(nodes)))
+        fisher_yates_shuffle(positions, self.entropy)
+        self.nodes = [nodes[p] for p in positions]
+        self.carnot_tree = tree(nodes, number_of_committees, branching_factor=branching_factor)
+        # builds the tree of the next overlay, whose nodes are `self.nodes`
+        self.next_tree = self.carnot_tree.successor(tree, positions)
+        self.routes: Mapping[Id, Route] = self.carnot_tree.routing_table()
+        # built on first use, it holds half of the nodes
+        self._leaf_committees: Optional[Set[Committee]] = None
+        root_and_children = (0, *self.carnot_tree.child_committee_idxs(0))
+        self._leader_super_majority_threshold = super_majority_threshold(
+            len(self.carnot_tree.committee_by_committee_idx(idx)) for idx in root_and_children
+        )
+
+    @classmethod
+    def from_table(cls, nodes: List[Id], current_leader: Id, entropy: bytes, table: CommitteeTable, **kwargs) -> Self:
+        """
+        Overlay with the number of committees planned for the number of nodes, see `carnot.committee_sizes`
+        """
+        return cls(nodes, current_leader, entropy, table.lookup(len(nodes)), **kwargs)
+
+    def __getstate__(self):
+        # only the overlay itself is sent to and from worker processes
+        return {**self.__dict__, "pipeline": None, "successors": {}}
+
+    def prefetch(self, entropy: bytes):
+        if self.pipeline is None or entropy in self.successors:
+            return
+        self.successors[entropy] = self.pipeline.submit(
+            CarnotOverlay, self.nodes, self.next_leader(), entropy, self.number_of_committees, None, self.next_tree,
+            self.branching_factor
+        )
 
+    @probed("overlay_advance")
     def advance(self, entropy: bytes) -> Self:
-        return CarnotOverlay(self.nodes, self.next_leader(), entropy, self.number_of_committees)
+        if (successor := self.successors.pop(entropy, None)) is not None:
+            # waits for the build to finish if it was prefetched too late
+            overlay = successor.result()
+        else:
+            overlay = CarnotOverlay(
+                self.nodes, self.next_leader(), entropy, self.number_of_committees,
+                tree=self.next_tree, branching_factor=self.branching_factor
+            )
+        # other speculative successors will not be used
+        for future in self.successors.values():
+            future.cancel()
+        self.successors.clear()
+        overlay.pipeline = self.pipeline
+        return overlay
+
+    @probed("overlay_advance_many")
+    def advance_many(self, entropies: Sequence[bytes]) -> Self:
+        if len(entropies) <= 1:
+            return super().advance_many(entropies)
+        # only the order of the nodes and the leader are carried from an overlay to the next,
+        # the committees of the intermediate overlays are never built
+        # positions of the nodes in the order of the tree of this overlay
+        positions = list(range(len(self.nodes)))
+        fisher_yates_shuffle(positions, self.entropy)
+        nodes, entropy = self.nodes, self.entropy
+        for next_entropy in entropies[:-1]:
+            shuffle, entropy = list(range(len(nodes))), next_entropy
+            fisher_yates_shuffle(shuffle, entropy)
+            nodes = [nodes[p] for p in shuffle]
+            positions = [positions[p] for p in shuffle]
+        overlay = CarnotOverlay(
+            nodes, sampling.choice(nodes, entropy), entropies[-1], self.number_of_committees,
+            tree=self.carnot_tree.successor(self.tree, positions), branching_factor=self.branching_factor
+        )
+        for future in self.successors.values():
+            future.cancel()
+        self.successors.clear()
+        overlay.pipeline = self.pipeline
+        return overlay
 
     def is_leader(self, _id: Id):
         return _id == self.leader()
@@ -161,45 +331,50 @@ class CarnotOverlay(EntropyOverlay):
         return self.current_leader
 
     def next_leader(self) -> Id:
-        random.seed(a=self.entropy, version=2)
-        return random.choice(self.nodes)
+        if self._next_leader is None:
+            self._next_leader = sampling.choice(self.nodes, self.entropy)
+        return self._next_leader
+
+    def leaders_after(self, entropies: Sequence[bytes]) -> List[Id]:
+        if len(entropies) == 0:
+            return []
+        # only the order of the nodes is carried from an overlay to the next, as in `advance_many`
+        leaders = [self.next_leader()]
+        nodes = self.nodes
+        for entropy in entropies[:-1]:
+            nodes = nodes.copy()
+            fisher_yates_shuffle(nodes, entropy)
+            leaders.append(sampling.choice(nodes, entropy))
+        return leaders
 
     def is_member_of_leaf_committee(self, _id: Id) -> bool:
-        return _id in set(itertools.chain.from_iterable(self.carnot_tree.leaf_committees().values()))
+        return (route := self.routes.get(_id)) is not None and route.is_leaf
 
     def is_member_of_root_committee(self, _id: Id) -> bool:
-        return _id in self.carnot_tree.root_committee()
+        return (route := self.routes.get(_id)) is not None and route.is_root
 
     def is_member_of_child_committee(self, parent: Id, child: Id) -> bool:
-        child_parent = self.parent_committee(child)
-        parent = self.carnot_tree.committee_by_member_id(parent)
-        return child_parent == parent
+        if (child_route := self.routes.get(child)) is None or (parent_route := self.routes.get(parent)) is None:
+            return False
+        return child_route.parent_idx == parent_route.committee_idx
 
     def parent_committee(self, _id: Id) -> Optional[Committee]:
-        self.carnot_tree.parent_committee_from_member_id(_id)
+        if (route := self.routes.get(_id)) is not None:
+            return route.parent
 
     def leaf_committees(self) -> Set[Committee]:
-        return set(self.carnot_tree.leaf_committees().values())
+        if self._leaf_committees is None:
+            self._leaf_committees = set(self.carnot_tree.leaf_committees().values())
+        return self._leaf_committees
 
     def root_committee(self) -> Committee:
         return self.carnot_tree.root_committee()
 
     def is_child_of_root_committee(self, _id: Id) -> bool:
-        return self.parent_committee(_id) == self.root_committee()
+        return (route := self.routes.get(_id)) is not None and route.is_child_of_root
 
     def leader_super_majority_threshold(self, _id: Id) -> int:
-        root_committee = self.carnot_tree.inner_committees[0]
-        childs = self.carnot_tree.child_committees(root_committee)
-        childs_size = sum(
-            len(committee) for c in childs
-            if (committee := self.carnot_tree.committee_by_committee_id(c)) is not None
-        )
-        root_committee_size = len(self.root_committee())
-        committee_size = root_committee_size + childs_size
-        return (committee_size * 2 // 3) + 1
+        return self._leader_super_majority_threshold
 
     def super_majority_threshold(self, _id: Id) -> int:
-        if self.is_member_of_leaf_committee(_id):
-            return 0
-        committee_size = len(self.carnot_tree.committee_by_member_id(_id))
-        return (committee_size * 2 // 3) + 1
+        return self.routes[_id].super_majority_threshold
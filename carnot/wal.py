@@ -0,0 +1,253 @@
+"""
+Write-ahead log of the Carnot safety state, to restart a node without re-downloading the blocks or voting twice.
+
+A `SafetyLog` persists the updates of `current_view`, `highest_voted_view`, `local_high_qc`, `last_view_timeout_qc`
+and the blocks added to `safe_blocks`, in a directory holding two files:
+    * `snapshot`: the whole state at some view, replaced atomically (written aside, fsynced, renamed)
+    * `wal`: the updates since the snapshot, one record per update
+A record is the length of its body, the crc32 of its body and the body: a tag followed by the `carnot.codec`
+encoding of the value. Recovery stops at the first truncated or corrupted record, which was not synced.
+
+The node is not asked about every update: `checkpoint` compares its state with what was logged last and appends the
+differences. Records are buffered and synced in groups, once per view: the log is fsynced when the highest voted view
+increased, which is when the node is about to send a vote, a timeout or a new view. Everything received during the
+view goes with it. What is lost in a crash (blocks, the current view and qcs received since the last vote) is
+received again from the network, but a vote is never sent before it is durable.
+
+Every `snapshot_interval` views the state is snapshotted and the log truncated. Replaying only moves the state
+forward (the highest views and qcs win, known blocks are skipped), so a crash between the snapshot and the truncation
+is harmless. Replayed blocks go through `SafeBlocks`, which rebuilds its index by view, and the committed state is
+derived again from them.
+
+The overlay and the random beacons are not part of the safety state.
+"""
+import os
+import zlib
+from enum import IntEnum
+from typing import Any, Callable, List, Optional, Tuple
+
+from carnot.carnot import Carnot, Qc, TimeoutQc, View
+from carnot.codec import Reader, Writer
+
+WAL = "wal"
+SNAPSHOT = "snapshot"
+
+
+class Record(IntEnum):
+    BLOCK = 1
+    CURRENT_VIEW = 2
+    HIGHEST_VOTED_VIEW = 3
+    HIGH_QC = 4
+    TIMEOUT_QC = 5
+
+
+def frame(body: bytes) -> bytes:
+    writer = Writer()
+    writer.varint(len(body))
+    writer.buffer += zlib.crc32(body).to_bytes(4, "little")
+    writer.buffer += body
+    return bytes(writer.buffer)
+
+
+def records(data: bytes) -> Tuple[List[Reader], int]:
+    """
+    :return: a reader on the body of every complete record, and the size of the data they take
+    """
+    reader = Reader(data)
+    bodies = []
+    end = 0
+    while end < len(reader.data):
+        try:
+            length = reader.varint()
+        except IndexError:
+            break
+        start = reader.offset + 4
+        body = reader.data[start : start + length]
+        if len(body) < length or zlib.crc32(body) != int.from_bytes(
+            reader.data[reader.offset : start], "little"
+        ):
+            break
+        bodies.append(Reader(body))
+        end = reader.offset = start + length
+    return bodies, end
+
+
+def apply(node: Carnot, reader: Reader):
+    match reader.byte():
+        case Record.BLOCK:
+            block = reader.payload()
+            if block.id() not in node.safe_blocks:
+                node.safe_blocks[block.id()] = block
+        case Record.CURRENT_VIEW:
+            node.current_view = max(node.current_view, reader.zigzag())
+        case Record.HIGHEST_VOTED_VIEW:
+            node.highest_voted_view = max(node.highest_voted_view, reader.zigzag())
+        case Record.HIGH_QC:
+            qc = reader.qc()
+            if node.local_high_qc is None or qc.view > node.local_high_qc.view:
+                node.local_high_qc = qc
+        case Record.TIMEOUT_QC:
+            timeout_qc = reader.timeout_qc()
+            if (
+                node.last_view_timeout_qc is None
+                or timeout_qc.view > node.last_view_timeout_qc.view
+            ):
+                node.last_view_timeout_qc = timeout_qc
+        case tag:
+            raise ValueError(f"unknown record tag {tag}")
+
+
+class SafetyLog:
+    def __init__(self, directory: str, snapshot_interval: int = 1000):
+        """
+        :param snapshot_interval: number of views between snapshots
+        """
+        assert snapshot_interval > 0
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.node: Optional[Carnot] = None
+        self.file = None
+        # records appended since the last sync
+        self.pending = bytearray()
+        # state as of the last records
+        self.current_view: View = 0
+        self.highest_voted_view: View = -1
+        self.local_high_qc: Optional[Qc] = None
+        self.last_view_timeout_qc: Optional[TimeoutQc] = None
+        self.synced_voted_view: View = -1
+        self.snapshot_view: View = 0
+        self.syncs = 0
+        self.snapshots = 0
+
+    @property
+    def wal_path(self) -> str:
+        return os.path.join(self.directory, WAL)
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.directory, SNAPSHOT)
+
+    def open(self, node: Carnot) -> bool:
+        """
+        Restores the state persisted in the directory, if any, into `node` and starts logging its updates.
+        The restored state is compacted into a new snapshot.
+        :return: whether some state was restored
+        """
+        assert self.node is None
+        os.makedirs(self.directory, exist_ok=True)
+        restored = False
+        for path in (self.snapshot_path, self.wal_path):
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    bodies, _ = records(f.read())
+                for reader in bodies:
+                    apply(node, reader)
+                restored = restored or bool(bodies)
+        if restored and node.prune:
+            node.prune_committed()
+        self.node = node
+        node.safe_blocks.journal = []
+        self.file = open(self.wal_path, "ab")
+        self.snapshot()
+        return restored
+
+    def checkpoint(self):
+        """
+        Logs the updates of the node since the last checkpoint, syncs them if the node voted since the last sync,
+        and snapshots the state every `snapshot_interval` views.
+        Call it after every step of the node, before sending the events it returned.
+        """
+        node = self.node
+        for block in node.safe_blocks.journal:
+            self.append(Record.BLOCK, Writer.payload, block)
+        node.safe_blocks.journal.clear()
+        if node.local_high_qc is not self.local_high_qc:
+            self.local_high_qc = node.local_high_qc
+            self.append(Record.HIGH_QC, Writer.qc, node.local_high_qc)
+        if node.last_view_timeout_qc is not self.last_view_timeout_qc:
+            self.last_view_timeout_qc = node.last_view_timeout_qc
+            self.append(Record.TIMEOUT_QC, Writer.timeout_qc, node.last_view_timeout_qc)
+        if node.current_view != self.current_view:
+            self.current_view = node.current_view
+            self.append(Record.CURRENT_VIEW, Writer.zigzag, node.current_view)
+        if node.highest_voted_view != self.highest_voted_view:
+            self.highest_voted_view = node.highest_voted_view
+            self.append(
+                Record.HIGHEST_VOTED_VIEW, Writer.zigzag, node.highest_voted_view
+            )
+        if self.highest_voted_view > self.synced_voted_view:
+            self.sync()
+            if self.current_view - self.snapshot_view >= self.snapshot_interval:
+                self.snapshot()
+
+    def append(self, tag: Record, write: Callable[[Writer, Any], None], value):
+        writer = Writer()
+        writer.buffer.append(tag)
+        write(writer, value)
+        self.pending += frame(bytes(writer.buffer))
+
+    def sync(self):
+        """
+        Makes the records appended so far durable
+        """
+        if self.pending:
+            self.file.write(self.pending)
+            self.pending.clear()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.synced_voted_view = self.highest_voted_view
+        self.syncs += 1
+
+    def snapshot(self):
+        """
+        Replaces the snapshot with the current state of the node, and truncates the log
+        """
+        node = self.node
+        node.safe_blocks.journal.clear()
+        self.pending.clear()
+        self.current_view, self.highest_voted_view = (
+            node.current_view,
+            node.highest_voted_view,
+        )
+        self.local_high_qc, self.last_view_timeout_qc = (
+            node.local_high_qc,
+            node.last_view_timeout_qc,
+        )
+        for view in sorted(node.safe_blocks.by_view):
+            for block in node.safe_blocks.by_view[view]:
+                self.append(Record.BLOCK, Writer.payload, block)
+        if node.local_high_qc is not None:
+            self.append(Record.HIGH_QC, Writer.qc, node.local_high_qc)
+        if node.last_view_timeout_qc is not None:
+            self.append(Record.TIMEOUT_QC, Writer.timeout_qc, node.last_view_timeout_qc)
+        self.append(Record.CURRENT_VIEW, Writer.zigzag, node.current_view)
+        self.append(Record.HIGHEST_VOTED_VIEW, Writer.zigzag, node.highest_voted_view)
+        data, self.pending = self.pending, bytearray()
+
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        self.sync_directory()
+        self.file.truncate(0)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.synced_voted_view = self.highest_voted_view
+        self.snapshot_view = self.current_view
+        self.snapshots += 1
+
+    def sync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+            self.node.safe_blocks.journal = None
@@ -1,15 +1,45 @@
-from typing import TypeAlias, List, Optional
+from typing import Callable, TypeAlias, List, Optional
 from hashlib import sha256, blake2b
 from math import floor
-from copy import deepcopy
 from itertools import chain
+from contextvars import ContextVar
 import functools
+import time
+
+from cryptarchia.lottery import lottery_threshold
 
 # Please note this is still a work in progress
 from dataclasses import dataclass, field
 
 Id: TypeAlias = bytes
 
+# Receives the time taken by the `probed` methods called in the current context, it is set by
+# `cryptarchia.instrumentation` while an instrumented follower runs
+probe: ContextVar[Optional[Callable[[str, float], None]]] = ContextVar(
+    "probe", default=None
+)
+
+
+def probed(name: str):
+    """
+    Reports the time taken by the decorated method to the `probe` of the current context, if any
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if (record := probe.get()) is None:
+                return method(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
 
 @dataclass
 class Epoch:
@@ -199,6 +229,7 @@ class BlockHeader:
     # as serialized in the format specified by the 'HEADER' rule in 'messages.abnf'.
     #
     # The following code is to be considered as a reference implementation, mostly to be used for testing.
+    @probed("header_hash")
     def id(self) -> Id:
         h = blake2b(digest_size=32)
         self.update_header_hash(h)
@@ -253,14 +284,16 @@ class LedgerState:
     # set of nullified coins
     nullifiers: set[Id] = field(default_factory=set)
 
+    @probed("state_copy")
     def copy(self):
         return LedgerState(
             block=self.block,
             nonce=self.nonce,
             total_stake=self.total_stake,
-            commitments_spend=deepcopy(self.commitments_spend),
-            commitments_lead=deepcopy(self.commitments_lead),
-            nullifiers=deepcopy(self.nullifiers),
+            # ids are immutable bytes, a shallow copy of the sets is enough
+            commitments_spend=set(self.commitments_spend),
+            commitments_lead=set(self.commitments_lead),
+            nullifiers=set(self.nullifiers),
         )
 
     def verify_eligible_to_spend(self, commitment: Id) -> bool:
@@ -397,12 +430,13 @@ class Follower:
 
         chains = self.forks + [self.local_chain]
         for chain in chains:
-            if chain.contains_block(block):
-                block_position = chain.block_position(block)
-                return Chain(
-                    blocks=chain.blocks[:block_position],
-                    genesis=self.genesis_state.block,
-                )
+            # the new fork shares the history of `chain` up to and including the parent
+            for block_position, b in enumerate(chain.blocks):
+                if b.id() == block.parent:
+                    return Chain(
+                        blocks=chain.blocks[: block_position + 1],
+                        genesis=self.genesis_state.block,
+                    )
 
         return None
 
@@ -523,19 +557,34 @@ class Leader:
             return MockLeaderProof.new(self.coin, slot, parent)
 
     def propose_block(
-        self, slot: Slot, parent: BlockHeader, orphaned_proofs=[]
+        self, slot: Slot, parent: Id, content: bytes = bytes(32), orphaned_proofs=[]
     ) -> BlockHeader:
         return BlockHeader(
-            parent=parent.id(), slot=slot, orphaned_proofs=orphaned_proofs
+            slot=slot,
+            parent=parent,
+            content_size=len(content),
+            content_id=sha256(content).digest(),
+            leader_proof=MockLeaderProof.new(self.coin, slot, parent),
+            orphaned_proofs=orphaned_proofs,
         )
 
-    def _is_slot_leader(self, epoch: EpochState, slot: Slot):
-        relative_stake = self.coin.value / epoch.total_stake()
+    def leader_schedule(self, epoch: EpochState, slots: range) -> List[Slot]:
+        """
+        The slots within `slots` where this leader wins the lottery for `epoch`.
+
+        The lottery only depends on the epoch nonce, the total stake and the coin,
+        so the schedule can be computed as soon as the epoch state is known.
+        """
+        return [Slot(slot) for slot in slots if self._is_slot_leader(epoch, Slot(slot))]
 
+    def _is_slot_leader(self, epoch: EpochState, slot: Slot):
         r = MOCK_LEADER_VRF.vrf(self.coin, epoch.nonce(), slot)
 
-        return r < MOCK_LEADER_VRF.ORDER * phi(
-            self.config.active_slot_coeff, relative_stake
+        return r < lottery_threshold(
+            self.config.active_slot_coeff,
+            self.coin.value,
+            epoch.total_stake(),
+            MOCK_LEADER_VRF.ORDER,
         )
 
 
@@ -0,0 +1,142 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from hashlib import sha256
+from typing import List, Optional
+
+import numpy as np
+
+from cryptarchia.cryptarchia import Coin, EpochState, Id, LedgerState
+
+COMMITMENT_TAG = b"coin-commitment"
+# tag || nonce || pk || value, see `Coin.commitment`
+COMMITMENT_PREIMAGE_SIZE = len(COMMITMENT_TAG) + 32 + 32 + 32
+
+
+@dataclass
+class Genesis:
+    ledger_state: LedgerState
+    # Both the stake distribution and nonce snapshots of the first epochs are the genesis state
+    epoch_state: EpochState
+
+
+def _to_32_bytes_be(column: np.ndarray) -> np.ndarray:
+    """
+    Encode a column of integers as 32 bytes big endian rows, like `int.to_bytes(x, length=32, byteorder="big")`.
+    Rows that are already (N, 32) uint8 arrays are passed through.
+    """
+    if column.ndim == 2:
+        assert column.shape[1] == 32 and column.dtype == np.uint8
+        return column
+    out = np.zeros((len(column), 32), dtype=np.uint8)
+    out[:, 24:] = column.astype(">u8").view(np.uint8).reshape(-1, 8)
+    return out
+
+
+def commitment_preimages(
+    sks: np.ndarray, values: np.ndarray, nonces: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Build the commitment preimage of every coin in a single vectorised pass.
+
+    :param sks: (N,) unsigned integers or (N, 32) big endian bytes, the coin secret keys
+    :param values: (N,) unsigned integers, the coin values
+    :param nonces: (N, 32) bytes, defaults to the all zeroes nonce of fresh coins
+    :return: (N, COMMITMENT_PREIMAGE_SIZE) uint8 array
+    """
+    n = len(values)
+    assert len(sks) == n
+    preimages = np.empty((n, COMMITMENT_PREIMAGE_SIZE), dtype=np.uint8)
+    offset = len(COMMITMENT_TAG)
+    preimages[:, :offset] = np.frombuffer(COMMITMENT_TAG, dtype=np.uint8)
+    if nonces is None:
+        preimages[:, offset : offset + 32] = 0
+    else:
+        assert nonces.shape == (n, 32)
+        preimages[:, offset : offset + 32] = nonces
+    # pk == sk for the mocked coins
+    preimages[:, offset + 32 : offset + 64] = _to_32_bytes_be(sks)
+    preimages[:, offset + 64 :] = _to_32_bytes_be(values)
+    return preimages
+
+
+def _hash_rows(preimages: bytes) -> List[Id]:
+    view = memoryview(preimages)
+    return [
+        sha256(view[i : i + COMMITMENT_PREIMAGE_SIZE]).digest()
+        for i in range(0, len(view), COMMITMENT_PREIMAGE_SIZE)
+    ]
+
+
+def compute_commitments(
+    sks: np.ndarray,
+    values: np.ndarray,
+    nonces: Optional[np.ndarray] = None,
+    processes: int = 1,
+    chunk_size: int = 1 << 16,
+) -> List[Id]:
+    """
+    Batched equivalent of `[coin.commitment() for coin in coins]`.
+    With `processes > 1` the hashing is split in chunks over a process pool.
+    """
+    preimages = commitment_preimages(sks, values, nonces)
+    if processes <= 1 or len(preimages) <= chunk_size:
+        return _hash_rows(preimages.tobytes())
+
+    chunks = (
+        preimages[i : i + chunk_size].tobytes()
+        for i in range(0, len(preimages), chunk_size)
+    )
+    commitments = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for chunk in executor.map(_hash_rows, chunks):
+            commitments.extend(chunk)
+    return commitments
+
+
+def build_genesis(
+    sks: np.ndarray,
+    values: np.ndarray,
+    nonces: Optional[np.ndarray] = None,
+    genesis_block: Id = bytes(32),
+    genesis_nonce: Id = bytes(32),
+    processes: int = 1,
+) -> Genesis:
+    commitments = compute_commitments(sks, values, nonces, processes=processes)
+    ledger_state = LedgerState(
+        block=genesis_block,
+        nonce=genesis_nonce,
+        # summed as python ints, the total stake may not fit in 64 bits
+        total_stake=sum(values.tolist()),
+        commitments_spend=set(commitments),
+        commitments_lead=set(commitments),
+        nullifiers=set(),
+    )
+    return Genesis(
+        ledger_state=ledger_state,
+        epoch_state=EpochState(
+            stake_distribution_snapshot=ledger_state,
+            nonce_snapshot=ledger_state,
+        ),
+    )
+
+
+def build_genesis_from_coins(coins: List[Coin], **kwargs) -> Genesis:
+    sks = np.frombuffer(b"".join(c.encode_sk() for c in coins), dtype=np.uint8)
+    values = np.array([c.value for c in coins], dtype=np.uint64)
+    nonces = np.frombuffer(b"".join(c.nonce for c in coins), dtype=np.uint8)
+    return build_genesis(sks.reshape(-1, 32), values, nonces.reshape(-1, 32), **kwargs)
+
+
+def load_stake_distribution(path: str, **kwargs) -> Genesis:
+    """
+    Load a stake distribution from either
+        * a `.npz` archive with `sk`, `value` and optionally `nonce` arrays
+        * a csv file with `sk,value` rows
+    """
+    if path.endswith(".npz"):
+        with np.load(path) as data:
+            nonces = data["nonce"] if "nonce" in data else None
+            return build_genesis(data["sk"], data["value"], nonces, **kwargs)
+
+    distribution = np.loadtxt(path, delimiter=",", dtype=np.uint64, ndmin=2)
+    return build_genesis(distribution[:, 0], distribution[:, 1], **kwargs)
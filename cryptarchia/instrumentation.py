@@ -0,0 +1,151 @@
+import cProfile
+import functools
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Self
+
+from cryptarchia.cryptarchia import Follower, probe
+
+
+@dataclass
+class Timer:
+    count: int = 0
+    total_s: float = 0.0
+    max_s: float = 0.0
+
+    def record(self, elapsed_s: float):
+        self.count += 1
+        self.total_s += elapsed_s
+        self.max_s = max(self.max_s, elapsed_s)
+
+
+# Follower methods on the `on_block` path that are timed when instrumented
+TIMED_METHODS = (
+    "on_block",
+    "validate_header",
+    "fork_choice",
+    "state_at_slot_beginning",
+    "compute_epoch_state",
+)
+# timed by `cryptarchia.cryptarchia.probe`
+PROBED_METHODS = ("header_hash", "state_copy")
+
+
+class FollowerInstrumentation:
+    """
+    Opt-in counters and timers for the hot path of `Follower.on_block`.
+
+    `Follower` knows nothing about this class: `attach` shadows the methods of a single
+    follower instance with timed wrappers, so followers which are not instrumented run
+    exactly the same code as before.
+
+    Header hashing and ledger state copies are methods of data classes shared by every
+    follower, they report to `cryptarchia.cryptarchia.probe`, a context variable which the
+    timed methods set for their duration: outside of them, the only cost is one lookup of
+    the variable. Their time goes to the follower whose timed method runs in the same thread
+    or task, calls made outside of an instrumented follower are not counted.
+
+    `detach` freezes the counters, including the number of forks of the follower.
+
+    If a `cProfile.Profile` is given, it is enabled only for the duration of `on_block`,
+    so that the resulting stats can be browsed with `pstats` without the noise of the
+    rest of the program.
+    """
+
+    def __init__(self, profiler: Optional[cProfile.Profile] = None):
+        self.profiler = profiler
+        self.follower: Optional[Follower] = None
+        self.forks_created = 0
+        # forks of the follower when it was detached
+        self.forks = 0
+        self.timers: Dict[str, Timer] = {
+            name: Timer() for name in (*TIMED_METHODS, *PROBED_METHODS)
+        }
+
+    def attach(self, follower: Follower) -> Self:
+        assert self.follower is None, "instrumentation is already attached"
+        self.follower = follower
+        for name in TIMED_METHODS:
+            setattr(follower, name, self.__timed(name, getattr(follower, name)))
+        follower.try_create_fork = self.__counting_forks(follower.try_create_fork)
+        if self.profiler is not None:
+            follower.on_block = self.__profiled(follower.on_block)
+        return self
+
+    def detach(self):
+        assert self.follower is not None, "instrumentation is not attached"
+        for name in (*TIMED_METHODS, "try_create_fork"):
+            # drop the instance attribute so that lookups resolve to the class again
+            delattr(self.follower, name)
+        self.forks = len(self.follower.forks)
+        self.follower = None
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_):
+        if self.follower is not None:
+            self.detach()
+
+    def __timed(self, name: str, method: Callable) -> Callable:
+        timer = self.timers[name]
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            token = probe.set(self.__record)
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                probe.reset(token)
+                self.__record(name, elapsed)
+
+        return timed
+
+    def __record(self, name: str, elapsed_s: float):
+        # calls still running when the follower was detached are not counted
+        if self.follower is not None:
+            self.timers[name].record(elapsed_s)
+
+    def __counting_forks(self, method: Callable) -> Callable:
+        @functools.wraps(method)
+        def counting(*args, **kwargs):
+            fork = method(*args, **kwargs)
+            if fork is not None and self.follower is not None:
+                self.forks_created += 1
+            return fork
+
+        return counting
+
+    def __profiled(self, method: Callable) -> Callable:
+        @functools.wraps(method)
+        def profiled(*args, **kwargs):
+            self.profiler.enable()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.profiler.disable()
+
+        return profiled
+
+    def snapshot(self) -> dict:
+        return {
+            "timers": {
+                name: {
+                    "count": timer.count,
+                    "total_s": timer.total_s,
+                    "max_s": timer.max_s,
+                }
+                for name, timer in self.timers.items()
+            },
+            "counters": {
+                "blocks": self.timers["on_block"].count,
+                "header_hashes": self.timers["header_hash"].count,
+                "state_copies": self.timers["state_copy"].count,
+                "forks_created": self.forks_created,
+            },
+            "forks": len(self.follower.forks)
+            if self.follower is not None
+            else self.forks,
+        }
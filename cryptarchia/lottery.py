@@ -0,0 +1,71 @@
+"""
+Exact integer threshold for the slot leader lottery.
+
+A coin holding `value` out of `total_stake` wins a slot when its VRF output `r` satisfies
+
+    r < ORDER * phi(f, value / total_stake),    phi(f, alpha) = 1 - (1 - f) ** alpha
+
+Evaluating `phi` in floating point only keeps 53 bits of precision while the VRF output has 256,
+and every implementation must agree on the exact same threshold for leadership proofs to be
+verifiable. As in the Ouroboros implementations, the threshold is computed here with integer
+fixed-point arithmetic instead, using the Taylor expansions
+
+    c = -ln(1 - f)      = sum_{n>=1} f^n / n
+    phi = 1 - exp(-c * alpha) = sum_{n>=1} (-1)^(n+1) (c * alpha)^n / n!
+
+The threshold only depends on (f, value, total_stake) which are fixed for a whole epoch,
+so results are cached and the lottery itself is a single integer comparison per slot.
+"""
+
+from fractions import Fraction
+from functools import lru_cache
+
+# Fractional bits of the fixed point representation, comfortably above the 256 bits of the VRF
+# output so that the truncation errors of the series never reach the final threshold.
+PRECISION = 384
+
+
+def _to_fixed(x: Fraction) -> int:
+    return (x.numerator << PRECISION) // x.denominator
+
+
+def _neg_ln_one_minus(f: int) -> int:
+    """-ln(1 - f) for a fixed point f in [0, 1)"""
+    result = 0
+    power = f
+    n = 1
+    while power > 0:
+        result += power // n
+        power = (power * f) >> PRECISION
+        n += 1
+    return result
+
+
+def _one_minus_exp_neg(x: int) -> int:
+    """1 - exp(-x) for a fixed point x >= 0"""
+    result = 0
+    term = x
+    n = 1
+    while term > 0:
+        result += term if n % 2 == 1 else -term
+        n += 1
+        term = ((term * x) >> PRECISION) // n
+    return result
+
+
+@lru_cache(maxsize=4096)
+def lottery_threshold(
+    f: float | Fraction, value: int, total_stake: int, order: int = 2**256
+) -> int:
+    """
+    :param f: 'active slot coefficient' - the rate of occupied slots
+    :param value: stake held by the coin
+    :param total_stake: stake distribution snapshot total stake of the epoch
+    :param order: size of the VRF output space
+    :return: floor(order * phi(f, value / total_stake)), the coin wins the slot if its VRF output is below it
+    """
+    assert 0 <= f < 1
+    assert 0 <= value <= total_stake and total_stake > 0
+    c = _neg_ln_one_minus(_to_fixed(Fraction(f)))
+    x = c * value // total_stake
+    return (_one_minus_exp_neg(x) * order) >> PRECISION
@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, List, Self, Set, TypeAlias
+
+from cryptarchia.cryptarchia import (
+    BlockHeader,
+    Coin,
+    Config,
+    Epoch,
+    EpochState,
+    Follower,
+    LedgerState,
+    Leader,
+    Slot,
+    TimeConfig,
+)
+
+HeaderQueue: TypeAlias = "asyncio.Queue[BlockHeader]"
+
+# samples kept by the metrics, the oldest ones are dropped
+METRICS_WINDOW = 1024
+
+
+class SlotClock:
+    """
+    Maps wall-clock time to slots.
+
+    Waits are always computed against the absolute start time of the target slot,
+    instead of sleeping `slot_duration` in a loop, so that scheduling jitter and the time
+    spent processing a slot never accumulate into drift.
+    """
+
+    def __init__(
+        self,
+        config: TimeConfig,
+        now: Callable[[], float] = time.time,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        """
+        :param now: current time in seconds, `sleep` waits for seconds of that time
+        """
+        self.config = config
+        self.now = now
+        self.sleep = sleep
+
+    def slot_at(self, timestamp_s: float) -> Slot:
+        return Slot(
+            int(
+                (timestamp_s - self.config.chain_start_time)
+                // self.config.slot_duration
+            )
+        )
+
+    def current_slot(self) -> Slot:
+        return self.slot_at(self.now())
+
+    def slot_start(self, slot: Slot) -> float:
+        return (
+            self.config.chain_start_time
+            + slot.absolute_slot * self.config.slot_duration
+        )
+
+    async def sleep_until(self, slot: Slot) -> None:
+        delay = self.slot_start(slot) - self.now()
+        if delay > 0:
+            await self.sleep(delay)
+
+
+def window() -> deque:
+    return deque(maxlen=METRICS_WINDOW)
+
+
+@dataclass
+class NodeMetrics:
+    # Seconds between the start of a slot and the moment our block for that slot was proposed
+    propose_latency_s: Deque[float] = field(default_factory=window)
+    # Depth of the ingest queue, sampled at every slot tick
+    ingest_queue_depth: Deque[int] = field(default_factory=window)
+    blocks_proposed: int = 0
+    headers_ingested: int = 0
+    # Slots that went by without a tick, e.g. because the event loop was blocked
+    missed_slots: int = 0
+    # Times the local chain switched to a fork, dropping the epoch states computed so far
+    fork_switches: int = 0
+    # Exceptions raised by the follower on ingested headers, the header is dropped
+    ingest_errors: Deque[Exception] = field(default_factory=window)
+
+
+@dataclass
+class LeaderSchedule:
+    # coin whose lottery wins are being computed
+    coin: Coin
+    epoch_state: EpochState
+    # absolute slots won by `coin` in the epoch, from the slot the schedule was started at
+    task: "asyncio.Task[Set[int]]"
+
+
+class CryptarchiaNode:
+    """
+    Drives a `Follower` and a `Leader` in real time.
+
+    Two tasks share the event loop:
+        * the slot ticker, which wakes up at the beginning of every slot and proposes a block
+          if the local leader won the lottery for that slot
+        * the ingester, which feeds headers received from the network into the follower
+
+    The leader schedule of an epoch only depends on the epoch state and the coin,
+    so it is computed in a worker thread as soon as the nonce snapshot of the next epoch
+    has been taken, leaving only a set lookup on the proposal path.
+    A proposal evolves the coin: the schedule of the evolved coin is only computed for the
+    rest of the epoch, and until it is ready the lottery is run for the current slot alone.
+    Epoch states and their schedules are dropped when a block changes their snapshots: every
+    one of them on a fork switch, those whose nonce snapshot is not before the block otherwise.
+    """
+
+    config: Config
+    clock: SlotClock
+    follower: Follower
+    leader: Leader
+    # Headers received from other nodes
+    ingest_queue: HeaderQueue
+    # Headers proposed by this node
+    outbound_socket: HeaderQueue
+    metrics: NodeMetrics
+    epoch_states: Dict[int, EpochState]
+    schedules: Dict[int, LeaderSchedule]
+    tasks: List[
+        asyncio.Task
+    ]  # References just to prevent tasks from being garbage collected
+
+    @classmethod
+    async def new(
+        cls,
+        config: Config,
+        genesis_state: LedgerState,
+        coin: Coin,
+        now: Callable[[], float] = time.time,
+        ingest_queue_size: int = 1024,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> Self:
+        self = cls()
+        self.config = config
+        self.clock = SlotClock(config.time, now, sleep)
+        self.follower = Follower(genesis_state, config)
+        self.leader = Leader(config=config, coin=coin)
+        self.ingest_queue = asyncio.Queue(maxsize=ingest_queue_size)
+        self.outbound_socket = asyncio.Queue()
+        self.metrics = NodeMetrics()
+        self.epoch_states = {}
+        self.schedules = {}
+        self.tasks = [
+            asyncio.create_task(self.__tick()),
+            asyncio.create_task(self.__ingest()),
+        ]
+        return self
+
+    async def __tick(self):
+        slot = self.clock.current_slot()
+        while True:
+            await self.clock.sleep_until(slot)
+            current = self.clock.current_slot()
+            if current < slot:
+                # woke up slightly before the slot boundary, wait for the remainder
+                continue
+            self.metrics.missed_slots += current.absolute_slot - slot.absolute_slot
+            await self.__on_slot(current)
+            slot = Slot(current.absolute_slot + 1)
+
+    async def __on_slot(self, slot: Slot):
+        self.metrics.ingest_queue_depth.append(self.ingest_queue.qsize())
+        if self.__is_slot_leader(slot):
+            self.__propose(slot)
+        self.__prefetch_next_epoch(slot)
+
+    def __is_slot_leader(self, slot: Slot) -> bool:
+        schedule = self.__leader_schedule(slot.epoch(self.config), slot)
+        if schedule.task.done():
+            return slot.absolute_slot in schedule.task.result()
+        leader = Leader(config=self.config, coin=schedule.coin)
+        return bool(
+            leader.leader_schedule(
+                schedule.epoch_state, range(slot.absolute_slot, slot.absolute_slot + 1)
+            )
+        )
+
+    def __propose(self, slot: Slot):
+        block = self.leader.propose_block(slot, self.follower.tip_id())
+        self.__on_block(block)
+        self.outbound_socket.put_nowait(block)
+        self.metrics.propose_latency_s.append(
+            self.clock.now() - self.clock.slot_start(slot)
+        )
+        self.metrics.blocks_proposed += 1
+        # the nullifier of the coin is now spent, following slots are led by the evolved coin
+        self.leader.coin = self.leader.coin.evolve()
+        # start computing the schedule of the evolved coin for the rest of the epoch
+        self.__leader_schedule(slot.epoch(self.config), Slot(slot.absolute_slot + 1))
+
+    def __on_block(self, block: BlockHeader):
+        chain, length = self.follower.local_chain, self.follower.local_chain.length()
+        self.follower.on_block(block)
+        if self.follower.local_chain is not chain:
+            # the epoch states, and the schedules drawn from them, were computed on the
+            # chain we switched away from
+            self.metrics.fork_switches += 1
+            self.__drop_epochs(list(self.epoch_states) + list(self.schedules))
+        elif chain.length() > length:
+            # a late block changes the snapshots taken after it
+            self.__drop_epochs(
+                [
+                    epoch
+                    for epoch in self.epoch_states
+                    if self.__nonce_snapshot_slot(Epoch(epoch)) >= block.slot
+                ]
+            )
+
+    def __drop_epochs(self, epochs: List[int]):
+        for epoch in epochs:
+            self.epoch_states.pop(epoch, None)
+            if (schedule := self.schedules.pop(epoch, None)) is not None:
+                schedule.task.cancel()
+
+    def __nonce_snapshot_slot(self, epoch: Epoch) -> Slot:
+        # the last of the snapshots of `Follower.compute_epoch_state`, after the stake one
+        return Slot(
+            (epoch.epoch - 1) * self.config.epoch_length
+            + self.config.base_period_length
+            * (
+                self.config.epoch_stake_distribution_stabilization
+                + self.config.epoch_period_nonce_buffer
+            )
+        )
+
+    def __epoch_state(self, epoch: Epoch) -> EpochState:
+        if epoch.epoch not in self.epoch_states:
+            self.epoch_states[epoch.epoch] = self.follower.compute_epoch_state(
+                epoch, self.follower.local_chain
+            )
+        return self.epoch_states[epoch.epoch]
+
+    def __leader_schedule(self, epoch: Epoch, start: Slot) -> LeaderSchedule:
+        """
+        Schedule of the current coin in `epoch`, computed from `start` on if not known yet
+        """
+        coin = self.leader.coin
+        schedule = self.schedules.get(epoch.epoch)
+        if schedule is None or schedule.coin != coin:
+            epoch_state = self.__epoch_state(epoch)
+            first_slot = epoch.epoch * self.config.epoch_length
+            slots = range(
+                max(first_slot, start.absolute_slot),
+                first_slot + self.config.epoch_length,
+            )
+            # the lottery runs on a private Leader so that evolving our coin while
+            # the schedule is being computed does not affect the result
+            leader = Leader(config=self.config, coin=coin)
+            if schedule is not None:
+                schedule.task.cancel()
+            schedule = self.schedules[epoch.epoch] = LeaderSchedule(
+                coin=coin,
+                epoch_state=epoch_state,
+                task=asyncio.create_task(
+                    asyncio.to_thread(
+                        self.__compute_schedule, leader, epoch_state, slots
+                    )
+                ),
+            )
+            self.__drop_past_epochs(epoch)
+        return schedule
+
+    @staticmethod
+    def __compute_schedule(
+        leader: Leader, epoch_state: EpochState, slots: range
+    ) -> Set[int]:
+        return {
+            slot.absolute_slot for slot in leader.leader_schedule(epoch_state, slots)
+        }
+
+    def __prefetch_next_epoch(self, slot: Slot):
+        # The snapshots for the next epoch are taken during the current one, the schedule
+        # can be computed as soon as the nonce snapshot slot has passed.
+        next_epoch = Epoch(slot.epoch(self.config).epoch + 1)
+        if slot >= self.__nonce_snapshot_slot(next_epoch):
+            self.__leader_schedule(next_epoch, Slot(0))
+
+    def __drop_past_epochs(self, epoch: Epoch):
+        for past in [e for e in self.schedules if e < epoch.epoch - 1]:
+            del self.schedules[past]
+        for past in [e for e in self.epoch_states if e < epoch.epoch - 1]:
+            del self.epoch_states[past]
+
+    async def __ingest(self):
+        while True:
+            block = await self.ingest_queue.get()
+            try:
+                self.__on_block(block)
+                self.metrics.headers_ingested += 1
+            except Exception as e:
+                # a bad header must not take the ingester down with it
+                self.metrics.ingest_errors.append(e)
+            finally:
+                self.ingest_queue.task_done()
+
+    async def cancel(self) -> None:
+        tasks = self.tasks + [schedule.task for schedule in self.schedules.values()]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with suppress(asyncio.CancelledError):
+                await task
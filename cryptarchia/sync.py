@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+from cryptarchia.cryptarchia import BlockHeader, Chain, Follower, Id
+
+
+class LocalPeer:
+    """
+    In-process stand-in for a remote peer, serving headers from the local chain of a `Follower`.
+
+    A peer is addressed by height, the position of a block in its local chain,
+    plus a membership query over block ids which is used to locate fork points.
+    An optional latency is added to every request to emulate round trips.
+    """
+
+    def __init__(self, follower: Follower, latency_s: float = 0.0):
+        self.follower = follower
+        self.latency_s = latency_s
+        self.requests = 0
+        # ids of the blocks of `_indexed_chain`, by height
+        self._indexed_chain: Optional[Chain] = None
+        self._ids: List[Id] = []
+        self._heights: Dict[Id, int] = {}
+
+    async def __round_trip(self):
+        self.requests += 1
+        if self.latency_s > 0:
+            await asyncio.sleep(self.latency_s)
+
+    def __index(self) -> Tuple[List[Id], Dict[Id, int]]:
+        chain = self.follower.local_chain
+        if chain is not self._indexed_chain or len(self._ids) > chain.length():
+            # the follower switched to another fork, forget the previous index
+            self._indexed_chain = chain
+            self._ids = []
+            self._heights = {}
+        for height in range(len(self._ids), chain.length()):
+            block_id = chain.blocks[height].id()
+            self._ids.append(block_id)
+            self._heights[block_id] = height
+        return self._ids, self._heights
+
+    async def tip(self) -> Tuple[Id, int]:
+        await self.__round_trip()
+        ids, _ = self.__index()
+        return (ids[-1] if ids else self.follower.genesis_state.block), len(ids)
+
+    async def has_block(self, block_id: Id) -> bool:
+        await self.__round_trip()
+        _, heights = self.__index()
+        return block_id in heights
+
+    async def headers(self, start: int, count: int) -> List[BlockHeader]:
+        await self.__round_trip()
+        return self.follower.local_chain.blocks[start : start + count]
+
+
+class SyncError(Exception):
+    """
+    `peer` served headers which can not be applied to the chain
+    """
+
+    def __init__(self, peer: LocalPeer, message: str):
+        super().__init__(message)
+        self.peer = peer
+
+
+def links(headers: List[BlockHeader], parent: Id, count: int) -> bool:
+    """
+    Whether `headers` are `count` consecutive blocks, the first one a child of `parent`
+    """
+    if len(headers) != count:
+        return False
+    for header in headers:
+        if header.parent != parent:
+            return False
+        parent = header.id()
+    return True
+
+
+@dataclass
+class SyncStats:
+    headers: int = 0
+    elapsed_s: float = 0.0
+    # height of the last block shared with the sync target
+    fork_point: int = 0
+    fork_point_probes: int = 0
+    # header batches that had to be fetched again from the sync target
+    refetched_batches: int = 0
+    # peers dropped for serving invalid headers
+    dropped_peers: int = 0
+
+    @property
+    def headers_per_second(self) -> float:
+        return self.headers / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+
+class HeaderSync:
+    """
+    Header-first synchronization of a `Follower` against a set of peers.
+
+    The peer with the highest tip is chosen as the sync target and the fork point with it is
+    located by probing our own block ids at exponentially increasing depths from the tip,
+    followed by a binary search between the last hit and the last miss.
+    Headers past the fork point are then requested in batches from every peer which is at
+    least as high as the batch, keeping up to `pipeline_depth` requests in flight per peer.
+    Batches are applied to the follower in order; a batch that is short or whose headers
+    do not link to each other and to the previous batch (e.g. the peer serving it is on
+    another fork) is fetched again from the sync target. If the batch of the target is
+    invalid too, or the follower rejects a header, the peer which served it is dropped and
+    the sync starts again from the new fork point with the remaining peers. The sync fails
+    with a `SyncError` when no peer is left.
+    """
+
+    def __init__(
+        self,
+        follower: Follower,
+        peers: List[LocalPeer],
+        batch_size: int = 128,
+        pipeline_depth: int = 4,
+    ):
+        assert len(peers) > 0
+        self.follower = follower
+        self.peers = list(peers)
+        self.batch_size = batch_size
+        self.pipeline_depth = pipeline_depth
+
+    async def sync(self) -> SyncStats:
+        stats = SyncStats()
+        start = time.perf_counter()
+
+        while True:
+            try:
+                await self.__sync(stats)
+                break
+            except SyncError as e:
+                self.peers.remove(e.peer)
+                stats.dropped_peers += 1
+                if not self.peers:
+                    raise
+
+        stats.elapsed_s = time.perf_counter() - start
+        return stats
+
+    async def __sync(self, stats: SyncStats):
+        tips = await asyncio.gather(*(peer.tip() for peer in self.peers))
+        target, (_, target_height) = max(
+            zip(self.peers, tips), key=lambda peer_tip: peer_tip[1][1]
+        )
+        stats.fork_point = await self.find_fork_point(target, stats)
+        # peers which can serve a range are the ones which are at least as high as its end
+        heights = {peer: height for peer, (_, height) in zip(self.peers, tips)}
+
+        await self.__download(target, heights, stats.fork_point, target_height, stats)
+
+    async def find_fork_point(self, peer: LocalPeer, stats: SyncStats) -> int:
+        """
+        :return: the number of blocks of our local chain that are also in the chain of `peer`
+        """
+        ids = [block.id() for block in self.follower.local_chain.blocks]
+        if not ids:
+            return 0
+
+        # exponential probing from the tip: ids[lowest_miss] is unknown to the peer
+        lowest_miss = len(ids)
+        depth = 0
+        highest_hit = -1
+        while True:
+            height = len(ids) - 1 - depth
+            if height < 0:
+                break
+            stats.fork_point_probes += 1
+            if await peer.has_block(ids[height]):
+                highest_hit = height
+                break
+            lowest_miss = height
+            depth = max(1, depth * 2)
+
+        # binary search between the last hit and the last miss
+        while lowest_miss - highest_hit > 1:
+            middle = (highest_hit + lowest_miss) // 2
+            stats.fork_point_probes += 1
+            if await peer.has_block(ids[middle]):
+                highest_hit = middle
+            else:
+                lowest_miss = middle
+
+        return highest_hit + 1
+
+    async def __download(
+        self,
+        target: LocalPeer,
+        heights: Dict[LocalPeer, int],
+        start: int,
+        end: int,
+        stats: SyncStats,
+    ):
+        ranges = deque(
+            (s, min(s + self.batch_size, end))
+            for s in range(start, end, self.batch_size)
+        )
+        slots = {peer: asyncio.Semaphore(self.pipeline_depth) for peer in heights}
+        window = len(heights) * self.pipeline_depth
+        in_flight: Deque[Tuple[int, int, LocalPeer, asyncio.Task]] = deque()
+        turn = 0
+
+        async def fetch(peer: LocalPeer, s: int, e: int) -> List[BlockHeader]:
+            async with slots[peer]:
+                return await peer.headers(s, e - s)
+
+        def schedule():
+            nonlocal turn
+            while ranges and len(in_flight) < window:
+                s, e = ranges.popleft()
+                eligible = [peer for peer, height in heights.items() if height >= e]
+                peer = eligible[turn % len(eligible)]
+                turn += 1
+                in_flight.append((s, e, peer, asyncio.create_task(fetch(peer, s, e))))
+
+        if start > 0:
+            parent = self.follower.local_chain.blocks[start - 1].id()
+        else:
+            parent = self.follower.genesis_state.block
+
+        try:
+            schedule()
+            while in_flight:
+                s, e, peer, task = in_flight.popleft()
+                headers = await task
+                if not links(headers, parent, e - s):
+                    stats.refetched_batches += 1
+                    peer, headers = target, await target.headers(s, e - s)
+                    if not links(headers, parent, e - s):
+                        raise SyncError(
+                            target,
+                            f"sync target served headers [{s}, {e}) which do not extend the chain",
+                        )
+                for header in headers:
+                    self.follower.on_block(header)
+                    # the follower ignores the headers it rejects
+                    if header.id() not in self.follower.ledger_state:
+                        raise SyncError(
+                            peer, f"the follower rejected header {header.id().hex()}"
+                        )
+                    stats.headers += 1
+                parent = headers[-1].id()
+                schedule()
+        finally:
+            for _, _, _, task in in_flight:
+                task.cancel()
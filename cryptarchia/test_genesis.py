@@ -0,0 +1,67 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from cryptarchia.cryptarchia import Coin, Follower
+from cryptarchia.genesis import (
+    build_genesis,
+    build_genesis_from_coins,
+    compute_commitments,
+    load_stake_distribution,
+)
+from cryptarchia.test_ledger_state_update import config, mk_block, mk_genesis_state
+
+
+class TestGenesis(TestCase):
+    def test_commitments_match_coins(self):
+        sks = np.arange(100, dtype=np.uint64)
+        values = np.arange(100, 200, dtype=np.uint64)
+
+        commitments = compute_commitments(sks, values)
+
+        expected = [
+            Coin(sk=int(sk), value=int(value)).commitment()
+            for sk, value in zip(sks, values)
+        ]
+        self.assertEqual(commitments, expected)
+
+    def test_multiprocess_commitments(self):
+        sks = np.arange(1000, dtype=np.uint64)
+        values = np.full(1000, 10, dtype=np.uint64)
+        self.assertEqual(
+            compute_commitments(sks, values, processes=2, chunk_size=128),
+            compute_commitments(sks, values),
+        )
+
+    def test_genesis_matches_per_coin_construction(self):
+        coins = [Coin(sk=i, value=i + 1) for i in range(10)] + [
+            Coin(sk=2**200, value=7).evolve()
+        ]
+        genesis = build_genesis_from_coins(coins)
+        expected = mk_genesis_state(coins)
+
+        self.assertEqual(genesis.ledger_state, expected)
+        self.assertEqual(genesis.epoch_state.total_stake(), expected.total_stake)
+        self.assertEqual(genesis.epoch_state.nonce(), expected.nonce)
+
+        # a follower can be started from the bulk genesis
+        follower = Follower(genesis.ledger_state, config())
+        block = mk_block(genesis.ledger_state.block, 1, coins[3])
+        follower.on_block(block)
+        self.assertEqual(follower.tip_id(), block.id())
+
+    def test_load_from_files(self):
+        sks = np.arange(5, dtype=np.uint64)
+        values = np.arange(5, dtype=np.uint64) * 10
+        expected = build_genesis(sks, values)
+
+        with tempfile.TemporaryDirectory() as directory:
+            npz = os.path.join(directory, "stake.npz")
+            np.savez(npz, sk=sks, value=values)
+            self.assertEqual(load_stake_distribution(npz), expected)
+
+            csv = os.path.join(directory, "stake.csv")
+            np.savetxt(csv, np.stack([sks, values], axis=1), fmt="%d", delimiter=",")
+            self.assertEqual(load_stake_distribution(csv), expected)
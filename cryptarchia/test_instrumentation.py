@@ -0,0 +1,113 @@
+import cProfile
+import pstats
+import threading
+from unittest import TestCase
+
+from cryptarchia.cryptarchia import BlockHeader, Coin, Follower, LedgerState, probe
+from cryptarchia.instrumentation import FollowerInstrumentation
+from cryptarchia.test_ledger_state_update import config, mk_block, mk_genesis_state
+
+
+class TestFollowerInstrumentation(TestCase):
+    def setUp(self):
+        self.coins = [Coin(sk=0, value=100), Coin(sk=1, value=100)]
+        self.genesis = mk_genesis_state(self.coins)
+        self.follower = Follower(self.genesis, config())
+
+    def test_counts_hot_path(self):
+        with FollowerInstrumentation().attach(self.follower) as instrumentation:
+            b1 = mk_block(self.genesis.block, 1, self.coins[0])
+            self.follower.on_block(b1)
+            b2 = mk_block(b1.id(), 2, self.coins[0].evolve())
+            self.follower.on_block(b2)
+            # fork off genesis
+            b3 = mk_block(self.genesis.block, 2, self.coins[1])
+            self.follower.on_block(b3)
+
+            snapshot = instrumentation.snapshot()
+
+        self.assertEqual(snapshot["counters"]["blocks"], 3)
+        self.assertEqual(snapshot["counters"]["forks_created"], 1)
+        self.assertEqual(snapshot["forks"], 1)
+        self.assertGreater(snapshot["counters"]["header_hashes"], 0)
+        self.assertGreater(snapshot["counters"]["state_copies"], 0)
+        self.assertEqual(snapshot["timers"]["validate_header"]["count"], 3)
+        self.assertEqual(snapshot["timers"]["fork_choice"]["count"], 3)
+        self.assertGreater(snapshot["timers"]["state_at_slot_beginning"]["count"], 0)
+        self.assertGreaterEqual(
+            snapshot["timers"]["on_block"]["total_s"],
+            snapshot["timers"]["validate_header"]["total_s"],
+        )
+
+    def test_shared_timers_go_to_the_running_follower(self):
+        other = Follower(self.genesis, config())
+        with FollowerInstrumentation().attach(
+            self.follower
+        ) as instrumentation, FollowerInstrumentation().attach(other) as idle:
+            b1 = mk_block(self.genesis.block, 1, self.coins[0])
+            self.follower.on_block(b1)
+            # hashed outside of any follower
+            b1.id()
+
+        self.assertGreater(instrumentation.snapshot()["counters"]["header_hashes"], 0)
+        self.assertGreater(instrumentation.snapshot()["counters"]["state_copies"], 0)
+        self.assertEqual(idle.snapshot()["counters"]["header_hashes"], 0)
+        self.assertEqual(idle.snapshot()["counters"]["state_copies"], 0)
+
+    def test_shared_timers_stay_in_their_thread(self):
+        b1 = mk_block(self.genesis.block, 1, self.coins[0])
+        with FollowerInstrumentation().attach(self.follower) as sequential:
+            self.follower.on_block(b1)
+        hashes = sequential.snapshot()["counters"]["header_hashes"]
+
+        follower = Follower(self.genesis, config())
+        inside, resume = threading.Event(), threading.Event()
+        fork_choice = follower.fork_choice
+
+        def pausing_fork_choice():
+            inside.set()
+            resume.wait()
+            return fork_choice()
+
+        follower.fork_choice = pausing_fork_choice
+        with FollowerInstrumentation().attach(follower) as instrumentation:
+            thread = threading.Thread(target=follower.on_block, args=(b1,))
+            thread.start()
+            inside.wait()
+            # hashed by another thread while the follower is running
+            for _ in range(10):
+                b1.id()
+            resume.set()
+            thread.join()
+
+        self.assertEqual(
+            instrumentation.snapshot()["counters"]["header_hashes"], hashes
+        )
+
+    def test_detach_restores_follower(self):
+        header_id, state_copy = BlockHeader.id, LedgerState.copy
+        instrumentation = FollowerInstrumentation().attach(self.follower)
+        # nothing shared by every follower is patched
+        self.assertIs(BlockHeader.id, header_id)
+        self.assertIs(LedgerState.copy, state_copy)
+        self.follower.on_block(mk_block(self.genesis.block, 2, self.coins[1]))
+        self.follower.on_block(mk_block(self.genesis.block, 1, self.coins[0]))
+        instrumentation.detach()
+
+        self.assertNotIn("on_block", vars(self.follower))
+        self.assertIsNone(probe.get())
+
+        frozen = instrumentation.snapshot()
+        self.assertEqual(frozen["counters"]["blocks"], 2)
+        self.assertEqual(frozen["forks"], 1)
+        self.follower.on_block(mk_block(self.genesis.block, 3, self.coins[0]))
+        self.assertEqual(instrumentation.snapshot(), frozen)
+
+    def test_profiler_hook(self):
+        profiler = cProfile.Profile()
+        with FollowerInstrumentation(profiler).attach(self.follower):
+            self.follower.on_block(mk_block(self.genesis.block, 1, self.coins[0]))
+
+        stats = pstats.Stats(profiler)
+        profiled = {function for (_, _, function) in stats.stats}
+        self.assertIn("validate_header", profiled)
@@ -3,6 +3,7 @@ from unittest import TestCase
 import numpy as np
 
 from .cryptarchia import (
+    Follower,
     Leader,
     Config,
     EpochState,
@@ -53,3 +54,31 @@ class TestLeader(TestCase):
         assert (
             abs(leader_rate - p) < margin_of_error
         ), f"{leader_rate} != {p}, err={abs(leader_rate - p)} > {margin_of_error}"
+
+    def test_proposed_block_is_accepted_by_follower(self):
+        coin = Coin(sk=0, value=100)
+        genesis = LedgerState(
+            block=bytes(32),
+            nonce=bytes(32),
+            total_stake=coin.value,
+            commitments_spend={coin.commitment()},
+            commitments_lead={coin.commitment()},
+        )
+        config = Config(
+            k=10,
+            active_slot_coeff=0.05,
+            epoch_stake_distribution_stabilization=4,
+            epoch_period_nonce_buffer=3,
+            epoch_period_nonce_stabilization=3,
+            time=TimeConfig(slot_duration=1, chain_start_time=0),
+        )
+        follower = Follower(genesis, config)
+        l = Leader(config=config, coin=coin)
+
+        for slot in range(3):
+            block = l.propose_block(Slot(slot), follower.tip_id())
+            follower.on_block(block)
+            assert follower.tip_id() == block.id()
+            l.coin = l.coin.evolve()
+
+        assert follower.local_chain.length() == 3
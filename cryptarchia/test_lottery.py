@@ -0,0 +1,49 @@
+from decimal import Decimal, getcontext
+from fractions import Fraction
+from unittest import TestCase
+
+from cryptarchia.cryptarchia import phi
+from cryptarchia.lottery import lottery_threshold
+
+ORDER = 2**256
+
+
+def reference_threshold(f: float, value: int, total_stake: int) -> int:
+    getcontext().prec = 200
+    f = Decimal(Fraction(f).numerator) / Decimal(Fraction(f).denominator)
+    alpha = Decimal(value) / Decimal(total_stake)
+    p = 1 - ((1 - f).ln() * alpha).exp()
+    return int(p * ORDER)
+
+
+class TestLotteryThreshold(TestCase):
+    def test_matches_high_precision_reference(self):
+        for f in (0.05, 0.5, 0.9):
+            for value, total_stake in ((1, 10**9), (10, 1000), (333, 1000), (7, 7)):
+                threshold = lottery_threshold(f, value, total_stake)
+                reference = reference_threshold(f, value, total_stake)
+                # exact up to the last few of the 256 bits
+                self.assertLess(abs(threshold - reference), 2**16)
+
+    def test_agrees_with_float_phi(self):
+        threshold = lottery_threshold(0.05, 10, 1000)
+        self.assertAlmostEqual(threshold / ORDER, phi(0.05, 10 / 1000), places=12)
+
+    def test_bounds(self):
+        self.assertEqual(lottery_threshold(0.05, 0, 1000), 0)
+        # a coin holding the whole stake wins with probability f
+        self.assertLess(abs(lottery_threshold(0.5, 1000, 1000) - ORDER // 2), 2**16)
+
+    def test_monotone_in_stake(self):
+        thresholds = [
+            lottery_threshold(0.05, value, 1000) for value in range(0, 1001, 50)
+        ]
+        self.assertEqual(thresholds, sorted(thresholds))
+
+    def test_cached_per_epoch_parameters(self):
+        lottery_threshold.cache_clear()
+        for _ in range(10):
+            lottery_threshold(0.05, 10, 1000)
+        info = lottery_threshold.cache_info()
+        self.assertEqual(info.misses, 1)
+        self.assertEqual(info.hits, 9)
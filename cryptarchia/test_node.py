@@ -0,0 +1,206 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from cryptarchia.cryptarchia import Coin, Config, Slot, TimeConfig
+from cryptarchia.node import METRICS_WINDOW, CryptarchiaNode, SlotClock
+from cryptarchia.test_ledger_state_update import mk_block, mk_genesis_state
+
+
+def fast_config(chain_start_time: float = 0.0) -> Config:
+    # epochs are kept short, 10 slots with the nonce snapshot 7 slots after the stake one
+    return Config(
+        k=1,
+        active_slot_coeff=0.9,
+        epoch_stake_distribution_stabilization=4,
+        epoch_period_nonce_buffer=3,
+        epoch_period_nonce_stabilization=3,
+        time=TimeConfig(slot_duration=1, chain_start_time=chain_start_time),
+    )
+
+
+class FakeClock:
+    """
+    Virtual time shared by the nodes of a test: a sleeper moves it to the end of its sleep at once, after letting the
+    other tasks run, unless the clock is frozen in which case sleepers never wake up
+    """
+
+    def __init__(self, time_s: float = 0.0, frozen: bool = False):
+        self.time_s = time_s
+        self.frozen = frozen
+
+    def now(self) -> float:
+        return self.time_s
+
+    async def sleep(self, delay_s: float):
+        deadline = self.time_s + delay_s
+        if self.frozen:
+            await asyncio.Future()
+        await asyncio.sleep(0)
+        self.time_s = max(self.time_s, deadline)
+
+
+class TestSlotClock(TestCase):
+    def test_slot_boundaries(self):
+        now = 100.0
+        clock = SlotClock(
+            TimeConfig(slot_duration=2, chain_start_time=100), now=lambda: now
+        )
+        self.assertEqual(clock.current_slot(), Slot(0))
+        self.assertEqual(clock.slot_at(101.9), Slot(0))
+        self.assertEqual(clock.slot_at(102), Slot(1))
+        self.assertEqual(clock.slot_start(Slot(5)), 110)
+
+
+class TestCryptarchiaNode(IsolatedAsyncioTestCase):
+    async def test_leader_proposes_and_follower_ingests(self):
+        leader_coin = Coin(sk=0, value=100)
+        genesis = mk_genesis_state([leader_coin])
+        config, clock = fast_config(), FakeClock()
+
+        leader = await CryptarchiaNode.new(
+            config, genesis, leader_coin, now=clock.now, sleep=clock.sleep
+        )
+        # a node without stake never wins the lottery and only follows the chain
+        follower = await CryptarchiaNode.new(
+            config, genesis, Coin(sk=1, value=0), now=clock.now, sleep=clock.sleep
+        )
+        try:
+            # span a couple of epochs to exercise the schedule precomputation
+            while leader.metrics.blocks_proposed < 25:
+                block = await asyncio.wait_for(leader.outbound_socket.get(), 5)
+                await follower.ingest_queue.put(block)
+            await leader.cancel()
+            while not leader.outbound_socket.empty():
+                await follower.ingest_queue.put(leader.outbound_socket.get_nowait())
+            await asyncio.wait_for(follower.ingest_queue.join(), 5)
+        finally:
+            await leader.cancel()
+            await follower.cancel()
+
+        proposed = leader.metrics.blocks_proposed
+        self.assertGreaterEqual(proposed, 25)
+        self.assertEqual(leader.follower.local_chain.length(), proposed)
+        self.assertEqual(follower.follower.tip_id(), leader.follower.tip_id())
+        self.assertEqual(follower.metrics.blocks_proposed, 0)
+        self.assertEqual(follower.metrics.headers_ingested, proposed)
+        self.assertEqual(len(leader.metrics.propose_latency_s), proposed)
+        # the virtual time does not move while a slot is processed
+        self.assertEqual(set(leader.metrics.propose_latency_s), {0})
+        self.assertTrue(leader.metrics.ingest_queue_depth)
+
+    async def test_proposals_do_not_wait_for_the_schedule(self):
+        leader_coin = Coin(sk=0, value=100)
+        genesis = mk_genesis_state([leader_coin])
+        config, clock = fast_config(), FakeClock()
+
+        leader = await CryptarchiaNode.new(
+            config, genesis, leader_coin, now=clock.now, sleep=clock.sleep
+        )
+        try:
+            while leader.metrics.blocks_proposed < 10:
+                block = await asyncio.wait_for(leader.outbound_socket.get(), 5)
+        finally:
+            await leader.cancel()
+
+        while not leader.outbound_socket.empty():
+            block = leader.outbound_socket.get_nowait()
+        # the schedule of the epoch was redrawn for the evolved coin
+        epoch = block.slot.epoch(config).epoch
+        self.assertEqual(leader.schedules[epoch].coin, leader.leader.coin)
+        self.assertEqual(leader.metrics.missed_slots, 0)
+
+    async def test_fork_switch_drops_epoch_states(self):
+        coin_a, coin_b = Coin(sk=0, value=100), Coin(sk=1, value=100)
+        genesis = mk_genesis_state([coin_a, coin_b])
+        # a single slot tick for the whole test
+        clock = FakeClock(frozen=True)
+        # a node without stake only follows the chain
+        node = await CryptarchiaNode.new(
+            fast_config(), genesis, Coin(sk=2, value=0), clock.now, sleep=clock.sleep
+        )
+        try:
+            a = mk_block(genesis.block, 1, coin_a)
+            b1 = mk_block(genesis.block, 1, coin_b)
+            b2 = mk_block(b1.id(), 2, coin_b.evolve())
+            for block in (a, b1):
+                await node.ingest_queue.put(block)
+            await asyncio.wait_for(node.ingest_queue.join(), 5)
+            self.assertEqual(node.follower.tip_id(), a.id())
+            self.assertIn(0, node.epoch_states)
+
+            await node.ingest_queue.put(b2)
+            await asyncio.wait_for(node.ingest_queue.join(), 5)
+        finally:
+            await node.cancel()
+
+        self.assertEqual(node.follower.tip_id(), b2.id())
+        self.assertEqual(node.metrics.fork_switches, 1)
+        self.assertEqual(node.epoch_states, {})
+        self.assertEqual(node.schedules, {})
+
+    async def test_ingest_errors_do_not_stop_the_ingester(self):
+        coin = Coin(sk=0, value=100)
+        genesis = mk_genesis_state([coin])
+        clock = FakeClock(frozen=True)
+        node = await CryptarchiaNode.new(
+            fast_config(), genesis, Coin(sk=1, value=0), clock.now, sleep=clock.sleep
+        )
+        try:
+            # not a header
+            await node.ingest_queue.put(None)
+            await node.ingest_queue.put(mk_block(genesis.block, 1, coin))
+            await asyncio.wait_for(node.ingest_queue.join(), 5)
+        finally:
+            await node.cancel()
+
+        self.assertEqual(len(node.metrics.ingest_errors), 1)
+        self.assertIsInstance(node.metrics.ingest_errors[0], AttributeError)
+        self.assertEqual(node.metrics.headers_ingested, 1)
+        self.assertEqual(node.follower.local_chain.length(), 1)
+
+    async def test_late_blocks_drop_the_snapshots_after_them(self):
+        coin = Coin(sk=0, value=100)
+        genesis = mk_genesis_state([coin])
+        # ticks once at slot 8, past the nonce snapshot of epoch 1 at slot 7
+        clock = FakeClock(time_s=8, frozen=True)
+        node = await CryptarchiaNode.new(
+            fast_config(), genesis, Coin(sk=1, value=0), clock.now, sleep=clock.sleep
+        )
+        try:
+            await asyncio.sleep(0)
+            self.assertEqual(sorted(node.epoch_states), [0, 1])
+            self.assertEqual(sorted(node.schedules), [0, 1])
+
+            # extends the chain before the nonce snapshot of epoch 1
+            b3 = mk_block(genesis.block, 3, coin)
+            await node.ingest_queue.put(b3)
+            await asyncio.wait_for(node.ingest_queue.join(), 5)
+            self.assertEqual(sorted(node.epoch_states), [0])
+            self.assertEqual(sorted(node.schedules), [0])
+
+            await node.ingest_queue.put(mk_block(b3.id(), 9, coin.evolve()))
+            await asyncio.wait_for(node.ingest_queue.join(), 5)
+            self.assertEqual(sorted(node.epoch_states), [0])
+        finally:
+            await node.cancel()
+
+        self.assertEqual(node.follower.local_chain.length(), 2)
+        self.assertEqual(node.metrics.fork_switches, 0)
+
+    async def test_metrics_are_bounded(self):
+        clock = FakeClock(frozen=True)
+        node = await CryptarchiaNode.new(
+            fast_config(),
+            mk_genesis_state([Coin(sk=0, value=100)]),
+            Coin(sk=1, value=0),
+            clock.now,
+            sleep=clock.sleep,
+        )
+        try:
+            for _ in range(METRICS_WINDOW + 10):
+                await node.ingest_queue.put(None)
+            await asyncio.wait_for(node.ingest_queue.join(), 5)
+        finally:
+            await node.cancel()
+
+        self.assertEqual(len(node.metrics.ingest_errors), METRICS_WINDOW)
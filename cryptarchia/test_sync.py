@@ -0,0 +1,164 @@
+from typing import List, Tuple
+from unittest import IsolatedAsyncioTestCase
+
+from cryptarchia.cryptarchia import BlockHeader, Coin, Follower, Id, Leader, Slot
+from cryptarchia.sync import HeaderSync, LocalPeer, SyncError, SyncStats
+from cryptarchia.test_ledger_state_update import config, mk_genesis_state
+
+
+def extend(follower: Follower, leader: Leader, slots: range):
+    for slot in slots:
+        follower.on_block(leader.propose_block(Slot(slot), follower.tip_id()))
+        leader.coin = leader.coin.evolve()
+
+
+class SplicingPeer(LocalPeer):
+    """
+    Serves batches whose first header links to the chain but whose second half is taken
+    from another chain
+    """
+
+    def __init__(self, follower: Follower, other: Follower):
+        super().__init__(follower)
+        self.other = other
+
+    async def headers(self, start: int, count: int) -> List[BlockHeader]:
+        headers = await super().headers(start, count)
+        middle = len(headers) // 2
+        return (
+            headers[:middle]
+            + self.other.local_chain.blocks[start + middle : start + count]
+        )
+
+
+class EmptyPeer(LocalPeer):
+    async def headers(self, start: int, count: int) -> List[BlockHeader]:
+        await super().headers(start, count)
+        return []
+
+
+class ForgingPeer(LocalPeer):
+    """
+    Serves a chain of linked headers whose leader proofs are invalid
+    """
+
+    def __init__(self, follower: Follower, headers: List[BlockHeader]):
+        super().__init__(follower)
+        self.forged = headers
+
+    async def tip(self) -> Tuple[Id, int]:
+        await super().tip()
+        return self.forged[-1].id(), len(self.forged)
+
+    async def has_block(self, block_id: Id) -> bool:
+        await super().has_block(block_id)
+        return any(header.id() == block_id for header in self.forged)
+
+    async def headers(self, start: int, count: int) -> List[BlockHeader]:
+        await super().headers(start, count)
+        return self.forged[start : start + count]
+
+
+class TestHeaderSync(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.coins = [Coin(sk=0, value=100), Coin(sk=1, value=100)]
+        self.genesis = mk_genesis_state(self.coins)
+        # two peers following the same chain
+        self.peers = [Follower(self.genesis, config()) for _ in range(2)]
+        leader = Leader(config=config(), coin=self.coins[0])
+        blocks = []
+        for slot in range(300):
+            block = leader.propose_block(Slot(slot), self.peers[0].tip_id())
+            leader.coin = leader.coin.evolve()
+            for peer in self.peers:
+                peer.on_block(block)
+            blocks.append(block)
+        self.blocks = blocks
+
+    async def test_sync_from_genesis(self):
+        follower = Follower(self.genesis, config())
+        peers = [LocalPeer(peer, latency_s=0.001) for peer in self.peers]
+
+        stats = await HeaderSync(follower, peers, batch_size=32).sync()
+
+        self.assertEqual(follower.tip_id(), self.peers[0].tip_id())
+        self.assertEqual(stats.fork_point, 0)
+        self.assertEqual(stats.headers, 300)
+        self.assertEqual(stats.refetched_batches, 0)
+        self.assertGreater(stats.headers_per_second, 0)
+        # the download was spread over both peers
+        self.assertTrue(all(peer.requests > 1 for peer in peers))
+
+    async def test_sync_from_fork(self):
+        follower = Follower(self.genesis, config())
+        for block in self.blocks[:200]:
+            follower.on_block(block)
+        # the follower diverged from the peers after block 200
+        extend(follower, Leader(config=config(), coin=self.coins[1]), range(1000, 1005))
+
+        stats = SyncStats()
+        sync = HeaderSync(follower, [LocalPeer(peer) for peer in self.peers])
+        self.assertEqual(await sync.find_fork_point(sync.peers[0], stats), 200)
+        # exponential probing finds the fork point well before scanning the chain
+        self.assertLess(stats.fork_point_probes, 10)
+
+        stats = await sync.sync()
+        self.assertEqual(stats.headers, 100)
+        self.assertEqual(follower.tip_id(), self.peers[0].tip_id())
+
+    async def test_refetch_from_target_when_peer_is_on_another_fork(self):
+        follower = Follower(self.genesis, config())
+        short = Follower(self.genesis, config())
+        # a lower peer on its own chain, eligible for the first batches only
+        extend(short, Leader(config=config(), coin=self.coins[1]), range(1000, 1050))
+        peers = [LocalPeer(self.peers[0]), LocalPeer(short)]
+
+        stats = await HeaderSync(follower, peers, batch_size=16).sync()
+
+        self.assertGreater(stats.refetched_batches, 0)
+        self.assertEqual(follower.tip_id(), self.peers[0].tip_id())
+
+    async def test_refetch_batches_which_do_not_link_internally(self):
+        follower = Follower(self.genesis, config())
+        other = Follower(self.genesis, config())
+        extend(other, Leader(config=config(), coin=self.coins[1]), range(1000, 1300))
+        peers = [LocalPeer(self.peers[0]), SplicingPeer(self.peers[1], other)]
+
+        stats = await HeaderSync(follower, peers, batch_size=16).sync()
+
+        self.assertGreater(stats.refetched_batches, 0)
+        self.assertEqual(follower.tip_id(), self.peers[0].tip_id())
+        self.assertEqual(follower.local_chain.length(), 300)
+
+    async def test_invalid_target_batch(self):
+        follower = Follower(self.genesis, config())
+        with self.assertRaisesRegex(SyncError, "do not extend the chain"):
+            await HeaderSync(follower, [EmptyPeer(self.peers[0])]).sync()
+        self.assertEqual(follower.local_chain.length(), 0)
+
+    async def test_drop_target_serving_invalid_batches(self):
+        follower = Follower(self.genesis, config())
+        peers = [EmptyPeer(self.peers[0]), LocalPeer(self.peers[1])]
+        stats = await HeaderSync(follower, peers, batch_size=16).sync()
+        self.assertEqual(stats.dropped_peers, 1)
+        self.assertEqual(follower.tip_id(), self.peers[1].tip_id())
+
+    async def test_drop_peer_serving_rejected_headers(self):
+        # a coin which is not in the genesis state can not lead
+        forger = Leader(config=config(), coin=Coin(sk=2, value=100))
+        forged, parent = [], self.genesis.block
+        for slot in range(400):
+            forged.append(forger.propose_block(Slot(slot), parent))
+            parent = forged[-1].id()
+        follower = Follower(self.genesis, config())
+        peers = [ForgingPeer(self.peers[0], forged), LocalPeer(self.peers[1])]
+
+        stats = await HeaderSync(follower, peers, batch_size=16).sync()
+
+        self.assertEqual(stats.dropped_peers, 1)
+        self.assertEqual(stats.headers, 300)
+        self.assertEqual(follower.tip_id(), self.peers[1].tip_id())
+        with self.assertRaisesRegex(SyncError, "rejected header"):
+            await HeaderSync(
+                Follower(self.genesis, config()), [ForgingPeer(self.peers[0], forged)]
+            ).sync()
@@ -10,8 +10,8 @@ from cryptography.hazmat.primitives.asymmetric.x25519 import (
 )
 from pysphinx.node import Node
 
+import sampling
 from mixnet.bls import BlsPrivateKey, BlsPublicKey
-from mixnet.fisheryates import FisherYates
 
 
 @dataclass
@@ -54,8 +54,11 @@ class MixnetTopology:
         """
         Build a new topology deterministically using an entropy and a given set of candidates.
         """
-        shuffled = FisherYates.shuffle(config.mixnode_candidates, config.entropy)
-        sampled = shuffled[: config.size.num_total_mixnodes()]
+        sampled = sampling.partial_shuffle(
+            config.mixnode_candidates,
+            config.size.num_total_mixnodes(),
+            config.entropy,
+        )
 
         layers = []
         for layer_id in range(config.size.num_layers):
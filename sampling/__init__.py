@@ -0,0 +1,84 @@
+"""
+Deterministic sampling from entropy.
+
+Every node must derive the exact same overlays, leaders and mixnet topologies from the same entropy, so the random
+stream is fully specified here instead of relying on Python's `random` implementation and its global state:
+    * the stream is blake2b(seed || counter) blocks of 64 bytes, with seed = blake2b(entropy)
+    * integers below n are drawn by taking the `(n - 1).bit_length()` low bits of the next `ceil(bits / 8)` little
+      endian bytes of the stream, and rejecting them until they are below n (unbiased)
+    * shuffles are the forward Fisher-Yates shuffle: for i in 0..m, swap elements[i] and elements[i + randbelow(n - i)]
+
+Every call builds its own generator, so sampling is thread safe and can run concurrently.
+The module is shared by carnot and the mixnet, it only depends on the standard library.
+"""
+from hashlib import blake2b
+from typing import List, MutableSequence, Sequence, TypeVar
+
+T = TypeVar("T")
+
+BLOCK_SIZE = 64
+
+
+class DeterministicRandom:
+    def __init__(self, entropy: bytes):
+        self.seed = blake2b(entropy, digest_size=32, person=b"nomos-sampling").digest()
+        self.counter = 0
+        self.block = b""
+        self.offset = 0
+
+    def next_bytes(self, n: int) -> bytes:
+        if self.offset + n > len(self.block):
+            remaining = self.block[self.offset :]
+            blocks = (n - len(remaining) + BLOCK_SIZE - 1) // BLOCK_SIZE
+            self.block = remaining + b"".join(self._next_block() for _ in range(blocks))
+            self.offset = 0
+        out = self.block[self.offset : self.offset + n]
+        self.offset += n
+        return out
+
+    def _next_block(self) -> bytes:
+        block = blake2b(
+            self.seed + self.counter.to_bytes(8, byteorder="little"),
+            digest_size=BLOCK_SIZE,
+        ).digest()
+        self.counter += 1
+        return block
+
+    def randbelow(self, n: int) -> int:
+        assert n > 0
+        bits = (n - 1).bit_length()
+        size, mask = (bits + 7) // 8, (1 << bits) - 1
+        while True:
+            r = int.from_bytes(self.next_bytes(size), byteorder="little") & mask
+            if r < n:
+                return r
+
+    def partial_shuffle(
+        self, elements: MutableSequence[T], m: int
+    ) -> MutableSequence[T]:
+        n = len(elements)
+        for i in range(min(m, n - 1)):
+            j = i + self.randbelow(n - i)
+            elements[i], elements[j] = elements[j], elements[i]
+        return elements
+
+
+def shuffle(elements: MutableSequence[T], entropy: bytes):
+    """
+    Shuffle `elements` in place
+    """
+    DeterministicRandom(entropy).partial_shuffle(elements, len(elements))
+
+
+def partial_shuffle(elements: Sequence[T], m: int, entropy: bytes) -> List[T]:
+    """
+    :return: the first `m` elements of `shuffle(elements, entropy)`, in O(m) draws
+    """
+    return list(DeterministicRandom(entropy).partial_shuffle(list(elements), m)[:m])
+
+
+def choice(elements: Sequence[T], entropy: bytes) -> T:
+    """
+    Draw a single element, e.g. a leader
+    """
+    return elements[DeterministicRandom(entropy).randbelow(len(elements))]
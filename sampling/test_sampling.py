@@ -0,0 +1,56 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from sampling import DeterministicRandom, choice, partial_shuffle, shuffle
+
+
+def shuffled(elements, entropy):
+    out = list(elements)
+    shuffle(out, entropy)
+    return out
+
+
+class TestSampling(TestCase):
+    def test_shuffle_is_a_deterministic_permutation(self):
+        elements = list(range(1000))
+        first = shuffled(elements, b"entropy")
+        self.assertEqual(sorted(first), elements)
+        self.assertNotEqual(first, elements)
+        self.assertEqual(first, shuffled(elements, b"entropy"))
+        self.assertNotEqual(first, shuffled(elements, b"other entropy"))
+
+    def test_partial_shuffle_is_a_prefix_of_the_shuffle(self):
+        elements = list(range(1000))
+        full = shuffled(elements, b"entropy")
+        for m in (0, 1, 10, 999, 1000, 2000):
+            self.assertEqual(partial_shuffle(elements, m, b"entropy"), full[:m])
+        # the input is left untouched
+        self.assertEqual(elements, list(range(1000)))
+
+    def test_randbelow(self):
+        rng = DeterministicRandom(b"entropy")
+        self.assertEqual(rng.randbelow(1), 0)
+        for n in (2, 3, 255, 256, 257, 2**70 + 1):
+            self.assertTrue(all(0 <= rng.randbelow(n) < n for _ in range(100)))
+
+    def test_choice_is_uniform(self):
+        elements = ["a", "b", "c", "d"]
+        counts = Counter(
+            choice(elements, i.to_bytes(4, byteorder="little")) for i in range(4000)
+        )
+        self.assertEqual(set(counts), set(elements))
+        self.assertTrue(all(850 < count < 1150 for count in counts.values()), counts)
+
+    def test_concurrent_shuffles(self):
+        elements = list(range(5000))
+        entropies = [bytes([i]) * 32 for i in range(16)]
+        expected = [shuffled(elements, entropy) for entropy in entropies]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            self.assertEqual(
+                list(
+                    executor.map(lambda entropy: shuffled(elements, entropy), entropies)
+                ),
+                expected,
+            )
+